@@ -0,0 +1,74 @@
+"""Times status queries against a running stargazing daemon.
+
+Queries are sent over one kept-open connection, as an attached TUI does, and over a new
+connection each, as stargazing status does (not counting the interpreter starting). Round trip
+times of both are reported as JSON. The daemon's socket is picked as the client picks it, so set
+STARGAZING_SOCKET to time a daemon on another socket.
+
+Usage: stargazing daemon --detach
+       python benchmarks/bench_daemon_status.py [--queries 2000] [--full] [--output results.json]"""
+
+from typing import List
+import argparse
+import json
+import sys
+import time
+
+import stargazing.daemon.client as daemon_client
+
+from benchmarks.bench_main_loop import summarise_ms
+
+
+def time_kept_connection(queries: int, full: bool) -> List[float]:
+    client = daemon_client.DaemonClient()
+    client.request("status", full=full)
+
+    timings = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        client.request("status", full=full)
+        timings.append(time.perf_counter() - start)
+
+    client.close()
+    return timings
+
+
+def time_new_connections(queries: int, full: bool) -> List[float]:
+    timings = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        client = daemon_client.DaemonClient()
+        client.request("status", full=full)
+        client.close()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--full", action="store_true", help="query the full state, with projects and players")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    if not daemon_client.is_daemon_running():
+        sys.exit("stargazing daemon is not running, start it with: stargazing daemon --detach")
+
+    results = {
+        "queries": args.queries,
+        "full": args.full,
+        "kept_connection": summarise_ms(time_kept_connection(args.queries, args.full)),
+        "new_connections": summarise_ms(time_new_connections(args.queries, args.full))
+    }
+
+    json.dump(results, sys.stdout, indent=4)
+    print()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
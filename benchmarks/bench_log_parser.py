@@ -0,0 +1,89 @@
+"""Compares the strptime based pomodoro log parser with the bulk and streaming parsers in
+stargazing.data.log_parser.
+
+Usage: python benchmarks/bench_log_parser.py [--sizes 10000 100000 1000000]"""
+
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import stargazing.data.database as database
+import stargazing.data.log_parser as log_parser
+
+
+def write_log(file_path: str, line_count: int) -> None:
+    projects = ["default", "study", "work", "side project"]
+    start_time = datetime(2019, 1, 1, 9, 0, 0)
+
+    with open(file_path, "w") as file:
+        for i in range(line_count):
+            time_str = (start_time + timedelta(minutes=i)).strftime(database.TIME_FORMAT)
+            file.write(f"{random.choice(projects)}|{time_str}|{random.uniform(0, 3600)}\n")
+
+
+def parse_strptime(file_path: str) -> int:
+    with open(file_path, "r") as file:
+        lines = file.readlines()
+
+    records = []
+    for line in lines:
+        project_name, start_time_str, length_str = line.split(database.DATABASE_DELIMITER_CHAR)
+        records.append(database.PomodoroRecord(
+            project_name, datetime.strptime(start_time_str, database.TIME_FORMAT), float(length_str)))
+
+    return len(records)
+
+
+def parse_bulk(file_path: str) -> int:
+    with open(file_path, "rb") as file:
+        columns = log_parser.parse_pomodoro_log(file.read())
+
+    return len(columns.lengths)
+
+
+def parse_bulk_python(file_path: str) -> int:
+    min_timestamps, log_parser.NUMPY_MIN_TIMESTAMPS = log_parser.NUMPY_MIN_TIMESTAMPS, float("inf")
+    try:
+        return parse_bulk(file_path)
+    finally:
+        log_parser.NUMPY_MIN_TIMESTAMPS = min_timestamps
+
+
+def parse_streaming(file_path: str) -> int:
+    total = 0
+    for _, _, length in log_parser.iter_pomodoro_log(file_path):
+        total += 1
+
+    return total
+
+
+def time_parser(parser, file_path: str) -> float:
+    start = time.perf_counter()
+    parser(file_path)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = arg_parser.parse_args()
+
+    parsers = [("strptime", parse_strptime), ("bulk (pure python)", parse_bulk_python),
+               ("streaming", parse_streaming)]
+    if log_parser.numpy.available:
+        parsers.insert(2, ("bulk (numpy)", parse_bulk))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            file_path = os.path.join(tmp_dir, f"pomodoros_{size}.txt")
+            write_log(file_path, size)
+
+            print(f"{size} lines")
+            baseline = None
+            for name, parser in parsers:
+                elapsed = time_parser(parser, file_path)
+                baseline = baseline or elapsed
+                print(f"    {name:<20} {elapsed:8.3f}s  {baseline / elapsed:6.1f}x")
@@ -0,0 +1,252 @@
+"""Drives the stargazing main loop headlessly, against a fake terminal writing to memory with audio
+stubbed out, and reports frame rate, bytes written per frame, per-phase timings and input to render
+latency as JSON.
+
+Keys are read from a JSON file holding a list of keys - single characters, blessed key names such
+as "KEY_DOWN", null for a frame without input, or "@" followed by the start of an item's text (e.g.
+"@volume") to move to that item of the focused menu, one KEY_UP or KEY_DOWN per frame. Without one,
+a built-in session browsing the menus is used.
+
+Usage: python benchmarks/bench_main_loop.py [--keys keys.json] [--repeat 20] [--size 100 30]
+                                            [--star-frame-every 10] [--output results.json]"""
+
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Union
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from blessed import Terminal
+from blessed.keyboard import Keystroke
+
+import stargazing.audio.audio_controller as audio_ac
+import stargazing.config.config as config
+from stargazing.main import Stargazing
+import stargazing.utils.renderer as renderer
+
+PHASES = ["print_stars", "print_menu", "print_submenu", "update_timer"]
+
+# Keys starting with this move to the item whose text starts with the rest of the key
+LABEL_PREFIX = "@"
+
+# Browses each submenu, toggles the report between all and the current project, moves around the
+# player and volume menus and types a search without running it
+DEFAULT_KEYS = (
+    [None] * 5 +
+    ["@project", "KEY_ENTER", "KEY_DOWN", "KEY_UP", "KEY_ESCAPE"] +
+    ["@reports", "KEY_ENTER", "KEY_ENTER", "KEY_ENTER", "KEY_ESCAPE"] +
+    ["@pomodoro", "KEY_ENTER", "KEY_DOWN", "KEY_DOWN", "KEY_UP", "KEY_ESCAPE"] +
+    ["@auto-start", "KEY_ENTER", "KEY_DOWN", "KEY_ESCAPE"] +
+    ["@playing", "KEY_ENTER", "@search youtube", "KEY_ENTER"] +
+    list("lofi beats") + ["KEY_BACKSPACE"] * 10 + ["KEY_ESCAPE", "KEY_ESCAPE"] +
+    ["@volume", "KEY_ENTER", "KEY_UP", "KEY_UP", "KEY_DOWN", "KEY_ESCAPE"] +
+    ["@project"] + [None] * 5
+)
+
+
+class FakeTerminal(Terminal):
+    """Blessed terminal of a fixed size writing to memory."""
+
+    def __init__(self, width: int, height: int) -> None:
+        super().__init__(kind="xterm-256color", stream=io.StringIO(), force_styling=True)
+        self.fake_width = width
+        self.fake_height = height
+
+    @property
+    def width(self) -> int:
+        return self.fake_width
+
+    @property
+    def height(self) -> int:
+        return self.fake_height
+
+
+class NullAudioController(audio_ac.AudioController):
+    """Audio controller that never loads or plays audio."""
+
+    def start_loading(self) -> None:
+        pass
+
+    def set_loaded_player(self, loaded_player_name: str) -> None:
+        self.playing_name = loaded_player_name
+
+    def set_youtube_player_from_url(self, youtube_url: str, player_name="") -> None:
+        self.playing_name = player_name or youtube_url
+
+    def search_youtube(self, search_query: str) -> Future:
+        future = Future()
+        future.set_result([])
+        return future
+
+
+class NullAlarmPlayer():
+
+    def preload(self) -> None:
+        pass
+
+    def play(self, path: str) -> None:
+        pass
+
+
+def to_keystroke(term: Terminal, key: Union[str, None]) -> Keystroke:
+    if key is None:
+        return Keystroke()
+    if key.startswith("KEY_"):
+        return Keystroke(ucs="", code=getattr(term, key), name=key)
+    return Keystroke(ucs=key)
+
+
+def is_label_key(key: Union[str, None]) -> bool:
+    return key is not None and key.startswith(LABEL_PREFIX) and len(key) > len(LABEL_PREFIX)
+
+
+def play_keys(app: Stargazing, keys: List[Union[str, None]]) -> Iterator[Union[str, None]]:
+    """Yields the keys to press, replacing each label key with the KEY_UP or KEY_DOWN presses moving
+    the focused menu to the item it names. Raises ValueError if the menu has no such item."""
+
+    for key in keys:
+        if not is_label_key(key):
+            yield key
+            continue
+
+        label = key[len(LABEL_PREFIX):]
+        menu = app.focused_menu
+        target_index = next((i for i, item in enumerate(menu.items)
+                             if app.term.strip_seqs(item.text).startswith(label)), None)
+        if target_index is None:
+            raise ValueError(f"No item starting with {label!r} in the focused menu")
+
+        while menu.hover_index != target_index:
+            hover_index = menu.hover_index
+            yield "KEY_DOWN" if hover_index < target_index else "KEY_UP"
+            if menu.hover_index == hover_index:
+                raise ValueError(f"Could not move to the item starting with {label!r}")
+
+
+def percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def summarise_ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+
+    return {
+        "mean_ms": statistics.mean(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000
+    }
+
+
+def time_phase(timings: Dict[str, List[float]], name: str, fn: Callable) -> Callable:
+    def timed_fn(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[name].append(time.perf_counter() - start_time)
+    return timed_fn
+
+
+def get_commit() -> Union[str, None]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(keys: List[Union[str, None]], repeat: int, width: int, height: int, star_frame_every: int) -> dict:
+    term = FakeTerminal(width, height)
+    _, _, _, last_volume = config.get_last_session_data()
+
+    app = Stargazing(term, NullAudioController(last_volume))
+    app.pomodoro_controller.alarm_player = NullAlarmPlayer()
+
+    timings = {phase: [] for phase in PHASES}
+    app.print_stars = time_phase(timings, "print_stars", app.print_stars)
+    app.print_menu = time_phase(timings, "print_menu", app.print_menu)
+    app.print_submenu = time_phase(timings, "print_submenu", app.print_submenu)
+    app.pomodoro_controller.update_timer = time_phase(
+        timings, "update_timer", app.pomodoro_controller.update_timer)
+
+    frame_renderer = renderer.get_renderer(term)
+    app.setup_screen()
+    app.render_frame()
+
+    frame_bytes = []
+    latencies = []
+    frames = 0
+
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        for key in play_keys(app, keys):
+            frames += 1
+            if star_frame_every and frames % star_frame_every == 0:
+                app.stars_generator.next_frame()
+
+            input_time = time.perf_counter()
+            app.step(to_keystroke(term, key))
+            app.render_frame()
+
+            if key is not None:
+                latencies.append(time.perf_counter() - input_time)
+            frame_bytes.append(frame_renderer.last_frame_bytes)
+
+            # Clear the fake terminal so memory does not grow with the run
+            term.stream.seek(0)
+            term.stream.truncate()
+    elapsed = time.perf_counter() - start_time
+
+    return {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "terminal": {"width": width, "height": height},
+        "frames": frames,
+        "elapsed_s": elapsed,
+        "fps": frames / elapsed if elapsed else None,
+        "bytes_per_frame": {
+            "mean": statistics.mean(frame_bytes),
+            "p50": percentile(frame_bytes, 50),
+            "p99": percentile(frame_bytes, 99),
+            "max": max(frame_bytes)
+        },
+        "phases": {phase: summarise_ms(times) for phase, times in timings.items()},
+        "input_to_render": summarise_ms(latencies)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", help="JSON file holding the list of keys to play back")
+    parser.add_argument("--repeat", type=int, default=20, help="times to play back the keys")
+    parser.add_argument("--size", type=int, nargs=2, default=[100, 30], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--star-frame-every", type=int, default=10,
+                        help="advance the stars every this many frames, 0 to never")
+    parser.add_argument("--output", help="file to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    keys = DEFAULT_KEYS
+    if args.keys:
+        with open(args.keys) as file:
+            keys = json.load(file)
+
+    results = run(keys, args.repeat, *args.size, args.star_frame_every)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Shows frame times staying flat while database writes are slow.
+
+Drives the main loop headlessly (as bench_main_loop.py does) against a throwaway text database
+whose writes are slowed by a fixed delay. A pomodoro is finished every few frames and a project is
+created now and then. The loop is run twice - with writes going through the background write queue,
+and with every write waited on as it is queued, as inserts used to be - and frame times of both are
+reported as JSON.
+
+Usage: python benchmarks/bench_slow_disk.py [--frames 200] [--write-delay 0.1] [--insert-every 10]
+                                            [--project-every 50] [--output results.json]"""
+
+from typing import Callable, Dict, List
+import argparse
+import json
+import os.path as path
+import shutil
+import sys
+import tempfile
+import time
+
+import stargazing.config.config as config
+import stargazing.data.database as database
+import stargazing.data.pomodoro_journal as pomodoro_journal
+import stargazing.data.rollup_cache as rollup_cache
+from stargazing.main import Stargazing
+import stargazing.pomodoro.pomodoro_controller as pomo_pc
+
+from benchmarks.bench_main_loop import FakeTerminal, NullAlarmPlayer, NullAudioController, summarise_ms, to_keystroke
+
+
+def slowed(writer: Callable[[list], None], delay: float) -> Callable[[list], None]:
+    def slow_writer(items: list) -> None:
+        time.sleep(delay)
+        writer(items)
+
+    slow_writer.__name__ = writer.__name__
+    return slow_writer
+
+
+def use_temporary_database(directory: str) -> None:
+    """Points the text database at copies in the given directory, so the real one is not written."""
+
+    database._backend = database.TEXT_BACKEND
+    database._project_names = None
+
+    for name in ("PROJECT_DATABASE_PATH", "POMODORO_DATABASE_PATH"):
+        copy_path = path.join(directory, path.basename(getattr(database, name)))
+        shutil.copyfile(getattr(database, name), copy_path)
+        setattr(database, name, copy_path)
+
+    database._rollup_cache = rollup_cache.RollupCache(cache_path=path.join(directory, "pomodoros.rollup"))
+
+
+def run(frames: int, insert_every: int, project_every: int, wait_for_writes: bool, directory: str) -> Dict[str, float]:
+    term = FakeTerminal(100, 30)
+    _, _, _, last_volume = config.get_last_session_data()
+
+    app = Stargazing(term, NullAudioController(last_volume))
+    app.pomodoro_controller.alarm_player = NullAlarmPlayer()
+    # Each run keeps its own journal, closed at the end of the run with the pomodoro in progress unfinished
+    journal_name = "waited" if wait_for_writes else "queued"
+    app.pomodoro_controller.journal = pomodoro_journal.PomodoroJournal(
+        path.join(directory, f"pomodoros.{journal_name}.journal"))
+
+    queue = database.get_write_queue()
+    submit = queue.submit
+    if wait_for_writes:
+        def submit_and_wait(*args, **kwargs) -> None:
+            submit(*args, **kwargs)
+            queue.flush()
+        queue.submit = submit_and_wait
+
+    app.setup_screen()
+    app.render_frame()
+    app.pomodoro_controller.toggle_start_stop()
+
+    frame_times: List[float] = []
+    try:
+        for frame in range(1, frames + 1):
+            start_time = time.perf_counter()
+
+            if frame % insert_every == 0 and app.pomodoro_controller.status == pomo_pc.PomodoroStatus.WORK:
+                app.pomodoro_controller.reset_timer()
+            if project_every and frame % project_every == 0:
+                app.project_controller.create_and_insert_new_project(f"bench {time.time_ns()}")
+
+            app.step(to_keystroke(term, None))
+            app.render_frame()
+
+            frame_times.append(time.perf_counter() - start_time)
+            term.stream.seek(0)
+            term.stream.truncate()
+    finally:
+        queue.submit = submit
+        app.pomodoro_controller.journal.close()
+
+    flush_start_time = time.perf_counter()
+    database.flush_writes()
+
+    results = summarise_ms(frame_times)
+    results["flush_on_exit_ms"] = (time.perf_counter() - flush_start_time) * 1000
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--write-delay", type=float, default=0.1, help="seconds added to every database write")
+    parser.add_argument("--insert-every", type=int, default=10, help="finish a pomodoro every this many frames")
+    parser.add_argument("--project-every", type=int, default=50,
+                        help="create a project every this many frames, 0 to never")
+    parser.add_argument("--output", help="file to write the JSON results to, defaults to stdout")
+    args = parser.parse_args()
+
+    database.write_pomodoro_records = slowed(database.write_pomodoro_records, args.write_delay)
+    database.write_projects = slowed(database.write_projects, args.write_delay)
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_temporary_database(directory)
+
+        results = {
+            "write_delay_ms": args.write_delay * 1000,
+            "queued": run(args.frames, args.insert_every, args.project_every, False, directory),
+            "waited": run(args.frames, args.insert_every, args.project_every, True, directory),
+            "batches_written": database.get_write_queue().batches,
+            "items_written": database.get_write_queue().items_written
+        }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measures the time from launching stargazing to its first frame being on screen, and fails if the
+median is over budget. Runs stargazing in a pseudo terminal, so only works on POSIX systems.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--budget 1.0]"""
+
+import argparse
+import fcntl
+import os
+import pty
+import select
+import signal
+import statistics
+import struct
+import sys
+import termios
+import time
+
+# Text drawn as part of the main menu, so seen once the first frame has been flushed
+FIRST_FRAME_MARKER = b"total time"
+
+TERMINAL_SIZE = (30, 100)
+
+STARTUP_TIMEOUT = 30
+EXIT_TIMEOUT = 5
+
+
+def read_until(fd: int, marker: bytes, timeout: float) -> bool:
+    output = b""
+    end_time = time.perf_counter() + timeout
+
+    while time.perf_counter() < end_time:
+        readable, _, _ = select.select([fd], [], [], 0.01)
+        if not readable:
+            continue
+
+        try:
+            output += os.read(fd, 65536)
+        except OSError:
+            return False
+
+        if marker in output:
+            return True
+
+    return False
+
+
+def measure_first_frame() -> float:
+    start_time = time.perf_counter()
+
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.environ.setdefault("TERM", "xterm-256color")
+        os.execv(sys.executable, [sys.executable, "-m", "stargazing.main"])
+
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", *TERMINAL_SIZE, 0, 0))
+
+    try:
+        if not read_until(fd, FIRST_FRAME_MARKER, STARTUP_TIMEOUT):
+            raise RuntimeError("stargazing did not draw its first frame")
+        first_frame_time = time.perf_counter() - start_time
+
+        os.write(fd, b"q")
+        read_until(fd, b"Exiting stargazing", EXIT_TIMEOUT)
+    finally:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+        os.close(fd)
+
+    return first_frame_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="median time to first frame allowed, in seconds")
+    args = parser.parse_args()
+
+    times = [measure_first_frame() for _ in range(args.runs)]
+    median = statistics.median(times)
+
+    print(f"time to first frame: median {median * 1000:.0f}ms, "
+          f"min {min(times) * 1000:.0f}ms, max {max(times) * 1000:.0f}ms over {args.runs} runs")
+
+    if median > args.budget:
+        print(f"over budget of {args.budget * 1000:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ setup(
     name='stargazing',         # How you named your package folder (MyLib)
     packages=['stargazing'],   # Chose the same as "name"
     package_data={'': ['audio/*', 'config/*',
-                       'data/*', 'logs/*', 'pomodoro/*', 'project/*', 'res/*', 'utils/*']},
+                       'daemon/*', 'data/*', 'logs/*', 'pomodoro/*', 'project/*', 'res/*', 'utils/*']},
     version='0.1.8',      # Start with a small number and increase it with every change you make
     # Chose a license from here: https://help.github.com/articles/licensing-a-repository
     license='MIT',
@@ -45,7 +45,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'stargazing=stargazing.main:run_stargazing',
+            'stargazing=stargazing.cli:run_stargazing',
         ],
     },
 )
@@ -0,0 +1,122 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+import threading
+
+import stargazing.audio.audio_controller as audio_ac
+import stargazing.audio.audio_engine as audio_ae
+from stargazing.utils.lazy_import import LazyModule
+from stargazing.utils.logger import logger
+
+vlc = LazyModule("vlc")
+
+# Stream volume is lowered by this much while an alarm plays
+ALARM_DUCK_AMOUNT = 15
+
+# Used until a clip's duration is known
+DEFAULT_ALARM_DURATION = 2.0
+
+ALARM_PARSE_TIMEOUT_MS = 2000
+
+
+class AlarmClip():
+    """An alarm sound kept resident with its own player, so playing it does not create any players.
+
+    @param vlc_instance: VLC instance to create the media and player with.
+    @param path: Path of the sound file."""
+
+    def __init__(self, vlc_instance: vlc.Instance, path: str) -> None:
+        self.path = path
+
+        self.media = vlc_instance.media_new(path)
+        self.media.add_option(":no-video")
+
+        self.player = vlc_instance.media_player_new()
+        self.player.set_media(self.media)
+
+        self.duration = DEFAULT_ALARM_DURATION
+
+    def load(self) -> None:
+        """Parses the clip to measure its duration, blocking until parsed."""
+
+        parsed = threading.Event()
+
+        def handle_parsed(event) -> None:
+            parsed.set()
+
+        self.media.event_manager().event_attach(vlc.EventType.MediaParsedChanged, handle_parsed)
+        self.media.parse_with_options(vlc.MediaParseFlag.local, ALARM_PARSE_TIMEOUT_MS)
+        parsed.wait(ALARM_PARSE_TIMEOUT_MS / 1000)
+
+        duration_ms = self.media.get_duration()
+        if duration_ms > 0:
+            self.duration = duration_ms / 1000
+        else:
+            logger.error(f"Failed to measure the duration of alarm {self.path}, using {self.duration}s")
+
+    def play(self, volume: int) -> None:
+        self.player.stop()
+        self.player.audio_set_volume(volume)
+        self.player.play()
+
+
+class AlarmPlayer():
+    """Plays alarm sounds without blocking the caller, lowering the volume of the audio
+    controller's stream for the length of the alarm.
+
+    Clips are loaded in the background by preload, and played from a dedicated worker thread so
+    they are never queued behind other audio work.
+
+    @param audio_controller: Instance of an audio controller, whose stream is ducked during alarms.
+    @param paths: Paths of the alarm sounds to load."""
+
+    def __init__(self, audio_controller: audio_ac.AudioController, paths: Iterable[str]) -> None:
+        self.audio_controller = audio_controller
+        self.paths = list(paths)
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alarm")
+        self.clips: Dict[str, AlarmClip] = {}
+
+        self.unduck_timer = None
+        self.unduck_lock = threading.Lock()
+
+    def preload(self) -> None:
+        """Starts loading the clips in the background."""
+        self.executor.submit(self.__load_clips, self.paths)
+
+    def play(self, path: str) -> None:
+        """Plays an alarm sound, returning immediately."""
+
+        self.executor.submit(self.__play, path)
+
+    def __load_clips(self, paths: Iterable[str]) -> None:
+        vlc_instance = audio_ae.get_audio_engine().vlc_instance
+
+        for path in paths:
+            if path in self.clips:
+                continue
+
+            try:
+                clip = AlarmClip(vlc_instance, path)
+                clip.load()
+                self.clips[path] = clip
+            except Exception as e:
+                logger.error(f"Failed to load alarm {path}. Full message: {e}")
+
+    def __play(self, path: str) -> None:
+        clip = self.clips.get(path)
+        if clip is None:
+            # Only if loading failed
+            clip = self.clips[path] = AlarmClip(audio_ae.get_audio_engine().vlc_instance, path)
+
+        with self.unduck_lock:
+            if self.unduck_timer:
+                self.unduck_timer.cancel()
+
+            self.audio_controller.duck(ALARM_DUCK_AMOUNT)
+
+            self.unduck_timer = threading.Timer(clip.duration, self.audio_controller.unduck)
+            self.unduck_timer.daemon = True
+            self.unduck_timer.start()
+
+        clip.play(self.audio_controller.get_volume())
@@ -1,33 +1,64 @@
-import concurrent.futures
-import re
-import urllib.request
+from concurrent.futures import Future
+from typing import Callable, Tuple
+import threading
 
-import stargazing.audio.audio_player as audio_ap
+import stargazing.audio.audio_engine as audio_ae
+import stargazing.audio.youtube_search as audio_ys
 import stargazing.config.config as config
-from stargazing.utils.helper_funcs import silent_stderr, start_daemon_thread
+from stargazing.utils.helper_funcs import check_null_fn, start_daemon_thread
+from stargazing.utils.logger import logger
 
 
 class AudioController():
     """Audio manager, pre-loads the audio players specified in the settings.json and allows audio players to be created and stream via YouTube search
 
-    @param volume: Initial volume level."""
+    @param volume: Initial volume level.
+    @param on_state_change: Callback function to run when the playing state changes, may be called from any thread."""
+
+    def __init__(self, volume=100, on_state_change: Callable[[], None] = None) -> None:
+        self.on_state_change = check_null_fn(on_state_change)
+
+        self.youtube_search = audio_ys.YoutubeSearch(config.get_youtube_search_url())
 
-    def __init__(self, volume=100) -> None:
         self.saved_youtube_player_urls = config.get_saved_youtube_player_urls()
         self.loaded_players = {
             name: None for name in self.saved_youtube_player_urls}
-        start_daemon_thread(target=self.__load_audio_players)
+
+        # (youtube url, player name) of the player to play once loaded, superseded by any later request
+        self.pending_request = None
+        self.pending_request_lock = threading.Lock()
 
         self.playing = None
         self.playing_name = "offline"
 
         self.volume = volume
+        # Amount the stream volume is currently lowered by, e.g. while an alarm plays
+        self.ducked = 0
+
+    @property
+    def engine(self) -> audio_ae.AudioEngine:
+        # Created on first use, as creating it loads VLC
+        return audio_ae.get_audio_engine()
+
+    def start_loading(self) -> None:
+        """Starts loading the saved players in the background."""
+        start_daemon_thread(target=self.__load_audio_players)
+
+    @property
+    def playing_name(self) -> str:
+        return self._playing_name
+
+    @playing_name.setter
+    def playing_name(self, name: str) -> None:
+        self._playing_name = name
+        self.on_state_change()
 
     def stop(self) -> None:
         if self.playing:
             self.playing.stop()
 
     def offline(self) -> None:
+        self.__cancel_pending_request()
         self.stop()
         self.playing = None
         self.playing_name = "offline"
@@ -35,70 +66,127 @@ class AudioController():
     def set_volume(self, vol: int) -> None:
         self.volume = vol
         if self.playing:
-            self.playing.set_volume(vol)
+            self.playing.set_volume(self.stream_volume)
 
     def get_volume(self) -> int:
         return self.volume
 
+    @property
+    def stream_volume(self) -> int:
+        return max(self.volume - self.ducked, 0)
+
+    def duck(self, amount: int) -> None:
+        """Lowers the stream volume by the given amount, without changing the volume setting."""
+
+        self.ducked = amount
+        if self.playing:
+            self.playing.set_volume(self.stream_volume)
+
+    def unduck(self) -> None:
+        self.duck(0)
+
     def set_loaded_player(self, loaded_player_name: str) -> None:
-        """Stops the current player, loads the given player name and closes the menu"""
+        """Stops the current player and plays the given loaded player, waiting for it to load if
+        it has not yet (not enough time or error)"""
 
         self.stop()
 
-        # If player has not loaded (not enough time or error)
-        if not self.loaded_players[loaded_player_name]:
-            start_daemon_thread(target=self.set_youtube_player_from_url,
-                                args=[self.saved_youtube_player_urls[loaded_player_name], loaded_player_name])
-            # TODO: set self.loaded_players[loaded_player_name] with this player
+        player = self.loaded_players[loaded_player_name]
+        if not player:
+            self.__request_player(self.saved_youtube_player_urls[loaded_player_name], loaded_player_name)
+            return
 
-        # If player has loaded
-        else:
-            self.playing = self.loaded_players[loaded_player_name]
-            self.playing_name = loaded_player_name
+        self.__cancel_pending_request()
 
-            self.playing.set_volume(self.volume)
-            self.playing.play()
+        self.playing = player
+        self.playing_name = loaded_player_name
 
-    def set_youtube_player_from_url(self, youtube_url: str, player_name="") -> str:
+        self.playing.set_volume(self.stream_volume)
+        self.playing.play()
 
+    def set_youtube_player_from_url(self, youtube_url: str, player_name="") -> None:
         self.stop()
+        self.__request_player(youtube_url, player_name)
 
-        self.playing_name = "loading audio..."
-        self.playing = audio_ap.YoutubeAudioPlayer.safe_create(
-            youtube_url, True)
+    def search_youtube(self, search_query: str) -> Future:
+        """Returns a future resolving to the YouTube urls found for the query."""
+        return self.youtube_search.search(search_query)
 
-        if self.playing:
-            self.playing_name = self.playing.video_titles[0] if not player_name else player_name
-            self.playing.set_volume(self.volume)
-            self.playing.play()
-        else:
-            self.playing_name = "error loading audio"
+    def resolve_youtube_url(self, youtube_url: str) -> Future:
+        """Returns a future resolving to the (title, stream url) of the YouTube url."""
+        return self.engine.resolve_youtube_url(youtube_url)
 
-    def set_youtube_player_from_query(self, search_query: str) -> str:
+    def set_youtube_player_from_query(self, search_query: str) -> None:
 
         self.stop()
 
         self.playing_name = "searching youtube..."
 
-        search = search_query.replace(" ", "+")
-        youtube_search = f"https://www.youtube.com/results?search_query={search}"
+        def handle_search_results(future: Future) -> None:
+            urls = future.result() if not future.exception() else []
+            if urls:
+                self.set_youtube_player_from_url(urls[0])
+            else:
+                self.playing_name = "no search results"
 
-        html = urllib.request.urlopen(youtube_search)
-        video_ids = re.findall(r"watch\?v=(\S{11})", html.read().decode())
-        url = "https://www.youtube.com/watch?v=" + video_ids[0]
+        self.search_youtube(search_query).add_done_callback(handle_search_results)
 
-        self.set_youtube_player_from_url(url)
+    def __request_player(self, youtube_url: str, player_name: str) -> None:
+        """Loads a player and plays it once loaded, unless another player is requested first."""
 
-    def __load_audio_players(self) -> None:
-        silent_yt_audio_init = silent_stderr(
-            lambda url: audio_ap.YoutubeAudioPlayer.safe_create(url, True))
+        self.__cancel_pending_request()
+
+        request = (youtube_url, player_name)
+        with self.pending_request_lock:
+            self.pending_request = request
+
+        self.playing = None
+        self.playing_name = "loading audio..."
+
+        future = self.engine.load_youtube_player(youtube_url, True)
+        future.add_done_callback(lambda future: self.__handle_requested_player_loaded(request, future))
 
-        with concurrent.futures.ThreadPoolExecutor() as exec:
-            futures_to_name = {exec.submit(
-                silent_yt_audio_init, url): name for name, url in self.saved_youtube_player_urls.items()}
+    def __cancel_pending_request(self) -> None:
+        with self.pending_request_lock:
+            request, self.pending_request = self.pending_request, None
 
-            for future in concurrent.futures.as_completed(futures_to_name):
-                name = futures_to_name[future]
-                player = future.result()
+        if request:
+            self.engine.cancel(request[0], True)
 
-                self.loaded_players[name] = player
+    def __handle_requested_player_loaded(self, request: Tuple[str, str], future: Future) -> None:
+        if future.cancelled():
+            return
+
+        player = future.result()
+        youtube_url, player_name = request
+
+        if player and self.saved_youtube_player_urls.get(player_name) == youtube_url:
+            self.loaded_players[player_name] = player
+
+        with self.pending_request_lock:
+            if self.pending_request is not request:
+                return
+            self.pending_request = None
+
+        if player:
+            self.playing = player
+            self.playing_name = player_name if player_name else player.video_titles[0]
+            self.playing.set_volume(self.stream_volume)
+            self.playing.play()
+        else:
+            self.playing_name = "error loading audio"
+
+    def __load_audio_players(self) -> None:
+        try:
+            engine = self.engine
+        except Exception as e:
+            logger.error(f"Failed to start the audio engine. Full message: {e}")
+            return
+
+        for name, url in self.saved_youtube_player_urls.items():
+            future = engine.load_youtube_player(url, True)
+            future.add_done_callback(lambda future, name=name: self.__store_loaded_player(name, future))
+
+    def __store_loaded_player(self, name: str, future: Future) -> None:
+        if not future.cancelled() and future.result():
+            self.loaded_players[name] = future.result()
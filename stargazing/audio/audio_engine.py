@@ -0,0 +1,126 @@
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Hashable, Iterable, Tuple, Union
+import threading
+
+import stargazing.audio.audio_player as audio_ap
+import stargazing.audio.stream_cache as audio_sc
+from stargazing.utils.helper_funcs import check_iterable, silent_stderr
+from stargazing.utils.lazy_import import LazyModule
+
+vlc = LazyModule("vlc")
+
+MAX_LOAD_WORKERS = 4
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_pending_jobs() -> int:
+    """Returns the number of jobs queued or running on the audio engine, without creating it."""
+    return _engine.pending_jobs if _engine is not None else 0
+
+
+def get_audio_engine() -> AudioEngine:
+    """Returns the audio engine shared by all audio players."""
+
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AudioEngine()
+        return _engine
+
+
+class AudioEngine():
+    """Owns the single VLC instance used by every audio player, and a bounded pool of workers
+    loading YouTube audio players.
+
+    Loads of the same urls are deduplicated - while a load is in progress every request for it
+    shares the same future. A future is only cancelled once every request sharing it has been
+    cancelled, and only if its load has not started.
+
+    @param max_workers: Number of YouTube audio players loaded at once."""
+
+    def __init__(self, max_workers: int = MAX_LOAD_WORKERS) -> None:
+        self.vlc_instance = vlc.Instance()
+        self.vlc_instance.log_unset()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-load")
+
+        self.lock = threading.Lock()
+        # Loads in progress and the number of requests sharing each
+        self.loads: Dict[Hashable, Future] = {}
+        self.load_refs: Dict[Hashable, int] = {}
+
+        # Kept apart from the loads lock, as loads submit their job while holding it
+        self.pending_jobs_lock = threading.Lock()
+        self.pending_jobs = 0
+
+    def load_youtube_player(self, youtube_urls: Union[str, Iterable[str]], loop=False) -> Future:
+        """Returns a future resolving to a YouTube audio player for the urls, or None if the player
+        could not be created. Joins the load already in progress for the same urls if there is one."""
+
+        key = self.__load_key(youtube_urls, loop)
+
+        with self.lock:
+            future = self.loads.get(key)
+            if future is not None:
+                self.load_refs[key] += 1
+                return future
+
+            future = self.__submit(silent_stderr(audio_ap.YoutubeAudioPlayer.safe_create), list(key[0]), loop)
+            self.loads[key] = future
+            self.load_refs[key] = 1
+
+        future.add_done_callback(lambda _: self.__finish_load(key, future))
+        return future
+
+    def resolve_youtube_url(self, youtube_url: str, stream_cache: audio_sc.StreamCache = None) -> Future:
+        """Returns a future resolving to the (title, play url) of a YouTube url, resolved with the
+        given stream cache or the shared one."""
+
+        if stream_cache is None:
+            stream_cache = audio_ap.get_stream_cache()
+
+        return self.__submit(silent_stderr(stream_cache.resolve), youtube_url)
+
+    def cancel(self, youtube_urls: Union[str, Iterable[str]], loop=False) -> bool:
+        """Drops one request for the load of the urls, cancelling the load if no other request
+        shares it and it has not started. Returns whether the load was cancelled."""
+
+        key = self.__load_key(youtube_urls, loop)
+
+        with self.lock:
+            future = self.loads.get(key)
+            if future is None:
+                return False
+
+            self.load_refs[key] -= 1
+            if self.load_refs[key] > 0:
+                return False
+
+        return future.cancel()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __submit(self, fn, *args) -> Future:
+        with self.pending_jobs_lock:
+            self.pending_jobs += 1
+
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self.__finish_job)
+        return future
+
+    def __finish_job(self, future: Future) -> None:
+        with self.pending_jobs_lock:
+            self.pending_jobs -= 1
+
+    def __finish_load(self, key: Hashable, future: Future) -> None:
+        with self.lock:
+            if self.loads.get(key) is future:
+                del self.loads[key]
+                del self.load_refs[key]
+
+    def __load_key(self, youtube_urls: Union[str, Iterable[str]], loop: bool) -> Tuple[Tuple[str, ...], bool]:
+        return tuple(check_iterable(youtube_urls)), loop
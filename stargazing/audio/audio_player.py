@@ -1,19 +1,55 @@
 from __future__ import annotations  # allow typing of own class inside its class
-from typing import Iterable, Union
-
-import pafy
-import pafy.backend_youtube_dl  # prevent lazy importing
-import vlc
+from functools import partial
+from typing import Dict, Iterable, Tuple, Union
+import threading
+import time
 
+import stargazing.audio.audio_engine as audio_ae
+import stargazing.audio.stream_cache as audio_sc
 from stargazing.utils.helper_funcs import check_iterable
+from stargazing.utils.lazy_import import LazyModule
 from stargazing.utils.logger import logger
+import stargazing.utils.metrics as metrics
+
+# Imported on first use, as they are slow to import and not needed to draw the first frame
+pafy = LazyModule("pafy", "pafy.backend_youtube_dl")
+vlc = LazyModule("vlc")
+
+# Longest time spent prefetching the next playlist item's stream
+PREFETCH_TIMEOUT_MS = 5000
+
+# Times an item's play url is refreshed after playback failures within PLAYBACK_RETRY_WINDOW
+# seconds, before the item is skipped. Failures after the window, e.g. a url expiring hours later,
+# are retried again.
+MAX_PLAYBACK_RETRIES = 2
+PLAYBACK_RETRY_WINDOW = 60
+
+_stream_cache = None
+_stream_cache_lock = threading.Lock()
+
+
+@metrics.timed("audio.resolve")
+def resolve_youtube_url(youtube_url: str) -> Tuple[str, str]:
+    """Returns the (title, play url) of the best stream for a YouTube url."""
+
+    video = pafy.new(youtube_url)
+    return video.title, video.getbest().url
+
+
+def get_stream_cache() -> audio_sc.StreamCache:
+    """Returns the stream cache shared by all YouTube audio players."""
+
+    global _stream_cache
+    with _stream_cache_lock:
+        if _stream_cache is None:
+            _stream_cache = audio_sc.StreamCache(resolve_youtube_url)
+        return _stream_cache
 
 
 class AudioPlayer():
 
     def __init__(self, sources: Union[str, Iterable[str]], loop=False):
-        self.vlc_instance = vlc.Instance()
-        self.vlc_instance.log_unset()
+        self.vlc_instance = audio_ae.get_audio_engine().vlc_instance
 
         self.player = self.vlc_instance.media_list_player_new()
         self.media_list = self.create_media_list(check_iterable(sources))
@@ -27,12 +63,15 @@ class AudioPlayer():
         media_list = self.vlc_instance.media_list_new()
 
         for source in sources:
-            media = self.vlc_instance.media_new(source)
-            media.add_option(":no-video")
-            media_list.add_media(media)
+            media_list.add_media(self.create_media(source))
 
         return media_list
 
+    def create_media(self, source: str) -> vlc.Media:
+        media = self.vlc_instance.media_new(source)
+        media.add_option(":no-video")
+        return media
+
     def play(self) -> None:
         self.player.play()
 
@@ -45,36 +84,223 @@ class AudioPlayer():
     def set_volume(self, vol: int) -> None:
         self.player.get_media_player().audio_set_volume(vol)
 
+    def set_sources(self, sources: Iterable[str]) -> None:
+        self.media_list = self.create_media_list(sources)
+        self.player.set_media_list(self.media_list)
+
+    def add_source(self, source: str) -> None:
+        self.media_list.lock()
+        self.media_list.add_media(self.create_media(source))
+        self.media_list.unlock()
+
+    def replace_source(self, index: int, source: str) -> None:
+        self.media_list.lock()
+        self.media_list.remove_index(index)
+        self.media_list.insert_media(self.create_media(source), index)
+        self.media_list.unlock()
+
     def get_volume(self) -> int:
         return self.player.get_media_player().audio_get_volume()
 
 
 class YoutubeAudioPlayer(AudioPlayer):
+    """Audio player for YouTube urls. Play urls are taken from the stream cache when possible, and
+    are refreshed in the background if playback fails (e.g. the play url has expired). An item that
+    keeps failing after MAX_PLAYBACK_RETRIES refreshes is skipped.
+
+    With several urls the player is a playlist - it is ready to play once the first url resolves,
+    the rest resolve concurrently on the audio engine and are added to the media list (in order) as
+    they finish. When an item starts playing, the next item's stream is refreshed if needed and
+    prefetched.
+
+    @param youtube_urls: YouTube url or urls to play.
+    @param loop: Loop the urls.
+    @param stream_cache: Cache to resolve the urls with, defaults to the shared stream cache."""
+
+    def __init__(self, youtube_urls: Union[str, Iterable[str]], loop=False,
+                 stream_cache: audio_sc.StreamCache = None) -> None:
+
+        self.youtube_urls = list(check_iterable(youtube_urls))
+        self.stream_cache = stream_cache if stream_cache is not None else get_stream_cache()
+        self.loop = loop
+
+        # Youtube urls, titles and play urls of the items in the media list, in order
+        self.loaded_urls = []
+        self.video_titles = []
+        self.playurls = []
+        self.playlist_lock = threading.Lock()
 
-    def __init__(self, youtube_urls: Union[str, Iterable[str]], loop=False) -> None:
+        # Youtube url to (failures, time of the first failure) within the retry window
+        self.playback_failures: Dict[str, Tuple[int, float]] = {}
+
+        title, playurl = self.stream_cache.resolve(self.youtube_urls[0])
+        self.loaded_urls.append(self.youtube_urls[0])
+        self.video_titles.append(title)
+        self.playurls.append(playurl)
 
-        self.video_titles, self.playurls = self.__get_youtube_titles_and_playurls(
-            youtube_urls)
         super().__init__(self.playurls, loop)
 
-    def __get_youtube_titles_and_playurls(self, youtube_urls: Union[str, Iterable[str]]):
-        titles = []
-        playurls = []
+        self.player.get_media_player().event_manager().event_attach(
+            vlc.EventType.MediaPlayerEncounteredError, self.__handle_playback_error)
+
+        if len(self.youtube_urls) > 1:
+            self.player.event_manager().event_attach(
+                vlc.EventType.MediaListPlayerNextItemSet, self.__handle_next_item_set)
+            self.__resolve_remaining_urls()
+
+    # ========================================================
+    # Playlist loading
+    # ========================================================
+
+    def __resolve_remaining_urls(self) -> None:
+        engine = audio_ae.get_audio_engine()
+
+        # Resolved (youtube url, title, play url) by position, None where resolving failed
+        resolved = {}
+        next_position = [1]
+
+        def handle_resolved(position: int, youtube_url: str, future) -> None:
+            if future.cancelled() or future.exception():
+                logger.error(f"Failed to resolve playlist item {youtube_url}")
+                resolved[position] = None
+            else:
+                resolved[position] = (youtube_url, *future.result())
+
+            # Add every item that is now next in order
+            with self.playlist_lock:
+                while next_position[0] in resolved:
+                    item = resolved.pop(next_position[0])
+                    next_position[0] += 1
+
+                    if item is not None:
+                        self.loaded_urls.append(item[0])
+                        self.video_titles.append(item[1])
+                        self.playurls.append(item[2])
+                        self.add_source(item[2])
+
+        for position, youtube_url in enumerate(self.youtube_urls[1:], 1):
+            future = engine.resolve_youtube_url(youtube_url, self.stream_cache)
+            future.add_done_callback(partial(handle_resolved, position, youtube_url))
+
+    def __handle_next_item_set(self, event) -> None:
+        # Called from a VLC thread, which must not call back into VLC
+        threading.Thread(target=self.__prefetch_next_item, daemon=True).start()
+
+    def __prefetch_next_item(self) -> None:
+        """Refreshes the play url of the item after the current one if it has expired, and
+        prefetches its stream so it is ready when the current item ends."""
+
+        index = self.__get_current_index()
+        if index is None:
+            return
+
+        with self.playlist_lock:
+            next_index = index + 1
+            if next_index >= len(self.playurls):
+                if not self.loop or len(self.playurls) < len(self.youtube_urls):
+                    return
+                next_index = 0
+            youtube_url, playurl = self.loaded_urls[next_index], self.playurls[next_index]
+
+        try:
+            title, new_playurl = self.stream_cache.resolve(youtube_url)
+        except Exception as e:
+            logger.error(f"Failed to prefetch playlist item {youtube_url}. Full message: {e}")
+            return
+
+        with self.playlist_lock:
+            if new_playurl != playurl:
+                self.video_titles[next_index] = title
+                self.playurls[next_index] = new_playurl
+                self.replace_source(next_index, new_playurl)
+
+            media = self.media_list.item_at_index(next_index)
+
+        if media:
+            media.parse_with_options(vlc.MediaParseFlag.network, PREFETCH_TIMEOUT_MS)
+
+    def __get_current_index(self) -> Union[int, None]:
+        media = self.player.get_media_player().get_media()
+        playurl = media.get_mrl() if media else None
+
+        with self.playlist_lock:
+            return self.playurls.index(playurl) if playurl in self.playurls else None
+
+    # ========================================================
+    # Playback errors
+    # ========================================================
+
+    def __handle_playback_error(self, event) -> None:
+        # Called from a VLC thread, which must not call back into VLC, so the failed url is found
+        # and refreshed from another thread
+        threading.Thread(target=self.__refresh_failed_playurl, daemon=True).start()
+
+    def __refresh_failed_playurl(self) -> None:
+        index = self.__get_current_index()
+        if index is None:
+            index = 0
+
+        with self.playlist_lock:
+            youtube_url, failed_playurl = self.loaded_urls[index], self.playurls[index]
+
+        if not self.__count_playback_failure(youtube_url):
+            logger.error(f"Playback of {youtube_url} keeps failing, skipping it")
+            self.__skip_failed_item(index)
+            return
+
+        logger.info(f"Playback of {youtube_url} failed, refreshing its stream url")
+
+        def handle_refresh(title: str, playurl: str) -> None:
+            with self.playlist_lock:
+                self.video_titles[index] = title
+                self.playurls[index] = playurl
+                self.replace_source(index, playurl)
+            self.player.play_item_at_index(index)
+
+        # The cache may already hold a newer play url from a background refresh
+        cached = self.stream_cache.get(youtube_url)
+        if cached and cached[1] != failed_playurl:
+            handle_refresh(*cached)
+            return
+
+        self.stream_cache.invalidate(youtube_url)
+        self.stream_cache.refresh_in_background(youtube_url, handle_refresh)
+
+    def __count_playback_failure(self, youtube_url: str) -> bool:
+        """Counts a playback failure of the url, returning whether it should be retried."""
+
+        now = time.monotonic()
+        failures, first_failure_time = self.playback_failures.get(youtube_url, (0, now))
+        if now - first_failure_time > PLAYBACK_RETRY_WINDOW:
+            failures, first_failure_time = 0, now
+
+        self.playback_failures[youtube_url] = (failures + 1, first_failure_time)
+        return failures < MAX_PLAYBACK_RETRIES
+
+    def __is_failing(self, youtube_url: str) -> bool:
+        failures, first_failure_time = self.playback_failures.get(youtube_url, (0, 0))
+        return failures > MAX_PLAYBACK_RETRIES and time.monotonic() - first_failure_time <= PLAYBACK_RETRY_WINDOW
 
-        for youtube_url in check_iterable(youtube_urls):
-            video = pafy.new(youtube_url)
-            titles.append(video.title)
+    def __skip_failed_item(self, index: int) -> None:
+        """Plays the next item that is not failing, stopping if there is none."""
 
-            best = video.getbest()
-            playurl = best.url
-            playurls.append(playurl)
+        with self.playlist_lock:
+            item_count = len(self.loaded_urls)
+            # Only wrap around when looping
+            next_indexes = range(index + 1, index + item_count) if self.loop else range(index + 1, item_count)
+            next_index = next((i % item_count for i in next_indexes
+                               if not self.__is_failing(self.loaded_urls[i % item_count])), None)
 
-        return titles, playurls
+        if next_index is None:
+            self.player.stop()
+        else:
+            self.player.play_item_at_index(next_index)
 
     @staticmethod
-    def safe_create(youtube_urls: Union[str, Iterable[str]], loop=False) -> Union[None, YoutubeAudioPlayer]:
+    def safe_create(youtube_urls: Union[str, Iterable[str]], loop=False,
+                    stream_cache: audio_sc.StreamCache = None) -> Union[None, YoutubeAudioPlayer]:
         try:
-            yt_audio_player = YoutubeAudioPlayer(youtube_urls, loop)
+            yt_audio_player = YoutubeAudioPlayer(youtube_urls, loop, stream_cache)
             return yt_audio_player
         except Exception as e:
             logger.error(
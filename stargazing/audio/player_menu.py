@@ -1,9 +1,9 @@
 from blessed import Terminal
+from concurrent.futures import Future
 from functools import partial
-from typing import Callable
+from typing import Callable, Dict, List, Union
 
 import stargazing.audio.audio_controller as audio_ac
-from stargazing.utils.helper_funcs import start_daemon_thread
 from stargazing.utils.menu import Menu
 
 
@@ -23,6 +23,14 @@ class PlayerMenu(Menu):
         self.search_youtube_mode = False
         self.search_youtube_query = ""
 
+        # Search results are listed below the search item, with titles filled in as they resolve
+        self.search_item_index = None
+        self.search_future = None
+        self.search_titles: Dict[str, str] = {}
+        self.title_futures: List[Future] = []
+        # Results from the search thread, shown on the next render
+        self.pending_search_results = None
+
         self.setup_menu()
 
     def set_offline_and_close(self) -> None:
@@ -34,23 +42,22 @@ class PlayerMenu(Menu):
         super().handle_close()
         self.audio_controller.set_loaded_player(loaded_player_name)
 
-    def set_youtube_player_from_url_and_close(self, player_name: str, youtube_url: str) -> str:
+    def set_youtube_player_from_url_and_close(self, youtube_url: str, player_name="") -> None:
         super().handle_close()
         self.audio_controller.set_youtube_player_from_url(
-            player_name, youtube_url)
+            youtube_url, player_name)
 
-    def set_youtube_player_from_query_and_close(self, search_query: str) -> str:
-        super().handle_close()
-        self.audio_controller.set_youtube_player_from_query(search_query)
+    def set_search_result_and_close(self, youtube_url: str) -> None:
+        self.set_youtube_player_from_url_and_close(youtube_url, self.search_titles.get(youtube_url, ""))
 
     def start_search_youtube_mode(self):
         self.search_youtube_mode = True
-        super().replace_item(-1,
+        super().replace_item(self.search_item_index,
                              "> search youtube", self.finish_search_youtube_mode)
 
     def update_search_youtube_query(self, query):
         self.search_youtube_query = query
-        super().replace_item(-1, "> " + self.search_youtube_query +
+        super().replace_item(self.search_item_index, "> " + self.search_youtube_query +
                              self.term.lightsteelblue1("█"), self.finish_search_youtube_mode)
 
     def cancel_search_youtube_mode(self):
@@ -60,14 +67,31 @@ class PlayerMenu(Menu):
     def finish_search_youtube_mode(self):
         self.search_youtube_query = self.search_youtube_query.strip()
 
+        self.search_youtube_mode = False
+        super().replace_item(self.search_item_index,
+                             self.term.underline("search youtube"), self.start_search_youtube_mode)
+
         if self.search_youtube_query:
-            start_daemon_thread(target=self.set_youtube_player_from_query_and_close, args=(
-                self.search_youtube_query,))
+            self.search_youtube(self.search_youtube_query)
 
         self.search_youtube_query = ""
-        self.search_youtube_mode = False
-        super().replace_item(-1,
-                             self.term.underline("search youtube"), self.start_search_youtube_mode)
+
+    def search_youtube(self, search_query: str) -> None:
+        """Searches YouTube in the background, listing the results below the search item once found."""
+
+        self.__cancel_title_futures()
+        self.__show_search_results(None)
+
+        future = self.audio_controller.search_youtube(search_query)
+        self.search_future = future
+        future.add_done_callback(self.__handle_search_done)
+
+    def get_print_strings(self) -> str:
+        pending_search_results, self.pending_search_results = self.pending_search_results, None
+        if pending_search_results is not None:
+            self.__show_search_results(pending_search_results)
+
+        return super().get_print_strings()
 
     def setup_menu(self) -> None:
         super().add_item("offline", self.set_offline_and_close)
@@ -77,8 +101,8 @@ class PlayerMenu(Menu):
                 self.set_loaded_player_and_close, loaded_player_name)
             super().add_item(loaded_player_name, on_item_select)
 
-        super().add_item(self.term.underline("search youtube"),
-                         self.start_search_youtube_mode)
+        self.search_item_index = super().add_item(self.term.underline("search youtube"),
+                                                  self.start_search_youtube_mode)
         super().set_hover(0)
 
     def handle_key_up(self) -> None:
@@ -114,3 +138,56 @@ class PlayerMenu(Menu):
 
         new_query = self.search_youtube_query + char
         self.update_search_youtube_query(new_query)
+
+    # ========================================================
+    # Search results
+    # ========================================================
+
+    def __handle_search_done(self, future: Future) -> None:
+        # Called from the search thread
+        if future is not self.search_future:
+            return
+
+        self.pending_search_results = future.result() if not future.exception() else []
+        self.audio_controller.on_state_change()
+
+    def __handle_title_resolved(self, titles: Dict[str, str], youtube_url: str, future: Future) -> None:
+        # Called from an audio engine or daemon client thread
+        if future.cancelled():
+            return
+
+        titles[youtube_url] = future.result()[0] if not future.exception() else "error loading title"
+        self.audio_controller.on_state_change()
+
+    def __show_search_results(self, youtube_urls: Union[List[str], None]) -> None:
+        """Replaces the items below the search item with the given results, or a searching
+        placeholder if None."""
+
+        while len(self.items) > self.search_item_index + 1:
+            super().remove_item(-1)
+
+        if youtube_urls is None:
+            super().add_item(self.term.gray50("  searching..."))
+            return
+
+        if not youtube_urls:
+            super().add_item(self.term.gray50("  no results"))
+            return
+
+        titles = self.search_titles = {}
+
+        for youtube_url in youtube_urls:
+            super().add_item(lambda youtube_url=youtube_url: "  " + titles.get(youtube_url, "loading..."),
+                             partial(self.set_search_result_and_close, youtube_url),
+                             depends_on=lambda youtube_url=youtube_url: titles.get(youtube_url))
+
+            future = self.audio_controller.resolve_youtube_url(youtube_url)
+            future.add_done_callback(partial(self.__handle_title_resolved, titles, youtube_url))
+            self.title_futures.append(future)
+
+        super().set_hover(self.search_item_index + 1)
+
+    def __cancel_title_futures(self) -> None:
+        for future in self.title_futures:
+            future.cancel()
+        self.title_futures = []
@@ -0,0 +1,177 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+import os
+import os.path as path
+import threading
+import time
+import ujson
+
+from stargazing.utils.logger import logger
+
+STREAM_CACHE_PATH = f"{path.dirname(path.abspath(__file__))}/../data/stream_cache.json"
+
+# Used when a play url has no expire parameter
+DEFAULT_TTL = 6 * 60 * 60
+
+# Entries are refreshed in the background once they are this close to expiring
+REFRESH_MARGIN = 10 * 60
+
+MAX_ENTRIES = 64
+
+# Resolves a YouTube url to its (title, play url)
+Resolver = Callable[[str], Tuple[str, str]]
+
+
+def get_play_url_expiry(play_url: str, resolved_at: float) -> float:
+    """Returns the expiry time of a play url from its expire query parameter."""
+
+    try:
+        return float(parse_qs(urlparse(play_url).query)["expire"][0])
+    except (KeyError, IndexError, ValueError):
+        return resolved_at + DEFAULT_TTL
+
+
+class LocalResolver():
+    """Resolver answering from a fixed mapping, for testing without network access.
+
+    @param streams: Mapping of YouTube url to (title, play url)."""
+
+    def __init__(self, streams: Dict[str, Tuple[str, str]]) -> None:
+        self.streams = streams
+        self.calls = []
+
+    def __call__(self, youtube_url: str) -> Tuple[str, str]:
+        self.calls.append(youtube_url)
+        return self.streams[youtube_url]
+
+
+class StreamCache():
+    """Persistent cache of resolved YouTube titles and play urls.
+
+    Entries expire according to the play url's expire parameter and the least recently used
+    entries are evicted once there are more than max_entries.
+
+    @param resolver: Function resolving a YouTube url to its (title, play url).
+    @param cache_path: Path of the persisted cache file, None to keep the cache in memory only.
+    @param max_entries: Number of entries kept before evicting the least recently used."""
+
+    def __init__(self, resolver: Resolver, cache_path: Union[str, None] = STREAM_CACHE_PATH,
+                 max_entries: int = MAX_ENTRIES) -> None:
+        self.resolver = resolver
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.refreshing = set()
+
+        self.__load()
+
+    def get(self, youtube_url: str) -> Union[Tuple[str, str], None]:
+        """Returns the cached (title, play url) if it has not expired."""
+
+        with self.lock:
+            entry = self.entries.get(youtube_url)
+            if entry is None or entry["expires"] <= time.time():
+                return None
+
+            self.entries.move_to_end(youtube_url)
+            return entry["title"], entry["play_url"]
+
+    def resolve(self, youtube_url: str, refresh_in_background=True) -> Tuple[str, str]:
+        """Returns the (title, play url) for a YouTube url, resolving it only if it is not cached or
+        has expired. Entries close to expiring are returned and refreshed in the background."""
+
+        cached = self.get(youtube_url)
+        if cached is None:
+            return self.refresh(youtube_url)
+
+        if refresh_in_background and self.__expires_soon(youtube_url):
+            self.refresh_in_background(youtube_url)
+
+        return cached
+
+    def refresh(self, youtube_url: str) -> Tuple[str, str]:
+        """Resolves a YouTube url, replacing any cached entry."""
+
+        title, play_url = self.resolver(youtube_url)
+        resolved_at = time.time()
+
+        with self.lock:
+            self.entries[youtube_url] = {
+                "title": title,
+                "play_url": play_url,
+                "expires": get_play_url_expiry(play_url, resolved_at)
+            }
+            self.entries.move_to_end(youtube_url)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        self.__save()
+        return title, play_url
+
+    def refresh_in_background(self, youtube_url: str, on_refresh: Callable[[str, str], None] = None) -> None:
+        """Resolves a YouTube url in a background thread, calling on_refresh with the new
+        (title, play url) if given. Does nothing if the url is already being refreshed."""
+
+        with self.lock:
+            if youtube_url in self.refreshing:
+                return
+            self.refreshing.add(youtube_url)
+
+        def refresh() -> None:
+            try:
+                title, play_url = self.refresh(youtube_url)
+                if on_refresh:
+                    on_refresh(title, play_url)
+            except Exception as e:
+                logger.error(f"Failed to refresh stream url for {youtube_url}. Full message: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(youtube_url)
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def invalidate(self, youtube_url: str) -> None:
+        with self.lock:
+            self.entries.pop(youtube_url, None)
+
+        self.__save()
+
+    def __expires_soon(self, youtube_url: str) -> bool:
+        with self.lock:
+            entry = self.entries.get(youtube_url)
+            return entry is not None and entry["expires"] - REFRESH_MARGIN <= time.time()
+
+    def __load(self) -> None:
+        if self.cache_path is None or not path.exists(self.cache_path):
+            return
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                entries = ujson.load(file)
+
+            now = time.time()
+            for youtube_url, entry in entries:
+                if entry["expires"] > now:
+                    self.entries[youtube_url] = entry
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Failed to load stream cache {self.cache_path}. Full message: {e}")
+
+    def __save(self) -> None:
+        if self.cache_path is None:
+            return
+
+        with self.lock:
+            # Saved as a list to keep the least recently used order
+            entries = list(self.entries.items())
+
+        tmp_path = f"{self.cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            ujson.dump(entries, file)
+        os.replace(tmp_path, self.cache_path)
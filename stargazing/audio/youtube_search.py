@@ -0,0 +1,200 @@
+from __future__ import annotations
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Union
+from urllib.parse import urlencode, urlparse
+import os
+import os.path as path
+import re
+import threading
+import ujson
+
+from stargazing.utils.lazy_import import LazyModule
+from stargazing.utils.logger import logger
+import stargazing.utils.metrics as metrics
+
+# Only imported once YouTube is first searched
+http_client = LazyModule("http.client")
+
+DEFAULT_SEARCH_URL = "https://www.youtube.com"
+WATCH_URL = "https://www.youtube.com/watch?v="
+
+SEARCH_CACHE_PATH = f"{path.dirname(path.abspath(__file__))}/../data/search_cache.json"
+
+MAX_RESULTS = 5
+MAX_CACHED_QUERIES = 128
+
+READ_CHUNK_SIZE = 16 * 1024
+SEARCH_TIMEOUT = 10
+
+VIDEO_ID_PATTERN = re.compile(rb"watch\?v=([A-Za-z0-9_-]{11})")
+# Bytes carried over between chunks so an id split across two chunks is still found
+VIDEO_ID_OVERLAP = len(b"watch?v=") + 11 - 1
+
+SEARCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) stargazing",
+    "Accept-Language": "en",
+    "Connection": "keep-alive"
+}
+
+
+def get_watch_url(video_id: str) -> str:
+    return WATCH_URL + video_id
+
+
+class YoutubeSearch():
+    """YouTube search returning the first video urls for a query, without blocking the caller.
+
+    Searches run one at a time on a worker thread holding a keep-alive connection to the search
+    server. Each results page is parsed as it streams in, and reading stops once max_results ids
+    have been found. A page abandoned partway cannot be reused, so its connection is closed.
+    Results are kept in a least recently used cache, persisted between runs.
+
+    @param base_url: Url of the search server, e.g. a local stand-in when testing.
+    @param max_results: Number of video urls returned per search.
+    @param cache_path: Path of the persisted cache file, None to keep the cache in memory only.
+    @param max_cached_queries: Number of queries cached before evicting the least recently used."""
+
+    def __init__(self, base_url: str = DEFAULT_SEARCH_URL, max_results: int = MAX_RESULTS,
+                 cache_path: Union[str, None] = SEARCH_CACHE_PATH, max_cached_queries: int = MAX_CACHED_QUERIES) -> None:
+        url = urlparse(base_url)
+        self.https = url.scheme == "https"
+        self.host = url.netloc
+        self.base_path = url.path.rstrip("/")
+
+        self.max_results = max_results
+        self.cache_path = cache_path
+        self.max_cached_queries = max_cached_queries
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="youtube-search")
+        # Only used from the worker thread
+        self.connection = None
+
+        self.cache_lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.__load_cache()
+
+    def search(self, query: str) -> Future:
+        """Returns a future resolving to the video urls found for the query."""
+
+        cached = self.get_cached(query)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        return self.executor.submit(self.__search, query)
+
+    def get_cached(self, query: str) -> Union[List[str], None]:
+        key = self.__cache_key(query)
+
+        with self.cache_lock:
+            video_ids = self.cache.get(key)
+            if video_ids is None:
+                return None
+
+            self.cache.move_to_end(key)
+            return [get_watch_url(video_id) for video_id in video_ids]
+
+    def close(self) -> None:
+        self.executor.submit(self.__close_connection)
+        self.executor.shutdown(wait=False)
+
+    def __search(self, query: str) -> List[str]:
+        # Another search may have finished the same query while this one was queued
+        cached = self.get_cached(query)
+        if cached is not None:
+            return cached
+
+        video_ids = self.__fetch_video_ids(query)
+
+        if video_ids:
+            with self.cache_lock:
+                self.cache[self.__cache_key(query)] = video_ids
+                while len(self.cache) > self.max_cached_queries:
+                    self.cache.popitem(last=False)
+
+            self.__save_cache()
+
+        return [get_watch_url(video_id) for video_id in video_ids]
+
+    @metrics.timed("audio.search")
+    def __fetch_video_ids(self, query: str) -> List[str]:
+        request_path = f"{self.base_path}/results?{urlencode({'search_query': query})}"
+
+        # A kept alive connection may have been closed by the server since the last search
+        for attempt in range(2):
+            try:
+                connection = self.__get_connection()
+                connection.request("GET", request_path, headers=SEARCH_HEADERS)
+                response = connection.getresponse()
+                break
+            except (http_client.HTTPException, OSError):
+                self.__close_connection()
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            response.read()
+            raise http_client.HTTPException(f"Search for {query} failed with status {response.status}")
+
+        video_ids = []
+        carry = b""
+
+        while len(video_ids) < self.max_results:
+            chunk = response.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            buffer = carry + chunk
+            for match in VIDEO_ID_PATTERN.finditer(buffer):
+                video_id = match.group(1).decode("ascii")
+                if video_id not in video_ids:
+                    video_ids.append(video_id)
+                    if len(video_ids) == self.max_results:
+                        break
+
+            carry = buffer[-VIDEO_ID_OVERLAP:]
+
+        if not response.isclosed():
+            self.__close_connection()
+
+        return video_ids
+
+    def __get_connection(self) -> http_client.HTTPConnection:
+        if self.connection is None:
+            connection_type = http_client.HTTPSConnection if self.https else http_client.HTTPConnection
+            self.connection = connection_type(self.host, timeout=SEARCH_TIMEOUT)
+        return self.connection
+
+    def __close_connection(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __cache_key(self, query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def __load_cache(self) -> None:
+        if self.cache_path is None or not path.exists(self.cache_path):
+            return
+
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                for query, video_ids in ujson.load(file):
+                    self.cache[query] = video_ids
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Failed to load search cache {self.cache_path}. Full message: {e}")
+
+    def __save_cache(self) -> None:
+        if self.cache_path is None:
+            return
+
+        with self.cache_lock:
+            # Saved as a list to keep the least recently used order
+            entries = list(self.cache.items())
+
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            ujson.dump(entries, file)
+        os.replace(tmp_path, self.cache_path)
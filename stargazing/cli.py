@@ -0,0 +1,116 @@
+from datetime import datetime
+import argparse
+import sys
+
+import stargazing.daemon.client as daemon_client
+import stargazing.daemon.protocol as protocol
+
+# Only the modules a command needs are imported once it is parsed, so commands talking to the
+# daemon skip the cost of importing the TUI and the audio stack
+
+
+def print_status(status: dict) -> None:
+    print(f"{status['display']} | project: {status['project']} | playing: {status['playing']} | volume: {status['volume']}")
+
+
+def request_daemon(command: str, **args):
+    """Sends a command to the daemon, exiting with a message if it is not running or failed."""
+
+    client = daemon_client.DaemonClient()
+    try:
+        return client.request(command, **args)
+    except protocol.DaemonError as e:
+        sys.exit(str(e))
+    finally:
+        client.close()
+
+
+def run_daemon(detach: bool) -> None:
+    if not protocol.is_supported():
+        sys.exit("stargazing daemon needs Unix domain sockets, which are not available here")
+    if daemon_client.is_daemon_running():
+        sys.exit("stargazing daemon is already running")
+
+    import stargazing.daemon.server as server
+
+    if detach:
+        server.detach()
+
+    try:
+        daemon = server.StargazingDaemon()
+    except protocol.DaemonError as e:
+        sys.exit(str(e))
+    daemon.serve_forever()
+
+
+def run_tui(args: argparse.Namespace) -> None:
+    import stargazing.main as main
+    import stargazing.utils.metrics as metrics
+
+    if args.metrics:
+        metrics.enable()
+
+    client = None
+    if not args.standalone and protocol.is_supported() and daemon_client.is_daemon_running():
+        client = daemon_client.DaemonClient()
+
+    stargazing = main.Stargazing(daemon_client=client)
+    stargazing.start()
+
+
+def run_stargazing():
+    """Main entry point for script"""
+
+    parser = argparse.ArgumentParser(prog="stargazing", description="A terminal user interface study/work app")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record timings, shown by pressing m and written to logs/metrics.log (or set STARGAZING_METRICS=1)")
+    parser.add_argument("--profile-imports", nargs="?", const=20, type=int, metavar="TOP",
+                        help="print the slowest imports made before the first frame (default top 20) and exit")
+    parser.add_argument("--standalone", action="store_true",
+                        help="run the timer and audio in this process, even if the daemon is running")
+
+    subparsers = parser.add_subparsers(dest="command")
+    report_parser = subparsers.add_parser("report", help="print time spent over recent days and exit")
+    report_parser.add_argument("--days", type=int, default=14, help="number of days to show (default 14)")
+    report_parser.add_argument("--project", help="only count time spent on this project")
+
+    status_parser = subparsers.add_parser("status", help="print the timer and audio state of the daemon")
+    status_parser.add_argument("--json", action="store_true", help="print the full state as JSON")
+    subparsers.add_parser("toggle", help="start, pause or continue the daemon's timer")
+
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="run the timer, audio and database in the background, for the TUI and commands to attach to")
+    daemon_parser.add_argument("--detach", action="store_true", help="detach from the terminal")
+    subparsers.add_parser("stop", help="stop the daemon, recording the pomodoro in progress")
+
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status = request_daemon("status", full=args.json)
+        if args.json:
+            print(protocol.encode_message(status).decode("utf-8"), end="")
+        else:
+            print_status(status)
+    elif args.command == "toggle":
+        print_status(request_daemon("toggle"))
+    elif args.command == "stop":
+        request_daemon("shutdown")
+    elif args.command == "daemon":
+        run_daemon(args.detach)
+    elif args.command == "report":
+        import stargazing.data.binary_store as binary_store
+        import stargazing.data.database as database
+        import stargazing.data.report_index as report_index
+
+        today = binary_store.day_key(datetime.now())
+        print("\n".join(report_index.format_report(database.get_report_index(), today, args.days, args.project)))
+    elif args.profile_imports is not None:
+        import stargazing.utils.import_profile as import_profile
+
+        print(import_profile.format_import_profile(import_profile.profile_imports(), args.profile_imports))
+    else:
+        run_tui(args)
+
+
+if __name__ == "__main__":
+    run_stargazing()
@@ -1,43 +1,71 @@
 from __future__ import annotations
 from typing import List, Tuple
-import ujson
+import atexit
 import os.path as path
+import threading
 
+import stargazing.audio.youtube_search as audio_ys
+import stargazing.config.config_store as config_store
 import stargazing.pomodoro.pomodoro_controller as pomo_pc
+import stargazing.utils.metrics as metrics
 
 CONFIG_FILE_PATH = f"{path.dirname(path.abspath(__file__))}/../config/settings.json"
 
+_store = None
+_store_lock = threading.Lock()
 
+
+def get_config_store() -> config_store.ConfigStore:
+    """Returns the settings store, loading the settings file on first use. Unwritten changes are
+    written on exit."""
+
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = config_store.ConfigStore(CONFIG_FILE_PATH)
+            atexit.register(_store.flush)
+        return _store
+
+
+def flush() -> None:
+    get_config_store().flush()
+
+
+@metrics.timed("config.get_saved_youtube_player_urls")
 def get_saved_youtube_player_urls() -> List[str]:
-    with open(CONFIG_FILE_PATH) as file:
-        data = ujson.load(file)
-        return data["saved_youtube_player_urls"]
+    return get_config_store()["saved_youtube_player_urls"]
 
 
+@metrics.timed("config.get_interval_times")
 def get_interval_times() -> List[List[int]]:
-    with open(CONFIG_FILE_PATH) as file:
-        data = ujson.load(file)
-        return data["interval_times"]
+    return get_config_store()["interval_times"]
 
 
+@metrics.timed("config.get_database_backend")
+def get_database_backend() -> str:
+    return get_config_store().get("database_backend", "text")
+
+
+@metrics.timed("config.get_youtube_search_url")
+def get_youtube_search_url() -> str:
+    return get_config_store().get("youtube_search_url", audio_ys.DEFAULT_SEARCH_URL)
+
+
+@metrics.timed("config.get_last_session_data")
 def get_last_session_data() -> Tuple[str, pomo_pc.PomodoroIntervalSettings, bool, int]:
-    with open(CONFIG_FILE_PATH) as file:
-        data = ujson.load(file)
-        return (data["last_project_name"], pomo_pc.PomodoroIntervalSettings(*data["last_interval_time"]),
-                data["last_autostart"], data["last_volume"])
+    store = get_config_store()
+    return (store["last_project_name"], pomo_pc.PomodoroIntervalSettings(*store["last_interval_time"]),
+            store["last_autostart"], store["last_volume"])
 
 
+@metrics.timed("config.update_last_session_data")
 def update_last_session_data(project_name: str, interval_settings: pomo_pc.PomodoroIntervalSettings,
                              autostart: bool, volume: int) -> None:
-    with open(CONFIG_FILE_PATH, 'r+') as file:
-        data = ujson.load(file)
-
-        data["last_project_name"] = project_name
-        data["last_interval_time"] = [
-            interval_settings.work_secs, interval_settings.break_secs]
-        data["last_autostart"] = autostart
-        data["last_volume"] = volume
-
-        file.seek(0)
-        ujson.dump(data, file, indent=4)
-        file.truncate()
+    """Updates the last session data, which is written shortly after if it changed."""
+
+    get_config_store().update({
+        "last_project_name": project_name,
+        "last_interval_time": [interval_settings.work_secs, interval_settings.break_secs],
+        "last_autostart": autostart,
+        "last_volume": volume
+    })
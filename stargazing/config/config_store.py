@@ -0,0 +1,144 @@
+from typing import Any, Dict, Set
+import os
+import threading
+import time
+import ujson
+
+from stargazing.utils.logger import logger
+
+# Writes are delayed by this long, so a burst of changes is written once
+WRITE_DELAY = 1.0
+
+# The settings file is checked for external edits at most this often
+WATCH_INTERVAL = 2.0
+
+
+class ConfigStore():
+    """Settings loaded once from a JSON file and kept in memory.
+
+    Changed keys are tracked and written back together, a short delay after the last change, by
+    writing a temporary file and renaming it over the settings file so a crash never leaves it half
+    written. Setting a key to its current value does not write anything. External edits to the file
+    are picked up by checking its modification time, with any unwritten changes kept on top.
+
+    @param config_path: Path of the JSON settings file.
+    @param write_delay: Seconds to wait after a change before writing.
+    @param watch_interval: Least number of seconds between checks for external edits."""
+
+    def __init__(self, config_path: str, write_delay: float = WRITE_DELAY, watch_interval: float = WATCH_INTERVAL) -> None:
+        self.config_path = config_path
+        self.write_delay = write_delay
+        self.watch_interval = watch_interval
+
+        self.lock = threading.RLock()
+        self.data: Dict[str, Any] = {}
+        self.dirty: Set[str] = set()
+        self.mtime_ns = None
+        self.last_watch_time = 0
+        self.write_timer = None
+
+        self.writes = 0
+
+        self.__load()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self.reload_if_changed()
+
+        with self.lock:
+            return self.data.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        self.reload_if_changed()
+
+        with self.lock:
+            return self.data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]) -> None:
+        """Sets several keys at once, scheduling a write if any value changed."""
+
+        with self.lock:
+            changed = [key for key, value in values.items() if self.data.get(key) != value]
+            if not changed:
+                return
+
+            for key in changed:
+                self.data[key] = values[key]
+            self.dirty.update(changed)
+
+            self.__schedule_write()
+
+    def flush(self) -> None:
+        """Writes any changed keys now."""
+
+        with self.lock:
+            if self.write_timer:
+                self.write_timer.cancel()
+                self.write_timer = None
+
+            if not self.dirty:
+                return
+
+            # Keep external edits to keys that have not changed here
+            if self.__get_mtime_ns() != self.mtime_ns:
+                self.__load()
+
+            tmp_path = f"{self.config_path}.tmp"
+            with open(tmp_path, "w") as file:
+                ujson.dump(self.data, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.config_path)
+
+            self.dirty.clear()
+            self.mtime_ns = self.__get_mtime_ns()
+            self.writes += 1
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the settings file if it has been edited externally, checking at most once per
+        watch interval. Returns whether it was reloaded."""
+
+        now = time.monotonic()
+        if now - self.last_watch_time < self.watch_interval:
+            return False
+        self.last_watch_time = now
+
+        with self.lock:
+            if self.__get_mtime_ns() == self.mtime_ns:
+                return False
+
+            self.__load()
+            return True
+
+    def __load(self) -> None:
+        mtime_ns = self.__get_mtime_ns()
+
+        try:
+            with open(self.config_path) as file:
+                data = ujson.load(file)
+        except ValueError as e:
+            # Likely caught partway through an external edit, so keep the current settings
+            logger.error(f"Failed to load settings {self.config_path}. Full message: {e}")
+            return
+
+        for key in self.dirty:
+            data[key] = self.data[key]
+
+        self.data = data
+        self.mtime_ns = mtime_ns
+
+    def __schedule_write(self) -> None:
+        if self.write_timer:
+            self.write_timer.cancel()
+
+        self.write_timer = threading.Timer(self.write_delay, self.flush)
+        self.write_timer.daemon = True
+        self.write_timer.start()
+
+    def __get_mtime_ns(self) -> int:
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,90 @@
+from typing import Any
+import itertools
+import socket
+import threading
+
+import stargazing.daemon.protocol as protocol
+
+CONNECT_TIMEOUT = 1.0
+# Long enough for a YouTube search or url resolve run by the daemon
+REQUEST_TIMEOUT = 30.0
+
+
+class DaemonClient():
+    """Connection to a running stargazing daemon. Only imports the standard library and the
+    protocol, so commands like stargazing status start quickly.
+
+    Requests are sent one at a time - from several threads, each waits its turn.
+
+    @param socket_path: Path of the daemon's Unix socket."""
+
+    def __init__(self, socket_path: str = None) -> None:
+        self.socket_path = socket_path if socket_path else protocol.get_socket_path()
+
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.socket = None
+        self.buffer = b""
+
+    def connect(self) -> None:
+        """Connects to the daemon, raising DaemonError if it is not running."""
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(CONNECT_TIMEOUT)
+        try:
+            connection.connect(self.socket_path)
+        except OSError as e:
+            connection.close()
+            raise protocol.DaemonError(
+                f"stargazing daemon is not running ({e}), start it with: stargazing daemon --detach") from e
+
+        connection.settimeout(REQUEST_TIMEOUT)
+        self.socket = connection
+
+    def close(self) -> None:
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def request(self, command: str, **args) -> Any:
+        """Sends a command and returns its result, raising DaemonError if it failed."""
+
+        with self.lock:
+            if self.socket is None:
+                self.connect()
+
+            request_id = next(self.ids)
+            try:
+                self.socket.sendall(protocol.encode_message({"id": request_id, "command": command, "args": args}))
+                response = self.__read_response()
+            except OSError as e:
+                self.close()
+                raise protocol.DaemonError(f"Lost connection to the stargazing daemon ({e})") from e
+
+        if response.get("id") != request_id:
+            raise protocol.DaemonError(f"Unexpected response to {command}: {response}")
+        if "error" in response:
+            raise protocol.DaemonError(response["error"])
+
+        return response.get("result")
+
+    def __read_response(self) -> dict:
+        while b"\n" not in self.buffer:
+            chunk = self.socket.recv(protocol.READ_CHUNK_SIZE)
+            if not chunk:
+                raise ConnectionResetError("daemon closed the connection")
+            self.buffer += chunk
+
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return protocol.decode_message(line)
+
+
+def is_daemon_running(socket_path: str = None) -> bool:
+    client = DaemonClient(socket_path)
+    try:
+        client.connect()
+    except protocol.DaemonError:
+        return False
+
+    client.close()
+    return True
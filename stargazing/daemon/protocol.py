@@ -0,0 +1,33 @@
+from typing import Any, Dict
+import os
+import os.path as path
+import socket
+import ujson
+
+# Requests and responses are single JSON objects, one per line:
+#   request  {"id": 1, "command": "status", "args": {}}
+#   response {"id": 1, "result": ...} or {"id": 1, "error": "message"}
+SOCKET_PATH = f"{path.dirname(path.abspath(__file__))}/../data/stargazing.sock"
+SOCKET_ENV_VAR = "STARGAZING_SOCKET"
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def is_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def get_socket_path() -> str:
+    return os.environ.get(SOCKET_ENV_VAR) or SOCKET_PATH
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return ujson.dumps(message).encode("utf-8") + b"\n"
+
+
+def decode_message(line: bytes) -> Dict[str, Any]:
+    return ujson.loads(line)
+
+
+class DaemonError(Exception):
+    """Raised by a client when the daemon cannot be reached or a command fails."""
@@ -0,0 +1,289 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Union
+import math
+import time
+
+import stargazing.daemon.client as daemon_client
+import stargazing.daemon.protocol as protocol
+import stargazing.data.database as database
+import stargazing.pomodoro.pomodoro_controller as pomo_pc
+import stargazing.pomodoro.timer as pomo_t
+import stargazing.project.project_controller as proj_pc
+from stargazing.utils.format_funcs import format_project_time
+from stargazing.utils.helper_funcs import check_null_fn
+from stargazing.utils.logger import logger
+
+# The daemon's state is fetched at least this often, the timer is counted locally in between
+REFRESH_INTERVAL = 1.0
+# Searches and url resolves wait on YouTube, so run on their own connections
+MAX_BACKGROUND_REQUESTS = 4
+
+
+class RemoteSession():
+    """State of a stargazing daemon, shared by the remote controllers standing in for the local
+    ones in an attached TUI. Commands are forwarded to the daemon, and the state it returns is
+    applied to the controllers.
+
+    @param client: Client connected to the daemon.
+    @param on_state_change: Callback function to run when state changes in the background, may be
+    called from any thread."""
+
+    def __init__(self, client: daemon_client.DaemonClient, on_state_change: Callable[[], None] = None) -> None:
+        self.client = client
+        self.on_state_change = check_null_fn(on_state_change)
+
+        self.executor = ThreadPoolExecutor(max_workers=MAX_BACKGROUND_REQUESTS)
+        self.next_refresh_time = 0
+
+        self.project_controller = RemoteProjectController(self)
+        self.pomodoro_controller = RemotePomodoroController(self)
+        self.audio_controller = RemoteAudioController(self)
+
+        # Raises DaemonError if the daemon is not running
+        self.apply_status(self.client.request("status", full=True))
+
+    def request(self, command: str, **args) -> Any:
+        """Sends a command, applying the state returned. Failures are logged and return None."""
+
+        try:
+            result = self.client.request(command, **args)
+        except protocol.DaemonError as e:
+            logger.error(f"Daemon command {command} failed. Full message: {e}")
+            return None
+
+        if isinstance(result, dict) and "status" in result:
+            self.apply_status(result)
+        return result
+
+    def request_in_background(self, command: str, **args) -> Future:
+        """Sends a command on a connection of its own, returning a future resolving to its result."""
+
+        def request() -> Any:
+            client = daemon_client.DaemonClient(self.client.socket_path)
+            try:
+                return client.request(command, **args)
+            finally:
+                client.close()
+
+        return self.executor.submit(request)
+
+    def refresh(self) -> None:
+        self.request("status", full=True)
+
+    def time_until_refresh(self) -> float:
+        return self.next_refresh_time - time.monotonic()
+
+    def apply_status(self, status: Dict[str, Any]) -> None:
+        self.next_refresh_time = time.monotonic() + REFRESH_INTERVAL
+
+        self.project_controller.apply_status(status)
+        self.pomodoro_controller.apply_status(status)
+        self.audio_controller.apply_status(status)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+
+class RemoteProjectController():
+    """Stands in for a project controller, with the projects kept by the daemon.
+
+    @param session: Session of the daemon."""
+
+    def __init__(self, session: RemoteSession) -> None:
+        self.session = session
+
+        self.projects: List[proj_pc.Project] = []
+        self.current = None
+        self.todays_total_time = 0
+
+    def apply_status(self, status: Dict[str, Any]) -> None:
+        for name, todays_time, total_time in status.get("projects", []):
+            project = self.__get_or_add_project(name)
+            project.todays_time, project.total_time = todays_time, total_time
+
+        self.current = self.__get_or_add_project(status["project"])
+        self.current.todays_time, self.current.total_time = status["todays_time"], status["total_time"]
+        self.todays_total_time = status["todays_total_time"]
+
+    def set_current_project(self, project: proj_pc.Project) -> None:
+        self.current = project
+        self.session.request("set_project", name=project.name)
+
+    def create_and_insert_new_project(self, project_name: str) -> Union[proj_pc.Project, None]:
+        project_name = project_name.strip()
+
+        if not project_name:
+            return None
+
+        created_name = self.session.request("create_project", name=project_name)
+        if not created_name:
+            return None
+
+        return self.__get_or_add_project(created_name)
+
+    def add_todays_total_time(self, secs: float) -> None:
+        self.todays_total_time += secs
+
+    def check_day_rollover(self) -> None:
+        # Done by the daemon, and picked up on the next refresh
+        pass
+
+    def check_external_changes(self) -> None:
+        """Folds pomodoros recorded by the daemon, or other processes, into this process's
+        reporting index. Project times come from the daemon, so the changes are not applied here."""
+        database.poll_external_changes()
+
+    def time_until_day_rollover(self) -> None:
+        return None
+
+    def __get_or_add_project(self, project_name: str) -> proj_pc.Project:
+        # Projects are kept, rather than replaced on refresh, as menus hold on to them
+        for project in self.projects:
+            if project.name == project_name:
+                return project
+
+        project = proj_pc.Project(project_name)
+        self.projects.append(project)
+        return project
+
+    @property
+    def formatted_todays_total_time(self) -> str:
+        return format_project_time(math.floor(self.todays_total_time))
+
+
+class RemotePomodoroController():
+    """Stands in for a pomodoro controller, with the timer run by the daemon. Between refreshes
+    the timer, and the time of the current project, are counted locally.
+
+    @param session: Session of the daemon."""
+
+    def __init__(self, session: RemoteSession) -> None:
+        self.session = session
+
+        self.status = pomo_pc.PomodoroStatus.INACTIVE
+        self.interval_settings = pomo_pc.PomodoroIntervalSettings(2400, 600)
+        self._autostart_setting = True
+        self.timer = pomo_t.Timer(self.interval_settings.work_secs)
+
+    def apply_status(self, status: Dict[str, Any]) -> None:
+        self.status = pomo_pc.PomodoroStatus(status["status"])
+        self.interval_settings = pomo_pc.PomodoroIntervalSettings(status["work_secs"], status["break_secs"])
+        self._autostart_setting = status["autostart"]
+
+        timer = pomo_t.Timer(status["interval"])
+        if self.status in (pomo_pc.PomodoroStatus.WORK, pomo_pc.PomodoroStatus.BREAK,
+                           pomo_pc.PomodoroStatus.PAUSED_WORK, pomo_pc.PomodoroStatus.PAUSED_BREAK):
+            now = time.time()
+            timer.start_time = now - status["elapsed"]
+            timer.elapsed_time = status["elapsed"]
+            if self.status in (pomo_pc.PomodoroStatus.PAUSED_WORK, pomo_pc.PomodoroStatus.PAUSED_BREAK):
+                timer.paused_time = now
+        self.timer = timer
+
+    @property
+    def autostart_setting(self) -> bool:
+        return self._autostart_setting
+
+    @autostart_setting.setter
+    def autostart_setting(self, autostart: bool) -> None:
+        self._autostart_setting = autostart
+        self.session.request("set_autostart", autostart=autostart)
+
+    def finish_timer(self, disable_sound=False) -> None:
+        self.session.request("finish")
+
+    def reset_timer(self) -> None:
+        self.session.request("reset")
+
+    def toggle_start_stop(self) -> None:
+        self.session.request("toggle")
+
+    def set_interval_settings(self, interval_settings: pomo_pc.PomodoroIntervalSettings) -> None:
+        self.interval_settings = interval_settings
+        self.session.request("set_interval", work_secs=interval_settings.work_secs,
+                             break_secs=interval_settings.break_secs)
+
+    def update_timer(self) -> None:
+        if self.session.time_until_refresh() <= 0:
+            self.session.refresh()
+            return
+
+        time_diff, timer_complete = self.timer.update()
+
+        if self.status == pomo_pc.PomodoroStatus.WORK:
+            project_controller = self.session.project_controller
+            project_controller.add_todays_total_time(time_diff)
+            project_controller.current.add_time(time_diff, True)
+
+        if timer_complete:
+            # The daemon finishes the timer, fetch what follows
+            self.session.refresh()
+
+    def time_until_next_update(self) -> float:
+        timer_timeout = self.timer.time_until_next_second()
+        refresh_timeout = self.session.time_until_refresh()
+
+        if timer_timeout is None:
+            return refresh_timeout
+        return min(timer_timeout, refresh_timeout)
+
+    def preload_alarms(self) -> None:
+        # Alarms are played by the daemon
+        pass
+
+    @property
+    def timer_display(self) -> str:
+        return pomo_pc.format_timer_display(self.status, self.timer)
+
+
+class RemoteAudioController():
+    """Stands in for an audio controller, with the audio played by the daemon.
+
+    @param session: Session of the daemon."""
+
+    def __init__(self, session: RemoteSession) -> None:
+        self.session = session
+        self.on_state_change = session.on_state_change
+
+        # Only the names are known, the players are loaded by the daemon
+        self.loaded_players: Dict[str, None] = {}
+        self.playing_name = "offline"
+        self.volume = 100
+
+    def apply_status(self, status: Dict[str, Any]) -> None:
+        if "players" in status:
+            self.loaded_players = dict.fromkeys(status["players"])
+        self.playing_name = status["playing"]
+        self.volume = status["volume"]
+
+    def start_loading(self) -> None:
+        # Players are loaded by the daemon
+        pass
+
+    def offline(self) -> None:
+        self.session.request("offline")
+
+    def set_volume(self, vol: int) -> None:
+        self.volume = vol
+        self.session.request("set_volume", volume=vol)
+
+    def get_volume(self) -> int:
+        return self.volume
+
+    def set_loaded_player(self, loaded_player_name: str) -> None:
+        self.session.request("play_player", name=loaded_player_name)
+
+    def set_youtube_player_from_url(self, youtube_url: str, player_name="") -> None:
+        self.session.request("play_url", url=youtube_url, name=player_name)
+
+    def set_youtube_player_from_query(self, search_query: str) -> None:
+        self.session.request("play_query", query=search_query)
+
+    def search_youtube(self, search_query: str) -> Future:
+        """Returns a future resolving to the YouTube urls found for the query."""
+        return self.session.request_in_background("search", query=search_query)
+
+    def resolve_youtube_url(self, youtube_url: str) -> Future:
+        """Returns a future resolving to the (title, stream url) of the YouTube url."""
+        return self.session.request_in_background("resolve", url=youtube_url)
@@ -0,0 +1,409 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Union
+import os
+import queue
+import selectors
+import signal
+import socket
+import time
+
+import stargazing.audio.audio_controller as audio_ac
+import stargazing.config.config as config
+import stargazing.daemon.client as daemon_client
+import stargazing.daemon.protocol as protocol
+import stargazing.data.database as database
+import stargazing.data.pomodoro_journal as pomodoro_journal
+import stargazing.pomodoro.pomodoro_controller as pomo_pc
+import stargazing.project.project_controller as proj_pc
+import stargazing.utils.file_lock as file_lock
+from stargazing.utils.logger import logger
+
+SESSION_CHECKPOINT_INTERVAL = 30
+# A client not reading its responses for this long is disconnected
+SEND_TIMEOUT = 5.0
+# Longest wait for a detached daemon to start listening
+DETACH_TIMEOUT = 10.0
+
+
+class StargazingDaemon():
+    """Background process owning the pomodoro timer, the audio and the database, so they outlive
+    the terminal. Clients - the CLI and attached TUIs - send it commands over a Unix socket.
+
+    Runs a single threaded loop waiting on the socket, the clients and a wake pipe, which other
+    threads write to when audio state changes or a YouTube search or url resolve finishes. Commands
+    are handled between waits, so the controllers are only used from the loop's thread, and a
+    status query is answered straight from memory.
+
+    @param socket_path: Path of the Unix socket to listen on."""
+
+    def __init__(self, socket_path: str = None) -> None:
+        self.socket_path = socket_path if socket_path else protocol.get_socket_path()
+
+        # Held while the daemon runs, so a second daemon cannot take over the socket
+        self.lock_file = open(f"{self.socket_path}.lock", "a")
+        if not file_lock.lock(self.lock_file, blocking=False):
+            self.lock_file.close()
+            raise protocol.DaemonError("stargazing daemon is already running")
+
+        self.wake_read_fd, self.wake_write_fd = os.pipe()
+        os.set_blocking(self.wake_read_fd, False)
+        os.set_blocking(self.wake_write_fd, False)
+
+        last_project_name, last_interval_settings, last_autostart, last_volume = config.get_last_session_data()
+
+        # Before the controllers read the totals, so they include any recovered pomodoro
+        pomodoro_journal.recover_journals()
+
+        self.audio_controller = audio_ac.AudioController(last_volume, self.wake)
+        self.project_controller = proj_pc.ProjectController(last_project_name)
+        self.pomodoro_controller = pomo_pc.PomodoroController(
+            self.project_controller, self.audio_controller, last_interval_settings, last_autostart)
+
+        self.commands: Dict[str, Callable[..., Any]] = {
+            "status": self.get_status,
+            "toggle": self.toggle,
+            "finish": self.finish,
+            "reset": self.reset,
+            "set_interval": self.set_interval,
+            "set_autostart": self.set_autostart,
+            "set_project": self.set_project,
+            "create_project": self.create_project,
+            "set_volume": self.set_volume,
+            "offline": self.offline,
+            "play_player": self.play_player,
+            "play_url": self.play_url,
+            "play_query": self.play_query,
+            "search": self.search,
+            "resolve": self.resolve,
+            "shutdown": self.shutdown
+        }
+
+        self.selector = selectors.DefaultSelector()
+        self.listener = None
+        # Read buffer of each connected client
+        self.buffers: Dict[socket.socket, bytes] = {}
+        # (client, request id, future) of commands answered once their future is done
+        self.completed_futures = queue.SimpleQueue()
+
+        self.running = False
+        self.next_checkpoint_time = time.monotonic() + SESSION_CHECKPOINT_INTERVAL
+
+    def serve_forever(self) -> None:
+        self.running = True
+        self.__listen()
+
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+        self.audio_controller.start_loading()
+        self.pomodoro_controller.preload_alarms()
+        logger.info(f"stargazing daemon listening on {self.socket_path}")
+
+        try:
+            while self.running:
+                for key, _ in self.selector.select(self.next_timeout()):
+                    key.data(key.fileobj)
+
+                self.__answer_completed_futures()
+                self.pomodoro_controller.update_timer()
+
+                if time.monotonic() >= self.next_checkpoint_time:
+                    self.__save_last_session_data()
+        finally:
+            self.close()
+
+    def wake(self) -> None:
+        """Wakes up the loop - safe to call from any thread."""
+
+        try:
+            os.write(self.wake_write_fd, b"\0")
+        except BlockingIOError:
+            # Pipe is full, so a wake up is already pending
+            pass
+
+    def handle_signal(self, *args) -> None:
+        self.running = False
+        self.wake()
+
+    def next_timeout(self) -> float:
+        timeouts = [self.next_checkpoint_time - time.monotonic(),
+                    self.project_controller.time_until_day_rollover()]
+
+        timer_timeout = self.pomodoro_controller.time_until_next_update()
+        if timer_timeout is not None:
+            timeouts.append(timer_timeout)
+
+        return max(min(timeouts), 0)
+
+    def close(self) -> None:
+        # As the TUI does when closed, the pomodoro in progress is recorded
+        self.pomodoro_controller.finish_timer(disable_sound=True)
+        self.audio_controller.stop()
+        database.flush_writes()
+        self.__save_last_session_data()
+        config.flush()
+
+        for client in list(self.buffers):
+            self.__disconnect(client)
+        if self.listener is not None:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+        self.selector.close()
+        os.close(self.wake_read_fd)
+        os.close(self.wake_write_fd)
+        self.lock_file.close()
+
+        logger.info("stargazing daemon stopped")
+
+    # ========================================================
+    # Commands
+    # ========================================================
+
+    def get_status(self, full=False) -> Dict[str, Any]:
+        """Returns the state shown by clients. Project totals and player names are only included
+        when full is set."""
+
+        pomodoro_controller = self.pomodoro_controller
+        project_controller = self.project_controller
+
+        status = {
+            "status": pomodoro_controller.status.value,
+            "display": pomodoro_controller.timer_display,
+            "interval": pomodoro_controller.timer.interval,
+            "elapsed": pomodoro_controller.timer.elapsed_time,
+            "work_secs": pomodoro_controller.interval_settings.work_secs,
+            "break_secs": pomodoro_controller.interval_settings.break_secs,
+            "autostart": pomodoro_controller.autostart_setting,
+            "project": project_controller.current.name,
+            "todays_time": project_controller.current.todays_time,
+            "total_time": project_controller.current.total_time,
+            "todays_total_time": project_controller.todays_total_time,
+            "playing": self.audio_controller.playing_name,
+            "volume": self.audio_controller.volume
+        }
+
+        if full:
+            status["projects"] = [[project.name, project.todays_time, project.total_time]
+                                  for project in project_controller.projects]
+            status["players"] = list(self.audio_controller.loaded_players)
+
+        return status
+
+    def toggle(self) -> Dict[str, Any]:
+        self.pomodoro_controller.toggle_start_stop()
+        self.pomodoro_controller.update_timer()
+        return self.get_status()
+
+    def finish(self) -> Dict[str, Any]:
+        self.pomodoro_controller.finish_timer()
+        return self.get_status()
+
+    def reset(self) -> Dict[str, Any]:
+        self.pomodoro_controller.reset_timer()
+        return self.get_status()
+
+    def set_interval(self, work_secs: int, break_secs: int) -> Dict[str, Any]:
+        self.pomodoro_controller.set_interval_settings(pomo_pc.PomodoroIntervalSettings(work_secs, break_secs))
+        return self.get_status()
+
+    def set_autostart(self, autostart: bool) -> Dict[str, Any]:
+        self.pomodoro_controller.autostart_setting = autostart
+        return self.get_status()
+
+    def set_project(self, name: str) -> Dict[str, Any]:
+        for project in self.project_controller.projects:
+            if project.name == name:
+                self.project_controller.set_current_project(project)
+                return self.get_status()
+
+        raise ValueError(f"No project named {name}")
+
+    def create_project(self, name: str) -> Union[str, None]:
+        """Returns the name of the project created, None if it could not be."""
+
+        project = self.project_controller.create_and_insert_new_project(name)
+        return project.name if project else None
+
+    def set_volume(self, volume: int) -> Dict[str, Any]:
+        self.audio_controller.set_volume(volume)
+        return self.get_status()
+
+    def offline(self) -> Dict[str, Any]:
+        self.audio_controller.offline()
+        return self.get_status()
+
+    def play_player(self, name: str) -> Dict[str, Any]:
+        if name not in self.audio_controller.loaded_players:
+            raise ValueError(f"No player named {name}")
+
+        self.audio_controller.set_loaded_player(name)
+        return self.get_status()
+
+    def play_url(self, url: str, name="") -> Dict[str, Any]:
+        self.audio_controller.set_youtube_player_from_url(url, name)
+        return self.get_status()
+
+    def play_query(self, query: str) -> Dict[str, Any]:
+        self.audio_controller.set_youtube_player_from_query(query)
+        return self.get_status()
+
+    def search(self, query: str) -> Future:
+        return self.audio_controller.search_youtube(query)
+
+    def resolve(self, url: str) -> Future:
+        return self.audio_controller.resolve_youtube_url(url)
+
+    def shutdown(self) -> None:
+        self.running = False
+
+    # ========================================================
+    # Connections
+    # ========================================================
+
+    def __listen(self) -> None:
+        # Any socket left here is stale, as the lock is held
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.listener.listen()
+        self.listener.setblocking(False)
+
+        self.selector.register(self.listener, selectors.EVENT_READ, self.__accept)
+        self.selector.register(self.wake_read_fd, selectors.EVENT_READ, self.__drain_wake_pipe)
+
+    def __accept(self, listener: socket.socket) -> None:
+        try:
+            client, _ = listener.accept()
+        except BlockingIOError:
+            return
+
+        # Only read once readable, so the timeout only applies to sending
+        client.settimeout(SEND_TIMEOUT)
+        self.buffers[client] = b""
+        self.selector.register(client, selectors.EVENT_READ, self.__read)
+
+    def __read(self, client: socket.socket) -> None:
+        try:
+            data = client.recv(protocol.READ_CHUNK_SIZE)
+        except OSError:
+            data = b""
+
+        if not data:
+            self.__disconnect(client)
+            return
+
+        *lines, self.buffers[client] = (self.buffers[client] + data).split(b"\n")
+        for line in lines:
+            if client not in self.buffers:
+                return
+            if line.strip():
+                self.__handle_request(client, line)
+
+    def __handle_request(self, client: socket.socket, line: bytes) -> None:
+        try:
+            request = protocol.decode_message(line)
+            request_id, command, args = request.get("id"), request["command"], request.get("args", {})
+        except (ValueError, KeyError, AttributeError):
+            self.__send(client, {"id": None, "error": f"Malformed request: {line[:200]!r}"})
+            return
+
+        handler = self.commands.get(command)
+        if handler is None:
+            self.__send(client, {"id": request_id, "error": f"Unknown command: {command}"})
+            return
+
+        # Clients see the timer as of now, not as of the last loop
+        self.pomodoro_controller.update_timer()
+
+        try:
+            result = handler(**args)
+        except Exception as e:
+            logger.error(f"Daemon command {command} failed. Full message: {e}")
+            self.__send(client, {"id": request_id, "error": f"{command} failed: {e}"})
+            return
+
+        if isinstance(result, Future):
+            def handle_done(future: Future) -> None:
+                self.completed_futures.put((client, request_id, future))
+                self.wake()
+
+            result.add_done_callback(handle_done)
+            return
+
+        self.__send(client, {"id": request_id, "result": result})
+
+    def __answer_completed_futures(self) -> None:
+        while True:
+            try:
+                client, request_id, future = self.completed_futures.get_nowait()
+            except queue.Empty:
+                return
+
+            if client not in self.buffers:
+                continue
+
+            if future.cancelled():
+                self.__send(client, {"id": request_id, "error": "Cancelled"})
+            elif future.exception():
+                self.__send(client, {"id": request_id, "error": str(future.exception())})
+            else:
+                self.__send(client, {"id": request_id, "result": future.result()})
+
+    def __send(self, client: socket.socket, message: Dict[str, Any]) -> None:
+        try:
+            client.sendall(protocol.encode_message(message))
+        except OSError as e:
+            logger.error(f"Failed to respond to a daemon client. Full message: {e}")
+            self.__disconnect(client)
+
+    def __disconnect(self, client: socket.socket) -> None:
+        if self.buffers.pop(client, None) is None:
+            return
+
+        self.selector.unregister(client)
+        client.close()
+
+    def __drain_wake_pipe(self, wake_read_fd: int) -> None:
+        try:
+            while os.read(wake_read_fd, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def __save_last_session_data(self) -> None:
+        self.next_checkpoint_time = time.monotonic() + SESSION_CHECKPOINT_INTERVAL
+        config.update_last_session_data(self.project_controller.current.name, self.pomodoro_controller.interval_settings,
+                                        self.pomodoro_controller.autostart_setting,
+                                        self.audio_controller.volume)
+
+
+def detach(socket_path: str = None) -> None:
+    """Moves the process into the background, away from the terminal. Only returns in the
+    background process - the original process waits for the daemon to listen, then exits."""
+
+    if os.fork() > 0:
+        deadline = time.monotonic() + DETACH_TIMEOUT
+        while not daemon_client.is_daemon_running(socket_path):
+            if time.monotonic() > deadline:
+                print("stargazing daemon failed to start, see the error log")
+                os._exit(1)
+            time.sleep(0.05)
+
+        print("stargazing daemon started")
+        os._exit(0)
+
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+
+    null_fd = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(null_fd, fd)
+    os.close(null_fd)
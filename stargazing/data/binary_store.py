@@ -0,0 +1,324 @@
+from __future__ import annotations
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Tuple
+import os
+import os.path as path
+import struct
+import threading
+import time
+import ujson
+
+import stargazing.data.shared_log as shared_log
+import stargazing.utils.file_lock as file_lock
+from stargazing.utils.logger import logger
+
+BINARY_LOG_PATH = f"{path.dirname(path.abspath(__file__))}/../data/pomodoros.bin"
+BINARY_NAMES_PATH = f"{path.dirname(path.abspath(__file__))}/../data/pomodoros.names"
+BINARY_INDEX_PATH = f"{path.dirname(path.abspath(__file__))}/../data/pomodoros.idx"
+
+# project id (uint32), start time (float64 wall clock seconds), length (float64 seconds)
+RECORD_STRUCT = struct.Struct("<Idd")
+
+INDEX_VERSION = 1
+# The index is rewritten once this many records, or seconds, have been appended since it was last
+# saved, and by save_index. Records it is behind on are folded in from the log when it is loaded.
+INDEX_SAVE_RECORDS = 64
+INDEX_SAVE_INTERVAL = 60
+
+# Naive datetimes are stored as wall clock seconds since this epoch, so integer division by a day
+# gives the local calendar day without any timezone lookups.
+WALL_CLOCK_EPOCH = datetime(1970, 1, 1)
+SECONDS_PER_DAY = 86400
+
+
+def to_wall_clock_secs(time: datetime) -> float:
+    return (time - WALL_CLOCK_EPOCH).total_seconds()
+
+
+def from_wall_clock_secs(secs: float) -> datetime:
+    return WALL_CLOCK_EPOCH + timedelta(seconds=secs)
+
+
+def day_key(time: datetime) -> int:
+    return int(to_wall_clock_secs(time) // SECONDS_PER_DAY)
+
+
+class BinaryPomodoroStore():
+    """Append-only fixed-width pomodoro log with a sidecar index of precomputed aggregates.
+
+    Records are written to the binary log, project names to an append-only names file (a record's
+    project id is the line number of its name) and aggregates to a JSON index. The index is only a
+    cache - if it is missing or corrupt it is rebuilt from the log, and if it is behind the log the
+    missing records are folded in, so it is saved in batches rather than on every append.
+
+    The files may be shared by several stargazing processes. Writes hold an exclusive advisory lock
+    on the names file, and first fold in the names and records other processes appended, so project
+    ids and the index always cover the whole log. Records appended by other processes are queued
+    until poll hands them out, as with shared_log.SharedLogTail.
+
+    @param log_path: Path of the fixed-width binary record file.
+    @param names_path: Path of the project names file.
+    @param index_path: Path of the sidecar index file.
+    @param poll_interval: Least number of seconds between checks for records appended elsewhere."""
+
+    def __init__(self, log_path: str = BINARY_LOG_PATH, names_path: str = BINARY_NAMES_PATH,
+                 index_path: str = BINARY_INDEX_PATH, poll_interval: float = shared_log.POLL_INTERVAL) -> None:
+        self.log_path = log_path
+        self.names_path = names_path
+        self.index_path = index_path
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        self.project_names: List[str] = []
+        self.project_ids = {}
+
+        self.record_count = 0
+        self.project_totals = defaultdict(float)
+        self.day_totals = defaultdict(lambda: defaultdict(float))
+
+        self.saved_record_count = 0
+        self.last_index_save_time = time.monotonic()
+
+        # Records other processes appended, not yet handed out by poll
+        self.pending_records: List[Tuple[str, float, float]] = []
+        self.last_poll_time = 0
+
+        with self.lock, self.__locked():
+            self.__read_new_names()
+            self.__load_index()
+
+    @property
+    def exists(self) -> bool:
+        return path.exists(self.log_path)
+
+    # ========================================================
+    # Queries
+    # ========================================================
+
+    def get_project_total(self, project_name: str) -> float:
+        project_id = self.project_ids.get(project_name)
+        if project_id is None:
+            return 0
+        return self.project_totals.get(project_id, 0)
+
+    def get_project_day_total(self, project_name: str, day: int) -> float:
+        project_id = self.project_ids.get(project_name)
+        if project_id is None or day not in self.day_totals:
+            return 0
+        return self.day_totals[day].get(project_id, 0)
+
+    def get_day_total(self, day: int) -> float:
+        if day not in self.day_totals:
+            return 0
+        return sum(self.day_totals[day].values())
+
+    def iter_records(self) -> Iterator[Tuple[str, float, float]]:
+        """Yields (project name, wall clock start seconds, length) for every record in the log.
+        Records other processes appended are also queued for poll, if they were not already."""
+
+        if not self.exists:
+            return
+
+        with self.lock, self.__locked(exclusive=False):
+            self.__read_new_names()
+            self.__read_new_records()
+
+            with open(self.log_path, "rb") as file:
+                data = file.read(self.record_count * RECORD_STRUCT.size)
+            project_names = list(self.project_names)
+
+        for project_id, start, length in RECORD_STRUCT.iter_unpack(data):
+            yield project_names[project_id], start, length
+
+    def poll(self, force=False) -> List[Tuple[str, float, float]]:
+        """Returns the (project name, wall clock start seconds, length) records other processes
+        have appended since the last poll. The log is only read if it has grown."""
+
+        now = time.monotonic()
+        if not force and now - self.last_poll_time < self.poll_interval:
+            return []
+        self.last_poll_time = now
+
+        if self.exists and path.getsize(self.log_path) // RECORD_STRUCT.size > self.record_count:
+            with self.lock, self.__locked(exclusive=False):
+                self.__read_new_names()
+                self.__read_new_records()
+
+        with self.lock:
+            pending, self.pending_records = self.pending_records, []
+
+        return pending
+
+    def get_pending_count(self) -> int:
+        return len(self.pending_records)
+
+    # ========================================================
+    # Writes
+    # ========================================================
+
+    def append(self, project_name: str, start_time: datetime, length: float) -> None:
+        self.append_many([(project_name, to_wall_clock_secs(start_time), length)])
+
+    def append_many(self, records: List[Tuple[str, float, float]]) -> None:
+        """Appends (project name, wall clock start seconds, length) records and updates the index."""
+
+        with self.lock, self.__locked():
+            self.__append_locked(records)
+
+    def import_records(self, records: Iterable[Tuple[str, float, float]]) -> bool:
+        """Appends the records if the log is empty, e.g. when importing another database. Returns
+        whether they were appended - another process may have imported them first."""
+
+        with self.lock, self.__locked():
+            if self.exists and path.getsize(self.log_path) >= RECORD_STRUCT.size:
+                self.__read_new_names()
+                self.__read_new_records()
+                return False
+
+            self.__append_locked(list(records))
+            self.__save_index()
+            return True
+
+    def save_index(self) -> None:
+        """Saves the index if records were appended since it was last saved, e.g. when exiting."""
+
+        with self.lock:
+            if self.record_count != self.saved_record_count:
+                with self.__locked():
+                    self.__save_index()
+
+    def __append_locked(self, records: List[Tuple[str, float, float]]) -> None:
+        # Ids are only given out once every name other processes added is known
+        self.__read_new_names()
+        self.__read_new_records()
+
+        packed = bytearray()
+        for project_name, start, length in records:
+            project_id = self.__get_or_create_project_id(project_name)
+            packed += RECORD_STRUCT.pack(project_id, start, length)
+            self.__fold(project_id, start, length)
+
+        with open(self.log_path, "ab") as file:
+            # A record torn by a crash would misalign every record after it
+            end = file.seek(0, os.SEEK_END)
+            torn_size = end % RECORD_STRUCT.size
+            if torn_size:
+                logger.warning(f"Dropping {torn_size} bytes of a partly written record from {self.log_path}")
+                file.truncate(end - torn_size)
+
+            file.write(packed)
+
+        self.record_count += len(records)
+        if (self.record_count - self.saved_record_count >= INDEX_SAVE_RECORDS
+                or time.monotonic() - self.last_index_save_time >= INDEX_SAVE_INTERVAL):
+            self.__save_index()
+
+    # ========================================================
+    # Index management
+    # ========================================================
+
+    def __fold(self, project_id: int, start: float, length: float) -> None:
+        self.project_totals[project_id] += length
+        self.day_totals[int(start // SECONDS_PER_DAY)][project_id] += length
+
+    def __get_or_create_project_id(self, project_name: str) -> int:
+        if project_name in self.project_ids:
+            return self.project_ids[project_name]
+
+        with open(self.names_path, "a", encoding="utf-8") as file:
+            file.write(f"{project_name}\n")
+
+        project_id = len(self.project_names)
+        self.project_names.append(project_name)
+        self.project_ids[project_name] = project_id
+        return project_id
+
+    @contextmanager
+    def __locked(self, exclusive=True):
+        """Holds the advisory lock shared with other processes, taken on the names file as the
+        log may not exist yet and the index is replaced on every write."""
+
+        with open(self.names_path, "ab") as file, file_lock.locked(file, exclusive):
+            yield
+
+    def __read_new_names(self) -> None:
+        with open(self.names_path, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+
+        for project_name in lines[len(self.project_names):]:
+            self.project_ids[project_name] = len(self.project_names)
+            self.project_names.append(project_name)
+
+    def __read_new_records(self) -> None:
+        """Folds in and queues for poll the records other processes appended."""
+
+        if not self.exists:
+            return
+
+        with open(self.log_path, "rb") as file:
+            file.seek(self.record_count * RECORD_STRUCT.size)
+            data = file.read()
+
+        data = data[:len(data) - len(data) % RECORD_STRUCT.size]
+        for project_id, start, length in RECORD_STRUCT.iter_unpack(data):
+            self.__fold(project_id, start, length)
+            self.pending_records.append((self.project_names[project_id], start, length))
+
+        self.record_count += len(data) // RECORD_STRUCT.size
+
+    def __load_index(self) -> None:
+        if not self.exists:
+            return
+
+        log_record_count = path.getsize(self.log_path) // RECORD_STRUCT.size
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                data = ujson.load(file)
+
+            if data["version"] != INDEX_VERSION or data["record_count"] > log_record_count:
+                raise ValueError("Index does not match the pomodoro log")
+
+            self.record_count = data["record_count"]
+            for project_id, total in data["project_totals"].items():
+                self.project_totals[int(project_id)] = total
+            for day, totals in data["day_totals"].items():
+                for project_id, total in totals.items():
+                    self.day_totals[int(day)][int(project_id)] = total
+        except (OSError, ValueError, KeyError):
+            self.record_count = 0
+            self.project_totals.clear()
+            self.day_totals.clear()
+
+        # Fold in records appended after the index was last written (e.g. after a crash)
+        if self.record_count < log_record_count:
+            with open(self.log_path, "rb") as file:
+                file.seek(self.record_count * RECORD_STRUCT.size)
+                data = file.read((log_record_count - self.record_count) * RECORD_STRUCT.size)
+
+            for project_id, start, length in RECORD_STRUCT.iter_unpack(data):
+                self.__fold(project_id, start, length)
+
+            self.record_count = log_record_count
+            self.__save_index()
+
+        self.saved_record_count = self.record_count
+
+    def __save_index(self) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "record_count": self.record_count,
+            "project_totals": {str(project_id): total for project_id, total in self.project_totals.items()},
+            "day_totals": {str(day): {str(project_id): total for project_id, total in totals.items()}
+                           for day, totals in self.day_totals.items()}
+        }
+
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            ujson.dump(data, file)
+        os.replace(tmp_path, self.index_path)
+
+        self.saved_record_count = self.record_count
+        self.last_index_save_time = time.monotonic()
@@ -1,13 +1,30 @@
+from __future__ import annotations
 from collections import namedtuple
 from datetime import datetime, timedelta
-from typing import List, Union
+from typing import Callable, List, Set, Tuple, Union
+import atexit
+import locale
 import os.path as path
 
+import stargazing.config.config as config
+import stargazing.data.binary_store as binary_store
+import stargazing.data.log_parser as log_parser
+import stargazing.data.pomodoro_log as pomodoro_log
+import stargazing.data.report_index as report_index
+import stargazing.data.rollup_cache as rollup_cache
+import stargazing.data.shared_log as shared_log
+import stargazing.data.sqlite_store as sqlite_store
+import stargazing.data.write_queue as write_queue
 import stargazing.pomodoro.timer as pomo_t
 import stargazing.project.project_controller as project_pc
+import stargazing.utils.file_lock as file_lock
+from stargazing.utils.logger import logger
+import stargazing.utils.metrics as metrics
 
+# start_time is the local start time. utc_offset is the UTC offset in seconds when the pomodoro was
+# started, None for records read back or written before offsets were stored.
 PomodoroRecord = namedtuple(
-    "PomodoroRecord", ["project_name", "start_time", "length"])
+    "PomodoroRecord", ["project_name", "start_time", "length", "utc_offset"], defaults=[None])
 
 TIME_FORMAT = "%d/%m/%Y %H:%M:%S"
 
@@ -16,77 +33,390 @@ POMODORO_DATABASE_PATH = f"{path.dirname(path.abspath(__file__))}/../data/pomodo
 
 DATABASE_DELIMITER_CHAR = "|"
 
+# Encoding of the text databases, as written by open() in text mode
+TEXT_ENCODING = locale.getpreferredencoding(False)
 
+TEXT_BACKEND = "text"
+BINARY_BACKEND = "binary"
+SQLITE_BACKEND = "sqlite"
+
+_backend = None
+_binary_store = None
+_sqlite_store = None
+_rollup_cache = None
+_report_index = None
+_write_queue = None
+_project_names = None
+_project_tail = None
+_pomodoro_tail = None
+# Pomodoros still to be handed out by poll_external_changes that the report index already counts
+_report_index_skip = 0
+
+
+def get_backend() -> str:
+    global _backend
+
+    if _backend is None:
+        _backend = config.get_database_backend()
+
+    return _backend
+
+
+def get_binary_store() -> binary_store.BinaryPomodoroStore:
+    """Returns the binary pomodoro store, importing the text pomodoro log on first run."""
+
+    global _binary_store
+
+    if _binary_store is None:
+        store = binary_store.BinaryPomodoroStore()
+
+        if not store.exists:
+            store.import_records(zip(*get_all_text_pomodoro_columns()))
+
+        _binary_store = store
+
+    return _binary_store
+
+
+def get_sqlite_store() -> sqlite_store.SqlitePomodoroStore:
+    """Returns the SQLite store, migrating the text database if the SQLite database has not been yet."""
+
+    global _sqlite_store
+
+    if _sqlite_store is None:
+        store = sqlite_store.SqlitePomodoroStore()
+        sqlite_store.migrate_text_database(store)
+        _sqlite_store = store
+
+    return _sqlite_store
+
+
+def get_rollup_cache() -> rollup_cache.RollupCache:
+    """Returns the running totals cache over the text pomodoro log, folding in any new records."""
+
+    global _rollup_cache
+
+    if _rollup_cache is None:
+        _rollup_cache = rollup_cache.RollupCache()
+
+    _rollup_cache.refresh()
+
+    # Totals first loaded from the cache include everything up to its offset, so follow the log from there
+    if get_pomodoro_tail().offset is None:
+        get_pomodoro_tail().start_at(_rollup_cache.offset)
+
+    return _rollup_cache
+
+
+def get_project_tail() -> shared_log.SharedLogTail:
+    global _project_tail
+
+    if _project_tail is None:
+        _project_tail = shared_log.SharedLogTail(PROJECT_DATABASE_PATH, unique_lines=True)
+
+    return _project_tail
+
+
+def get_pomodoro_tail() -> shared_log.SharedLogTail:
+    """Returns the tail of the text pomodoro log, shared with other stargazing processes."""
+
+    global _pomodoro_tail
+
+    if _pomodoro_tail is None:
+        _pomodoro_tail = shared_log.SharedLogTail(POMODORO_DATABASE_PATH)
+
+    return _pomodoro_tail
+
+
+def poll_external_changes() -> Tuple[List[str], List[Tuple[str, float, float]]]:
+    """Returns the new project names and (project name, wall clock start seconds, length) pomodoros
+    other stargazing processes have added since the last call, at most once per poll interval."""
+
+    global _report_index_skip
+
+    project_names = get_project_names()
+
+    if get_backend() == SQLITE_BACKEND:
+        polled_project_names = get_sqlite_store().poll_project_names()
+    else:
+        polled_project_names = get_project_tail().poll().decode(TEXT_ENCODING).splitlines()
+
+    new_project_names = []
+    for project_name in polled_project_names:
+        if project_name and project_name not in project_names:
+            project_names.add(project_name)
+            new_project_names.append(project_name)
+
+    if get_backend() == BINARY_BACKEND:
+        records = get_binary_store().poll()
+    elif get_backend() == SQLITE_BACKEND:
+        records = get_sqlite_store().poll()
+    else:
+        records = poll_text_pomodoros()
+
+    if not records:
+        return new_project_names, []
+
+    if _report_index is not None:
+        for record in records[_report_index_skip:]:
+            _report_index.add(*record)
+    _report_index_skip = max(_report_index_skip - len(records), 0)
+
+    return new_project_names, records
+
+
+def poll_text_pomodoros() -> List[Tuple[str, float, float]]:
+    data = get_pomodoro_tail().poll()
+    if not data:
+        return []
+
+    try:
+        return list(zip(*log_parser.parse_pomodoro_log(data)))
+    except ValueError as e:
+        logger.error(f"Failed to read pomodoros added by another process. Full message: {e}")
+        return []
+
+
+def get_write_queue() -> write_queue.WriteQueue:
+    """Returns the queue inserts are written through, which is flushed when stargazing exits."""
+
+    global _write_queue
+
+    if _write_queue is None:
+        _write_queue = write_queue.WriteQueue()
+        atexit.register(close)
+
+    return _write_queue
+
+
+def close() -> None:
+    """Writes the queued inserts and saves the binary store's index, run when stargazing exits."""
+
+    flush_writes()
+    if _binary_store is not None:
+        _binary_store.save_index()
+
+
+def flush_writes() -> None:
+    """Waits for queued inserts to be written. Reads call this first, so they see every insert."""
+
+    if _write_queue is not None:
+        _write_queue.flush()
+
+
+def get_pending_writes() -> int:
+    return _write_queue.get_pending_count() if _write_queue is not None else 0
+
+
+def get_project_names() -> Set[str]:
+    """Returns the names of all projects, read from the database once and kept up to date by insert_project."""
+
+    global _project_names
+
+    if _project_names is None:
+        if get_backend() == SQLITE_BACKEND:
+            _project_names = set(get_sqlite_store().get_project_names())
+        else:
+            _project_names = set(read_text_project_names())
+
+    return _project_names
+
+
+def get_report_index() -> report_index.ReportIndex:
+    """Returns the reporting index, built from the pomodoro log on first use and kept up to date as
+    pomodoros are inserted."""
+
+    global _report_index, _report_index_skip
+
+    if _report_index is None:
+        flush_writes()
+        with metrics.timed_block("database.build_report_index"):
+            if get_backend() == TEXT_BACKEND:
+                data, _report_index_skip = get_pomodoro_tail().read_all()
+                pomo_log = pomodoro_log.PomodoroLog.from_columns(log_parser.parse_pomodoro_log(data))
+            else:
+                pomo_log = get_pomodoro_log()
+                store = get_binary_store() if get_backend() == BINARY_BACKEND else get_sqlite_store()
+                _report_index_skip = store.get_pending_count()
+
+            _report_index = report_index.ReportIndex.from_log(pomo_log)
+
+    return _report_index
+
+
+@metrics.timed("database.insert_project")
 def insert_project(project: project_pc.Project) -> bool:
-    with open(PROJECT_DATABASE_PATH, "r") as file:
-        lines = file.readlines()
+    """Queues a project to be written, returning False if a project with the same name already exists."""
 
-    stripped_lines = [line.rstrip("\n") for line in lines]
-    if project.name in stripped_lines:
+    project_names = get_project_names()
+    if project.name in project_names:
         return False
 
-    with open(PROJECT_DATABASE_PATH, "a") as file:
-        file.write(f"{project.name}\n")
-
+    project_names.add(project.name)
+    get_write_queue().submit(write_projects, project.name)
     return True
 
 
-def get_all_projects() -> List[project_pc.Project]:
-    with open(PROJECT_DATABASE_PATH, "r") as file:
-        lines = file.readlines()
+def write_projects(project_names: List[str]) -> None:
+    if get_backend() == SQLITE_BACKEND:
+        store = get_sqlite_store()
+        for project_name in project_names:
+            store.insert_project(project_name)
+        return
+
+    # Another process may have just added a project with the same name, which is not added again
+    data = "".join(f"{project_name}\n" for project_name in project_names).encode(TEXT_ENCODING)
+    get_project_tail().append(data)
+
+
+def read_text_project_names() -> List[str]:
+    data, _ = get_project_tail().read_all()
+    return data.decode(TEXT_ENCODING).splitlines()
+
+
+@metrics.timed("database.get_all_projects")
+def get_all_projects(pomo_log: pomodoro_log.PomodoroLog = None) -> List[project_pc.Project]:
+    """Returns all projects with their total and todays times. If a pomodoro log is given the times
+    are computed from it instead of the database aggregates."""
+
+    flush_writes()
+
+    if pomo_log is None and get_backend() == SQLITE_BACKEND:
+        projects = []
+        for name, total_time, todays_time in get_sqlite_store().get_project_totals(binary_store.day_key(datetime.now())):
+            project = project_pc.Project(name)
+            project.add_time(total_time)
+            project.todays_time = todays_time
+            projects.append(project)
+
+        return projects
 
-    stripped_lines = [line.rstrip("\n") for line in lines]
-    projects = {name: project_pc.Project(name) for name in stripped_lines}
+    projects = {name: project_pc.Project(name) for name in read_text_project_names()}
 
-    pomo_records = get_all_pomodoros()
-    current_time = datetime.now()
+    if pomo_log is not None:
+        total_times = pomo_log.totals_by_project()
+        todays_times = pomo_log.on_day(binary_store.day_key(datetime.now())).totals_by_project()
 
-    for pomo_record in pomo_records:
-        if pomo_record.project_name in projects:
-            is_current_day = (pomo_record.start_time.year == current_time.year and pomo_record.start_time.month ==
-                              current_time.month and pomo_record.start_time.day == current_time.day)
-            projects[pomo_record.project_name].add_time(
-                pomo_record.length, is_current_day)
+        for project in projects.values():
+            project.add_time(total_times.get(project.name, 0))
+            project.todays_time = todays_times.get(project.name, 0)
+
+        return list(projects.values())
+
+    if get_backend() == BINARY_BACKEND:
+        store = get_binary_store()
+        today = binary_store.day_key(datetime.now())
+
+        for project in projects.values():
+            project.add_time(store.get_project_total(project.name))
+            project.todays_time = store.get_project_day_total(project.name, today)
+
+        return list(projects.values())
+
+    cache = get_rollup_cache()
+    today = binary_store.day_key(datetime.now())
+
+    for project in projects.values():
+        project.add_time(cache.get_project_total(project.name))
+        project.todays_time = cache.get_project_day_total(project.name, today)
 
     return list(projects.values())
 
 
-def get_todays_total_time() -> int:
-    pomo_records = get_all_pomodoros()
-    current_time = datetime.now()
-    todays_total_time = 0
+@metrics.timed("database.get_todays_total_time")
+def get_todays_total_time(pomo_log: pomodoro_log.PomodoroLog = None) -> int:
+    flush_writes()
+
+    if pomo_log is not None:
+        return pomo_log.on_day(binary_store.day_key(datetime.now())).total_time()
+
+    if get_backend() == SQLITE_BACKEND:
+        return get_sqlite_store().get_day_total(binary_store.day_key(datetime.now()))
+    if get_backend() == BINARY_BACKEND:
+        return get_binary_store().get_day_total(binary_store.day_key(datetime.now()))
+
+    return get_rollup_cache().get_day_total(binary_store.day_key(datetime.now()))
+
+
+@metrics.timed("database.insert_pomodoro")
+def insert_pomodoro(project: project_pc.Project, timer: pomo_t.Timer, on_written: Callable[[], None] = None) -> None:
+    insert_pomodoro_record(PomodoroRecord(project.name, timer.local_start_time, timer.elapsed_time, timer.utc_offset),
+                           on_written)
+
+
+def insert_pomodoro_record(record: PomodoroRecord, on_written: Callable[[], None] = None) -> None:
+    """Queues a pomodoro to be written. on_written is called from the writer thread once it is on disk."""
+
+    get_write_queue().submit(write_pomodoro_records, record, on_written)
 
-    for pomo_record in pomo_records:
-        is_current_day = (pomo_record.start_time.year == current_time.year and pomo_record.start_time.month ==
-                          current_time.month and pomo_record.start_time.day == current_time.day)
-        if is_current_day:
-            todays_total_time += pomo_record.length
+    # Only kept up to date once something has asked for a report
+    if _report_index is not None:
+        _report_index.add(record.project_name, binary_store.to_wall_clock_secs(record.start_time), record.length)
 
-    return todays_total_time
 
+def write_pomodoro_records(records: List[PomodoroRecord]) -> None:
+    if get_backend() == BINARY_BACKEND:
+        get_binary_store().append_many([(record.project_name, binary_store.to_wall_clock_secs(record.start_time), record.length)
+                                        for record in records])
+        return
+    if get_backend() == SQLITE_BACKEND:
+        get_sqlite_store().insert_pomodoros(
+            (record.project_name, binary_store.to_wall_clock_secs(record.start_time), record.length) for record in records)
+        return
 
-def insert_pomodoro(project: project_pc.Project, timer: pomo_t.Timer) -> None:
-    with open(POMODORO_DATABASE_PATH, "a") as file:
-        start_time = timer.local_start_time.strftime(TIME_FORMAT)
-        file.write(f"{project.name}|{start_time}|{timer.elapsed_time}\n")
+    data = "".join(f"{record.project_name}|{format_start_time(record)}|{record.length}\n" for record in records)
+    get_pomodoro_tail().append(data.encode(TEXT_ENCODING))
 
 
+def format_start_time(record: PomodoroRecord) -> str:
+    """Formats the start time of a text log record, as a version 2 timestamp if its UTC offset is known."""
+
+    if record.utc_offset is None:
+        return record.start_time.strftime(TIME_FORMAT)
+
+    epoch = binary_store.to_wall_clock_secs(record.start_time) - record.utc_offset
+    return log_parser.encode_timestamp(epoch, record.utc_offset)
+
+
+@metrics.timed("database.get_all_pomodoros")
 def get_all_pomodoros() -> List[PomodoroRecord]:
-    with open(POMODORO_DATABASE_PATH, "r") as file:
-        lines = file.readlines()
+    flush_writes()
+
+    if get_backend() == BINARY_BACKEND:
+        return [PomodoroRecord(project_name, binary_store.from_wall_clock_secs(start), length)
+                for project_name, start, length in get_binary_store().iter_records()]
+    if get_backend() == SQLITE_BACKEND:
+        return [PomodoroRecord(project_name, binary_store.from_wall_clock_secs(start), length)
+                for project_name, start, length in get_sqlite_store().iter_pomodoros()]
+
+    return get_all_text_pomodoros()
+
+
+def get_pomodoro_log() -> pomodoro_log.PomodoroLog:
+    """Returns every pomodoro in the database as a compact columnar log."""
+
+    flush_writes()
+
+    if get_backend() == BINARY_BACKEND:
+        return pomodoro_log.PomodoroLog.from_records(get_binary_store().iter_records())
+    if get_backend() == SQLITE_BACKEND:
+        return pomodoro_log.PomodoroLog.from_records(get_sqlite_store().iter_pomodoros())
+
+    return pomodoro_log.PomodoroLog.from_columns(get_all_text_pomodoro_columns())
+
+
+def get_all_text_pomodoros() -> List[PomodoroRecord]:
+    columns = get_all_text_pomodoro_columns()
 
-    pomo_records = []
-    for line in lines:
-        project_name, start_time_str, length_str = line.split(
-            DATABASE_DELIMITER_CHAR)
+    return [PomodoroRecord(project_name, binary_store.from_wall_clock_secs(start), length)
+            for project_name, start, length in zip(*columns)]
 
-        start_time = datetime.strptime(start_time_str, TIME_FORMAT)
-        length = float(length_str)
 
-        pomo_records.append(PomodoroRecord(
-            project_name, start_time, float(length)))
+def get_all_text_pomodoro_columns() -> log_parser.PomodoroColumns:
+    with open(POMODORO_DATABASE_PATH, "rb") as file, file_lock.locked(file, exclusive=False):
+        data = file.read()
 
-    return pomo_records
+    return log_parser.parse_pomodoro_log(data)
 
 
 if __name__ == "__main__":
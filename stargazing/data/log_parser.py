@@ -0,0 +1,212 @@
+from __future__ import annotations
+from array import array
+from collections import namedtuple
+from datetime import date, datetime
+from typing import Iterator, List, Tuple
+import locale
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+from stargazing.utils.lazy_import import LazyModule
+
+# Only imported to decode logs in bulk, as it is slow to import
+numpy = LazyModule("numpy")
+
+# Parsed pomodoro log columns - start times are wall clock seconds (see binary_store.to_wall_clock_secs)
+PomodoroColumns = namedtuple(
+    "PomodoroColumns", ["project_names", "start_times", "lengths"])
+
+DELIMITER_CHAR = "|"
+
+# Version 1 records hold the local time as a "%d/%m/%Y %H:%M:%S" timestamp. Version 2 records hold
+# "@<UTC epoch seconds><+/-UTC offset seconds>", e.g. "@1760774461+3600", so the instant is exact
+# across DST changes and travel while the local day can still be recovered.
+V2_TIMESTAMP_PREFIX = "@"
+
+# Fixed width layout of the "%d/%m/%Y %H:%M:%S" timestamp field
+TIMESTAMP_LENGTH = 19
+TIMESTAMP_DIGIT_COLUMNS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]
+TIMESTAMP_SEPARATOR_COLUMNS = [2, 5, 10, 13, 16]
+TIMESTAMP_SEPARATORS = b"// ::"
+MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+STREAM_CHUNK_SIZE = 1 << 20
+
+# Fewer timestamps are decoded faster than numpy is imported, e.g. the lines polled from other processes
+NUMPY_MIN_TIMESTAMPS = 1000
+
+
+def parse_pomodoro_log(data: bytes) -> PomodoroColumns:
+    """Parses the whole text pomodoro log in one pass into array backed columns."""
+
+    text = data.decode(locale.getpreferredencoding(False)).rstrip("\n")
+    if not text:
+        return PomodoroColumns([], array("d"), array("d"))
+
+    # Every line has exactly three fields, so splitting lines and fields together leaves the
+    # columns interleaved in a single flat list
+    fields = text.replace("\n", DELIMITER_CHAR).split(DELIMITER_CHAR)
+    if len(fields) % 3:
+        raise ValueError("Malformed pomodoro log")
+
+    project_names = fields[0::3]
+    start_times = decode_timestamps(fields[1::3])
+    lengths = array("d", map(float, fields[2::3]))
+
+    return PomodoroColumns(project_names, start_times, lengths)
+
+
+def iter_pomodoro_log(log_path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Tuple[str, float, float]]:
+    """Yields (project name, wall clock start seconds, length) for every record in the log while
+    only holding one chunk of the file in memory."""
+
+    day_secs_cache = {}
+    remainder = ""
+
+    with open(log_path, "r") as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+
+            lines = (remainder + chunk).split("\n")
+            remainder = lines.pop()
+
+            for line in lines:
+                if line:
+                    yield parse_line(line, day_secs_cache)
+
+    if remainder:
+        yield parse_line(remainder, day_secs_cache)
+
+
+def parse_line(line: str, day_secs_cache: dict = None) -> Tuple[str, float, float]:
+    project_name, start_time_str, length_str = line.split(DELIMITER_CHAR)
+    start_time = decode_timestamp(start_time_str, day_secs_cache if day_secs_cache is not None else {})
+
+    return project_name, start_time, float(length_str)
+
+
+# ========================================================
+# Timestamp encoding
+# ========================================================
+
+def encode_timestamp(epoch: float, utc_offset: int) -> str:
+    """Encodes a version 2 timestamp from UTC epoch seconds and the UTC offset in seconds."""
+    return f"{V2_TIMESTAMP_PREFIX}{int(epoch)}{utc_offset:+d}"
+
+
+# ========================================================
+# Timestamp decoding
+# ========================================================
+
+def decode_timestamps(timestamps: List[str]) -> array:
+    """Decodes version 1 and 2 timestamps into an array of wall clock seconds."""
+
+    v2_indexes = [i for i, timestamp in enumerate(timestamps) if timestamp.startswith(V2_TIMESTAMP_PREFIX)]
+    if not v2_indexes:
+        return decode_v1_timestamps(timestamps)
+
+    # Logs start out with version 1 records, so decode those in bulk and fill in the rest
+    v2_index_set = set(v2_indexes)
+    v1_secs = iter(decode_v1_timestamps([timestamp for i, timestamp in enumerate(timestamps) if i not in v2_index_set]))
+
+    return array("d", (decode_v2_timestamp(timestamp) if i in v2_index_set else next(v1_secs)
+                       for i, timestamp in enumerate(timestamps)))
+
+
+def decode_v2_timestamp(timestamp: str) -> float:
+    """Decodes a version 2 timestamp into wall clock seconds - the UTC epoch shifted by the offset."""
+
+    sign_index = max(timestamp.rfind("+"), timestamp.rfind("-"))
+    return int(timestamp[1:sign_index]) + int(timestamp[sign_index:])
+
+
+def decode_v1_timestamps(timestamps: List[str]) -> array:
+    """Decodes "%d/%m/%Y %H:%M:%S" timestamps into an array of wall clock seconds."""
+
+    if (len(timestamps) >= NUMPY_MIN_TIMESTAMPS and numpy.available
+            and all(len(timestamp) == TIMESTAMP_LENGTH for timestamp in timestamps)):
+        try:
+            return _decode_timestamps_numpy(timestamps)
+        except (UnicodeEncodeError, ValueError):
+            pass
+
+    day_secs_cache = {}
+    return array("d", (decode_timestamp(timestamp, day_secs_cache) for timestamp in timestamps))
+
+
+def decode_timestamp(timestamp: str, day_secs_cache: dict) -> float:
+    """Decodes a single timestamp, caching the seconds at the start of each date seen."""
+
+    if timestamp.startswith(V2_TIMESTAMP_PREFIX):
+        return decode_v2_timestamp(timestamp)
+
+    if not _is_fixed_width_timestamp(timestamp):
+        return binary_store.to_wall_clock_secs(datetime.strptime(timestamp, database.TIME_FORMAT))
+
+    date_str = timestamp[:10]
+    day_secs = day_secs_cache.get(date_str)
+
+    if day_secs is None:
+        day = date(int(timestamp[6:10]), int(timestamp[3:5]), int(timestamp[0:2]))
+        day_secs = (day.toordinal() - EPOCH_ORDINAL) * binary_store.SECONDS_PER_DAY
+        day_secs_cache[date_str] = day_secs
+
+    hour, minute, second = int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f"time data {timestamp!r} is out of range")
+
+    return day_secs + hour * 3600 + minute * 60 + second
+
+
+def _is_fixed_width_timestamp(timestamp: str) -> bool:
+    return (len(timestamp) == TIMESTAMP_LENGTH and timestamp[2] == timestamp[5] == "/" and timestamp[10] == " "
+            and timestamp[13] == timestamp[16] == ":")
+
+
+def _decode_timestamps_numpy(timestamps: List[str]) -> array:
+    """Decodes fixed width timestamps in bulk. Raises ValueError if any is malformed or not a real
+    date, for the caller to decode them one by one instead."""
+
+    raw = numpy.array(timestamps, dtype=f"S{TIMESTAMP_LENGTH}")
+    chars = raw.view(numpy.uint8).reshape(-1, TIMESTAMP_LENGTH)
+
+    if (chars[:, TIMESTAMP_SEPARATOR_COLUMNS] != numpy.frombuffer(TIMESTAMP_SEPARATORS, dtype=numpy.uint8)).any():
+        raise ValueError("Invalid timestamp in pomodoro log")
+
+    digits = chars.astype(numpy.int64) - ord("0")
+
+    digit_columns = digits[:, TIMESTAMP_DIGIT_COLUMNS]
+    if ((digit_columns < 0) | (digit_columns > 9)).any():
+        raise ValueError("Invalid timestamp in pomodoro log")
+
+    def field(start: int, end: int) -> numpy.ndarray:
+        value = numpy.zeros(len(digits), dtype=numpy.int64)
+        for i in range(start, end):
+            value = value * 10 + digits[:, i]
+        return value
+
+    day, month, year = field(0, 2), field(3, 5), field(6, 10)
+    hour, minute, second = field(11, 13), field(14, 16), field(17, 19)
+
+    if ((month < 1) | (month > 12) | (day < 1)).any():
+        raise ValueError("Invalid timestamp in pomodoro log")
+
+    is_leap_year = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = numpy.array(MONTH_DAYS)[month - 1] + ((month == 2) & is_leap_year)
+    if ((day > month_days) | (hour > 23) | (minute > 59) | (second > 59)).any():
+        raise ValueError("Invalid timestamp in pomodoro log")
+
+    # Days since 1970-01-01 from a proleptic Gregorian date (Howard Hinnant's days_from_civil)
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * (month + numpy.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    secs = (days * binary_store.SECONDS_PER_DAY + hour * 3600 + minute * 60 + second).astype(numpy.float64)
+    return array("d", secs.tobytes())
@@ -0,0 +1,259 @@
+from __future__ import annotations
+from typing import List, Set
+import glob
+import os
+import os.path as path
+import threading
+import time
+import ujson
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.pomodoro.timer as pomo_t
+import stargazing.utils.file_lock as file_lock
+from stargazing.utils.logger import logger
+
+JOURNAL_DIRECTORY = f"{path.dirname(path.abspath(__file__))}/../data"
+
+# Each stargazing process keeps its own journal, locked while it is in use
+JOURNAL_PATTERN = "pomodoros*.journal"
+
+# Seconds between checkpoints of a running pomodoro
+CHECKPOINT_INTERVAL = 5
+
+# Checkpoints are synced to disk at most this often, from a background thread
+FSYNC_INTERVAL = 30
+
+# Real paths of the journals this process has open and locked
+_open_journal_paths: Set[str] = set()
+
+
+def get_journal_path(journal_directory: str = JOURNAL_DIRECTORY) -> str:
+    return path.join(journal_directory, f"pomodoros.{os.getpid()}.journal")
+
+
+def get_pomodoro_id(timer: pomo_t.Timer) -> float:
+    """Returns the id of a pomodoro in the journal - its start as wall clock seconds, which pausing
+    does not change."""
+    return binary_store.to_wall_clock_secs(timer.local_start_time)
+
+
+def recover_journals(journal_directory: str = JOURNAL_DIRECTORY) -> List[database.PomodoroRecord]:
+    """Recovers the journals of stargazing processes that are no longer running - a running
+    process holds the lock on its journal while a pomodoro is in progress. Returns the recovered
+    records."""
+
+    records = []
+    for journal_path in glob.glob(path.join(journal_directory, JOURNAL_PATTERN)):
+        try:
+            with open(journal_path, "rb") as file:
+                if not file_lock.lock(file, blocking=False):
+                    continue
+
+                records.extend(recover_journal(journal_path))
+                os.remove(journal_path)
+        except OSError as e:
+            logger.error(f"Failed to recover pomodoro journal {journal_path}. Full message: {e}")
+            continue
+
+    return records
+
+
+def recover_journal(journal_path: str) -> List[database.PomodoroRecord]:
+    """Inserts every pomodoro left unfinished by a previous run (e.g. it crashed), each from its
+    last checkpoint, and clears the journal. Returns the recovered records."""
+
+    if not path.exists(journal_path):
+        return []
+
+    with open(journal_path, "rb") as file:
+        lines = file.read().splitlines()
+
+    # Last checkpoint of each pomodoro not yet written to the database, by pomodoro id
+    last_checkpoints = {}
+    for line in lines:
+        try:
+            entry = ujson.loads(line)
+        except ValueError:
+            # Torn write at the end of the journal
+            continue
+
+        if "finished" not in entry:
+            last_checkpoints[entry["start"]] = entry
+        elif entry["finished"] is True:
+            # Written by older versions, finishing everything before it
+            last_checkpoints.clear()
+        else:
+            last_checkpoints.pop(entry["finished"], None)
+
+    records = []
+    for checkpoint in last_checkpoints.values():
+        if checkpoint["elapsed"] <= 0:
+            continue
+
+        record = database.PomodoroRecord(checkpoint["project"],
+                                         binary_store.from_wall_clock_secs(checkpoint["start"]),
+                                         checkpoint["elapsed"],
+                                         checkpoint.get("utc_offset"))
+        database.insert_pomodoro_record(record)
+        records.append(record)
+        logger.info(f"Recovered unfinished pomodoro from journal: {record}")
+
+    if records:
+        database.flush_writes()
+
+    os.truncate(journal_path, 0)
+    return records
+
+
+class PomodoroJournal():
+    """Write-ahead journal of the pomodoro in progress, so it can be recovered if stargazing exits
+    without finishing it.
+
+    Checkpoints are cheap enough to request every tick - one is only written every
+    checkpoint_interval seconds, as a single appended line flushed to the OS. Syncing to disk is
+    batched to every fsync_interval seconds and done from a background thread.
+
+    As the next pomodoro can start before the last one is written to the database, checkpoints
+    carry the id of their pomodoro, and each pomodoro is finished by id. The journal is cleared once
+    every pomodoro in it has been finished.
+
+    @param journal_path: Path of the journal file, by default one for this process.
+    @param checkpoint_interval: Seconds between checkpoints.
+    @param fsync_interval: Least number of seconds between syncs to disk."""
+
+    def __init__(self, journal_path: str = None, checkpoint_interval: float = CHECKPOINT_INTERVAL,
+                 fsync_interval: float = FSYNC_INTERVAL) -> None:
+        self.journal_path = journal_path if journal_path else get_journal_path()
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync_interval = fsync_interval
+
+        self.file = None
+        self.file_lock = threading.Lock()
+        self.next_checkpoint_time = 0
+        self.next_fsync_time = 0
+
+        # Id of the pomodoro last checkpointed, and of those checkpointed but not finished
+        self.pomodoro_id = None
+        self.unfinished_ids: Set[float] = set()
+
+        self.fsync_requested = threading.Event()
+        self.fsync_thread = None
+
+        self.checkpoints = 0
+        self.fsyncs = 0
+
+    def checkpoint(self, project_name: str, timer: pomo_t.Timer, force=False) -> None:
+        """Records the pomodoro in progress, if a checkpoint is due or force is set."""
+
+        pomodoro_id = get_pomodoro_id(timer)
+
+        # A new pomodoro is checkpointed straight away
+        now = time.monotonic()
+        if not force and now < self.next_checkpoint_time and pomodoro_id == self.pomodoro_id:
+            return
+        self.next_checkpoint_time = now + self.checkpoint_interval
+        self.pomodoro_id = pomodoro_id
+
+        self.__append(pomodoro_id, {
+            "project": project_name,
+            "start": pomodoro_id,
+            "utc_offset": timer.utc_offset,
+            "elapsed": timer.elapsed_time
+        })
+
+        if force or now >= self.next_fsync_time:
+            self.next_fsync_time = now + self.fsync_interval
+            self.__request_fsync()
+
+    def finish(self, pomodoro_id: float) -> None:
+        """Marks the pomodoro with the given id as written to the database, so it is not recovered.
+        Clears the journal if no other pomodoro in it is unfinished - the marker is written first,
+        so the pomodoro is not recovered if clearing fails."""
+
+        with self.file_lock:
+            if self.file is None or pomodoro_id not in self.unfinished_ids:
+                return
+
+            self.file.write(ujson.dumps({"finished": pomodoro_id}) + "\n")
+            self.file.flush()
+            self.unfinished_ids.discard(pomodoro_id)
+
+            if not self.unfinished_ids:
+                self.__close_file()
+                os.truncate(self.journal_path, 0)
+
+    def close(self) -> None:
+        """Closes the journal, releasing its lock. Pomodoros not yet finished are left in it, to be
+        recovered."""
+
+        with self.file_lock:
+            if self.file is not None:
+                self.__close_file()
+
+    def __append(self, pomodoro_id: float, checkpoint: dict) -> None:
+        with self.file_lock:
+            if self.file is None:
+                self.file = self.__open()
+
+            self.file.write(ujson.dumps(checkpoint) + "\n")
+            self.file.flush()
+            self.unfinished_ids.add(pomodoro_id)
+
+        self.checkpoints += 1
+
+    def __open(self):
+        """Opens and locks the journal, so other processes do not recover it while it is in use.
+        Raises RuntimeError if the journal is already open in this process, as its lock would
+        never be released."""
+
+        journal_path = path.realpath(self.journal_path)
+
+        while True:
+            file = open(self.journal_path, "a", encoding="utf-8")
+
+            if not file_lock.lock(file, blocking=False):
+                if journal_path in _open_journal_paths:
+                    file.close()
+                    raise RuntimeError(f"Pomodoro journal {self.journal_path} is already open in this process")
+
+                # Held by another process recovering the journal, which removes it once done
+                file_lock.lock(file)
+
+            # Another process may have recovered and removed it while the lock was awaited
+            if os.fstat(file.fileno()).st_nlink:
+                _open_journal_paths.add(journal_path)
+                return file
+            file.close()
+
+    def __close_file(self) -> None:
+        self.file.close()
+        self.file = None
+        _open_journal_paths.discard(path.realpath(self.journal_path))
+
+    def __request_fsync(self) -> None:
+        if self.fsync_thread is None:
+            self.fsync_thread = threading.Thread(target=self.__sync_when_requested, name="journal-fsync")
+            self.fsync_thread.daemon = True
+            self.fsync_thread.start()
+
+        self.fsync_requested.set()
+
+    def __sync_when_requested(self) -> None:
+        while True:
+            self.fsync_requested.wait()
+            self.fsync_requested.clear()
+
+            # Synced through a duplicate descriptor, so appends are not blocked while syncing
+            with self.file_lock:
+                if self.file is None:
+                    continue
+                fd = os.dup(self.file.fileno())
+
+            try:
+                os.fsync(fd)
+                self.fsyncs += 1
+            except OSError as e:
+                logger.error(f"Failed to sync pomodoro journal. Full message: {e}")
+            finally:
+                os.close(fd)
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.log_parser as log_parser
+from stargazing.utils.lazy_import import LazyModule
+
+numpy = LazyModule("numpy")
+
+
+class PomodoroEntry():
+    """Lightweight view of a single pomodoro in a PomodoroLog.
+
+    @param project_name: Name of the project the pomodoro was logged against.
+    @param start_time: Start of the pomodoro in wall clock seconds.
+    @param length: Length of the pomodoro in seconds."""
+
+    __slots__ = ("project_name", "start_time", "length")
+
+    def __init__(self, project_name: str, start_time: float, length: float) -> None:
+        self.project_name = project_name
+        self.start_time = start_time
+        self.length = length
+
+    @property
+    def start_datetime(self) -> datetime:
+        return binary_store.from_wall_clock_secs(self.start_time)
+
+    def __repr__(self) -> str:
+        return f"PomodoroEntry({self.project_name!r}, {self.start_time!r}, {self.length!r})"
+
+
+class PomodoroLog():
+    """Compact columnar store of pomodoros.
+
+    Start times (wall clock seconds) and lengths are kept in parallel array('d') columns and
+    project names are interned into an array('I') column of ids, so no per-row Python objects
+    are held. Time range slices and project/day grouping work on the columns directly.
+
+    @param project_names: Interned project names shared with slices of this log."""
+
+    __slots__ = ("project_names", "project_ids", "project_column", "start_times", "lengths", "is_sorted")
+
+    def __init__(self, project_names: List[str] = None) -> None:
+        self.project_names = project_names if project_names is not None else []
+        self.project_ids = {name: i for i, name in enumerate(self.project_names)}
+
+        self.project_column = array("I")
+        self.start_times = array("d")
+        self.lengths = array("d")
+
+        # Pomodoros are appended in start order, which allows time ranges to be binary searched
+        self.is_sorted = True
+
+    @staticmethod
+    def from_columns(columns: log_parser.PomodoroColumns) -> PomodoroLog:
+        pomodoro_log = PomodoroLog()
+        project_ids = pomodoro_log.project_ids
+
+        for project_name in columns.project_names:
+            if project_name not in project_ids:
+                project_ids[project_name] = len(pomodoro_log.project_names)
+                pomodoro_log.project_names.append(project_name)
+
+        pomodoro_log.project_column = array("I", map(project_ids.__getitem__, columns.project_names))
+        pomodoro_log.start_times = array("d", columns.start_times)
+        pomodoro_log.lengths = array("d", columns.lengths)
+        pomodoro_log.is_sorted = all(a <= b for a, b in zip(columns.start_times, columns.start_times[1:]))
+        return pomodoro_log
+
+    @staticmethod
+    def from_records(records: Iterable[Tuple[str, float, float]]) -> PomodoroLog:
+        pomodoro_log = PomodoroLog()
+        pomodoro_log.extend(records)
+        return pomodoro_log
+
+    # ========================================================
+    # Adding pomodoros
+    # ========================================================
+
+    def append(self, project_name: str, start_time: float, length: float) -> None:
+        project_id = self.project_ids.get(project_name)
+        if project_id is None:
+            project_id = self.project_ids[project_name] = len(self.project_names)
+            self.project_names.append(project_name)
+
+        if self.start_times and start_time < self.start_times[-1]:
+            self.is_sorted = False
+
+        self.project_column.append(project_id)
+        self.start_times.append(start_time)
+        self.lengths.append(length)
+
+    def extend(self, records: Iterable[Tuple[str, float, float]]) -> None:
+        """Appends (project name, wall clock start seconds, length) records."""
+
+        for project_name, start_time, length in records:
+            self.append(project_name, start_time, length)
+
+    # ========================================================
+    # Row access
+    # ========================================================
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __getitem__(self, index: int) -> PomodoroEntry:
+        return PomodoroEntry(self.project_names[self.project_column[index]], self.start_times[index],
+                             self.lengths[index])
+
+    def __iter__(self) -> Iterator[PomodoroEntry]:
+        for i in range(len(self)):
+            yield self[i]
+
+    # ========================================================
+    # Slicing and grouping
+    # ========================================================
+
+    def between(self, start_time: float = None, end_time: float = None) -> PomodoroLog:
+        """Returns the pomodoros starting in [start_time, end_time) as a new log sharing this log's
+        project names."""
+
+        sliced = PomodoroLog(self.project_names)
+        sliced.project_ids = self.project_ids
+
+        if self.is_sorted:
+            lo = 0 if start_time is None else bisect_left(self.start_times, start_time)
+            hi = len(self) if end_time is None else bisect_left(self.start_times, end_time)
+
+            sliced.project_column = self.project_column[lo:hi]
+            sliced.start_times = self.start_times[lo:hi]
+            sliced.lengths = self.lengths[lo:hi]
+            return sliced
+
+        for i, start in enumerate(self.start_times):
+            if (start_time is None or start >= start_time) and (end_time is None or start < end_time):
+                sliced.project_column.append(self.project_column[i])
+                sliced.start_times.append(start)
+                sliced.lengths.append(self.lengths[i])
+
+        sliced.is_sorted = False
+        return sliced
+
+    def on_day(self, day: int) -> PomodoroLog:
+        """Returns the pomodoros starting on the given day key (see binary_store.day_key)."""
+
+        return self.between(day * binary_store.SECONDS_PER_DAY, (day + 1) * binary_store.SECONDS_PER_DAY)
+
+    def total_time(self) -> float:
+        return sum(self.lengths)
+
+    def totals_by_project(self) -> Dict[str, float]:
+        if numpy.available and len(self):
+            project_ids = numpy.frombuffer(self.project_column, dtype=f"u{self.project_column.itemsize}")
+            counts = numpy.bincount(project_ids)
+            totals = numpy.bincount(project_ids, weights=numpy.frombuffer(self.lengths, dtype=numpy.float64))
+            return {self.project_names[i]: float(totals[i]) for i in numpy.flatnonzero(counts)}
+
+        totals = defaultdict(float)
+        for project_id, length in zip(self.project_column, self.lengths):
+            totals[project_id] += length
+
+        return {self.project_names[project_id]: total for project_id, total in totals.items()}
+
+    def totals_by_day(self) -> Dict[int, float]:
+        totals = defaultdict(float)
+        for start, length in zip(self.start_times, self.lengths):
+            totals[int(start // binary_store.SECONDS_PER_DAY)] += length
+
+        return dict(totals)
@@ -0,0 +1,320 @@
+from __future__ import annotations
+from array import array
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.pomodoro_log as pomodoro_log
+from stargazing.utils.format_funcs import format_project_time
+
+SECONDS_PER_HOUR = 3600
+HOURS_PER_DAY = 24
+DAYS_PER_WEEK = 7
+
+# Day key 0 (01/01/1970) was a Thursday, weekdays are numbered from Monday as in datetime
+EPOCH_WEEKDAY = 3
+
+BAR_CHARS = " ▁▂▃▄▅▆▇█"
+
+
+def get_weekday(day: int) -> int:
+    return (day + EPOCH_WEEKDAY) % DAYS_PER_WEEK
+
+
+def get_week_start(day: int) -> int:
+    """Returns the day key of the Monday starting the week of the given day key."""
+    return day - get_weekday(day)
+
+
+def get_day_datetime(day: int) -> datetime:
+    return binary_store.from_wall_clock_secs(day * binary_store.SECONDS_PER_DAY)
+
+
+def format_bars(values: List[float], top: float = None) -> str:
+    """Returns a one character bar per value, scaled to top (by default the largest value)."""
+
+    if top is None:
+        top = max(values, default=0)
+    if not top:
+        return BAR_CHARS[0] * len(values)
+
+    steps = len(BAR_CHARS) - 1
+    return "".join(BAR_CHARS[min(round(value / top * steps), steps)] for value in values)
+
+
+class ReportIndex():
+    """Prefix sums of pomodoro time over day buckets, for the total and for each project, along with
+    hour of day heatmaps for the total and for each project.
+
+    The sums are built in one pass over a pomodoro log, after which the time spent over any range
+    of days is the difference of two prefix sums. A project's prefix sums only run up to the last day
+    it has time on and are read as flat past their end, so a new day only grows the total sums.
+    Pomodoros are folded in as they are inserted - appending to the latest day updates one sum per
+    array, an older day updates the sums from that day on.
+
+    Pomodoros are bucketed by the day they start on, as in PomodoroLog.on_day."""
+
+    def __init__(self) -> None:
+        # Day key of the first bucket, None until a pomodoro is added
+        self.first_day = None
+
+        # prefix[i] is the time spent from first_day up to (not including) first_day + i
+        self.total_prefix = array("d", [0])
+        self.project_prefixes: Dict[str, array] = {}
+
+        # Seconds spent in each hour of each weekday, split across the hours a pomodoro spans
+        self.heatmap = self.__make_heatmap()
+        self.project_heatmaps: Dict[str, List[array]] = {}
+
+        self.pomodoros = 0
+
+    @staticmethod
+    def from_log(pomo_log: pomodoro_log.PomodoroLog) -> ReportIndex:
+        index = ReportIndex()
+        if not len(pomo_log):
+            return index
+
+        index.first_day = int(min(pomo_log.start_times) // binary_store.SECONDS_PER_DAY)
+        last_day = int(max(pomo_log.start_times) // binary_store.SECONDS_PER_DAY)
+
+        day_totals = [0.0] * (last_day - index.first_day + 1)
+        project_day_totals = [[0.0] * len(day_totals) for _ in pomo_log.project_names]
+        project_last_offsets = [0] * len(pomo_log.project_names)
+
+        project_heatmaps = [index.__make_heatmap() for _ in pomo_log.project_names]
+
+        for project_id, start_time, length in zip(pomo_log.project_column, pomo_log.start_times, pomo_log.lengths):
+            offset = int(start_time // binary_store.SECONDS_PER_DAY) - index.first_day
+            day_totals[offset] += length
+            project_day_totals[project_id][offset] += length
+            project_last_offsets[project_id] = max(project_last_offsets[project_id], offset)
+
+            index.__add_to_heatmap(project_heatmaps[project_id], start_time, length)
+
+        index.total_prefix = index.__accumulate(day_totals)
+        for project_id, project_name in enumerate(pomo_log.project_names):
+            totals = project_day_totals[project_id][:project_last_offsets[project_id] + 1]
+            index.project_prefixes[project_name] = index.__accumulate(totals)
+            index.project_heatmaps[project_name] = project_heatmaps[project_id]
+
+        index.pomodoros = len(pomo_log)
+        return index
+
+    # ========================================================
+    # Adding pomodoros
+    # ========================================================
+
+    def add(self, project_name: str, start_time: float, length: float) -> None:
+        """Folds in a pomodoro starting at the given wall clock seconds."""
+
+        day = int(start_time // binary_store.SECONDS_PER_DAY)
+
+        if self.first_day is None:
+            self.first_day = day
+        elif day < self.first_day:
+            self.__shift_first_day(day)
+
+        offset = day - self.first_day
+        self.__add_to_prefix(self.total_prefix, offset, length)
+
+        project_prefix = self.project_prefixes.get(project_name)
+        if project_prefix is None:
+            project_prefix = self.project_prefixes[project_name] = array("d", [0])
+        self.__add_to_prefix(project_prefix, offset, length)
+
+        project_heatmap = self.project_heatmaps.get(project_name)
+        if project_heatmap is None:
+            project_heatmap = self.project_heatmaps[project_name] = self.__make_heatmap()
+        self.__add_to_heatmap(project_heatmap, start_time, length)
+        self.pomodoros += 1
+
+    # ========================================================
+    # Range queries
+    # ========================================================
+
+    def total_between(self, start_day: int, end_day: int, project_name: str = None) -> float:
+        """Returns the time spent from start_day to end_day inclusive, on one project or in total."""
+
+        if self.first_day is None or end_day < start_day:
+            return 0
+
+        prefix = self.total_prefix if project_name is None else self.project_prefixes.get(project_name)
+        if prefix is None:
+            return 0
+
+        return self.__prefix_at(prefix, end_day + 1) - self.__prefix_at(prefix, start_day)
+
+    def day_total(self, day: int, project_name: str = None) -> float:
+        return self.total_between(day, day, project_name)
+
+    def project_totals_between(self, start_day: int, end_day: int) -> Dict[str, float]:
+        """Returns the time spent on each project with any time from start_day to end_day inclusive."""
+
+        totals = {}
+        for project_name in self.project_prefixes:
+            total = self.total_between(start_day, end_day, project_name)
+            if total:
+                totals[project_name] = total
+
+        return totals
+
+    # ========================================================
+    # Series
+    # ========================================================
+
+    def daily_series(self, start_day: int, end_day: int, project_name: str = None) -> List[float]:
+        return [self.day_total(day, project_name) for day in range(start_day, end_day + 1)]
+
+    def weekly_series(self, start_day: int, end_day: int, project_name: str = None) -> List[Tuple[int, float]]:
+        """Returns (Monday day key, time spent) for each week overlapping start_day to end_day,
+        counting only the days in the range."""
+
+        series = []
+        for week_start in range(get_week_start(start_day), end_day + 1, DAYS_PER_WEEK):
+            total = self.total_between(max(week_start, start_day),
+                                       min(week_start + DAYS_PER_WEEK - 1, end_day), project_name)
+            series.append((week_start, total))
+
+        return series
+
+    def streaks(self, today: int, project_name: str = None) -> Tuple[int, int]:
+        """Returns the current and longest runs of consecutive days with time spent. The current
+        streak is still running if no time has been spent yet today."""
+
+        if self.first_day is None:
+            return 0, 0
+
+        current = 0
+        day = today if self.day_total(today, project_name) else today - 1
+        while day >= self.first_day and self.day_total(day, project_name):
+            current += 1
+            day -= 1
+
+        longest = run = 0
+        for day in range(self.first_day, self.first_day + len(self.total_prefix) - 1):
+            run = run + 1 if self.day_total(day, project_name) else 0
+            longest = max(longest, run)
+
+        return current, longest
+
+    def get_heatmap(self, project_name: str = None) -> List[array]:
+        """Returns the time spent in each hour of each weekday, on one project or in total."""
+
+        if project_name is None:
+            return self.heatmap
+
+        return self.project_heatmaps.get(project_name) or self.__make_heatmap()
+
+    def hour_totals(self, weekday: int = None, project_name: str = None) -> List[float]:
+        """Returns the time spent in each hour of the day, on one weekday (0 is Monday) or all,
+        on one project or in total."""
+
+        heatmap = self.get_heatmap(project_name)
+        if weekday is not None:
+            return list(heatmap[weekday])
+
+        return [sum(hours) for hours in zip(*heatmap)]
+
+    # ========================================================
+    # Helper methods
+    # ========================================================
+
+    def __prefix_at(self, prefix: array, day: int) -> float:
+        offset = min(max(day - self.first_day, 0), len(prefix) - 1)
+        return prefix[offset]
+
+    def __add_to_prefix(self, prefix: array, offset: int, length: float) -> None:
+        # Carry the sum forward to the new day, then add to every sum after it
+        if len(prefix) < offset + 2:
+            prefix.extend([prefix[-1]] * (offset + 2 - len(prefix)))
+
+        for i in range(offset + 1, len(prefix)):
+            prefix[i] += length
+
+    def __shift_first_day(self, day: int) -> None:
+        padding = array("d", [0] * (self.first_day - day))
+
+        self.total_prefix = padding + self.total_prefix
+        for project_name, prefix in self.project_prefixes.items():
+            self.project_prefixes[project_name] = padding + prefix
+
+        self.first_day = day
+
+    def __make_heatmap(self) -> List[array]:
+        return [array("d", [0] * HOURS_PER_DAY) for _ in range(DAYS_PER_WEEK)]
+
+    def __add_to_heatmap(self, project_heatmap: List[array], start_time: float, length: float) -> None:
+        """Adds to the total heatmap and the given project's."""
+
+        current = start_time
+        end_time = start_time + length
+
+        while current < end_time:
+            hour_end = (current // SECONDS_PER_HOUR + 1) * SECONDS_PER_HOUR
+            day = int(current // binary_store.SECONDS_PER_DAY)
+            hour = int(current % binary_store.SECONDS_PER_DAY // SECONDS_PER_HOUR)
+
+            spent = min(hour_end, end_time) - current
+            self.heatmap[get_weekday(day)][hour] += spent
+            project_heatmap[get_weekday(day)][hour] += spent
+            current = hour_end
+
+    def __accumulate(self, totals: List[float]) -> array:
+        prefix = array("d", [0])
+        for total in totals:
+            prefix.append(prefix[-1] + total)
+        return prefix
+
+
+# ========================================================
+# Text reports
+# ========================================================
+
+def format_report(index: ReportIndex, today: int, days: int = 14, project_name: str = None) -> List[str]:
+    """Returns the lines of a plain text report of the last given number of days."""
+
+    start_day = today - days + 1
+    current_streak, longest_streak = index.streaks(today, project_name)
+
+    lines = [f"report for {project_name}" if project_name else "report for all projects", ""]
+    lines += [
+        f"{'today':<16}{format_project_time(int(index.day_total(today, project_name))):>10}",
+        f"{'last 7 days':<16}{format_project_time(int(index.total_between(today - 6, today, project_name))):>10}",
+        f"{'last 30 days':<16}{format_project_time(int(index.total_between(today - 29, today, project_name))):>10}",
+        f"{'all time':<16}{format_project_time(int(index.total_between(index.first_day or today, today, project_name))):>10}",
+        f"{'streak':<16}{current_streak:>5} days (longest {longest_streak})",
+        ""
+    ]
+
+    daily = index.daily_series(start_day, today, project_name)
+    top = max(daily, default=0)
+    lines.append(f"daily, last {days} days")
+    for day, total in zip(range(start_day, today + 1), daily):
+        bar = "█" * round(total / top * 20) if top else ""
+        lines.append(f"  {get_day_datetime(day).strftime('%a %d/%m')}  {format_project_time(int(total)):>8}  {bar}")
+    lines.append("")
+
+    lines.append("weekly")
+    for week_start, total in index.weekly_series(start_day, today, project_name):
+        lines.append(f"  week of {get_day_datetime(week_start).strftime('%d/%m/%Y')}  {format_project_time(int(total)):>8}")
+    lines.append("")
+
+    if project_name is None:
+        lines.append(f"projects, last {days} days")
+        project_totals = index.project_totals_between(start_day, today)
+        for name, total in sorted(project_totals.items(), key=lambda item: -item[1]):
+            lines.append(f"  {name:<20} {format_project_time(int(total)):>8}")
+        if not project_totals:
+            lines.append("  no pomodoros")
+        lines.append("")
+
+    lines.append("hour of day, all time")
+    lines.append(f"  {''.join(f'{hour:<6}' for hour in range(0, HOURS_PER_DAY, 6))}")
+    heatmap = index.get_heatmap(project_name)
+    top = max(max(hours) for hours in heatmap)
+    for weekday, hours in enumerate(heatmap):
+        name = get_day_datetime(weekday - EPOCH_WEEKDAY).strftime("%a")
+        lines.append(f"  {format_bars(list(hours), top)}  {name}")
+
+    return lines
+
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from collections import defaultdict
+import os
+import os.path as path
+import ujson
+import zlib
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.data.log_parser as log_parser
+
+ROLLUP_CACHE_PATH = f"{path.dirname(path.abspath(__file__))}/../data/pomodoros.rollup"
+
+CACHE_VERSION = 2
+
+# Bytes of the log just before the folded offset that are checked for changes on refresh
+CHECK_WINDOW = 4096
+
+
+class RollupCache():
+    """Persisted running totals over the text pomodoro log.
+
+    Stores per-project lifetime totals, per-day totals and the byte offset of the log that has
+    been folded in. On refresh only the bytes appended after that offset are read and parsed. The
+    log's inode and a CRC of the CHECK_WINDOW bytes before the offset are kept so that truncation,
+    replacement or hand edits of the latest folded records are detected, in which case the totals
+    are rebuilt from scratch. Edits further back that keep the log's length are not detected.
+
+    @param log_path: Path of the text pomodoro log.
+    @param cache_path: Path of the persisted cache file."""
+
+    def __init__(self, log_path: str = None, cache_path: str = ROLLUP_CACHE_PATH) -> None:
+        self.log_path = log_path if log_path else database.POMODORO_DATABASE_PATH
+        self.cache_path = cache_path
+
+        self.offset = 0
+        self.window_crc = 0
+        self.inode = 0
+        self.size = 0
+        self.mtime_ns = 0
+        self.project_totals = defaultdict(float)
+        self.day_totals = defaultdict(lambda: defaultdict(float))
+
+        self.__load()
+
+    # ========================================================
+    # Queries
+    # ========================================================
+
+    def get_project_total(self, project_name: str) -> float:
+        return self.project_totals.get(project_name, 0)
+
+    def get_project_day_total(self, project_name: str, day: int) -> float:
+        if day not in self.day_totals:
+            return 0
+        return self.day_totals[day].get(project_name, 0)
+
+    def get_day_total(self, day: int) -> float:
+        if day not in self.day_totals:
+            return 0
+        return sum(self.day_totals[day].values())
+
+    # ========================================================
+    # Updating
+    # ========================================================
+
+    def refresh(self) -> None:
+        """Folds in records appended to the log since the last refresh, rebuilding the totals if
+        the already folded part of the log has changed."""
+
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self.offset:
+                self.__reset()
+                self.__save()
+            return
+
+        if stat.st_ino == self.inode and stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns:
+            return
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.__reset()
+
+        with open(self.log_path, "rb") as file:
+            # data starts at data_start in the log, with the checked window before the offset
+            data_start = max(self.offset - CHECK_WINDOW, 0)
+            file.seek(data_start)
+            data = file.read()
+
+            if zlib.crc32(data[:self.offset - data_start]) != self.window_crc:
+                self.__reset()
+                data_start = 0
+                file.seek(0)
+                data = file.read()
+
+        # Only fold complete lines, a partially written last line is picked up next refresh
+        end = data.rfind(b"\n") + 1
+        if end > self.offset - data_start:
+            self.__fold(data[self.offset - data_start:end])
+            self.window_crc = zlib.crc32(data[max(end - CHECK_WINDOW, 0):end])
+            self.offset = data_start + end
+
+        self.inode = stat.st_ino
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.__save()
+
+    def __fold(self, data: bytes) -> None:
+        for project_name, start, length in zip(*log_parser.parse_pomodoro_log(data)):
+            self.project_totals[project_name] += length
+            self.day_totals[int(start // binary_store.SECONDS_PER_DAY)][project_name] += length
+
+    def __reset(self) -> None:
+        self.offset = 0
+        self.window_crc = 0
+        self.inode = 0
+        self.size = 0
+        self.mtime_ns = 0
+        self.project_totals.clear()
+        self.day_totals.clear()
+
+    # ========================================================
+    # Persistence
+    # ========================================================
+
+    def __load(self) -> None:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                data = ujson.load(file)
+
+            if data["version"] != CACHE_VERSION:
+                return
+
+            self.offset = data["offset"]
+            self.window_crc = data["window_crc"]
+            self.inode = data["inode"]
+            self.size = data["size"]
+            self.mtime_ns = data["mtime_ns"]
+            self.project_totals.update(data["project_totals"])
+            for day, totals in data["day_totals"].items():
+                self.day_totals[int(day)].update(totals)
+        except (OSError, ValueError, KeyError):
+            self.__reset()
+
+    def __save(self) -> None:
+        data = {
+            "version": CACHE_VERSION,
+            "offset": self.offset,
+            "window_crc": self.window_crc,
+            "inode": self.inode,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "project_totals": self.project_totals,
+            "day_totals": {str(day): totals for day, totals in self.day_totals.items()}
+        }
+
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            ujson.dump(data, file)
+        os.replace(tmp_path, self.cache_path)
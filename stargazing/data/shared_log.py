@@ -0,0 +1,132 @@
+from typing import List, Set, Tuple, Union
+import os
+import threading
+import time
+
+import stargazing.utils.file_lock as file_lock
+
+# The log is checked for appends by other processes at most this often
+POLL_INTERVAL = 1.0
+
+
+class SharedLogTail():
+    """Follows an append-only text log shared by several stargazing processes.
+
+    Appends hold an exclusive advisory lock on the log, and reads a shared one, so a reader never
+    sees a partly written batch of lines. The offset up to which the log has been read is kept, and
+    only bytes after it are read - appends first read whatever other processes appended since, then
+    move the offset past their own lines, so a process never reads back its own writes. Lines read
+    are queued until poll hands them out. Other processes' appends are noticed by polling the size
+    and modification time of the log.
+
+    @param log_path: Path of the log.
+    @param unique_lines: Whether lines are unique in the log, in which case appends skip lines
+    that are already in it - e.g. a project another process has just created.
+    @param poll_interval: Least number of seconds between checks for appends."""
+
+    def __init__(self, log_path: str, unique_lines=False, poll_interval: float = POLL_INTERVAL) -> None:
+        self.log_path = log_path
+        self.unique_lines = unique_lines
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        # None until the log is first read or written, everything before it is taken as known
+        self.offset = None
+        self.pending: List[bytes] = []
+        # Every line read or appended, only kept for logs of unique lines
+        self.lines: Set[bytes] = set()
+
+        self.stat = None
+        self.last_poll_time = 0
+
+    def start_at(self, offset: int) -> None:
+        """Sets the offset the log has been read up to elsewhere, e.g. by a cache, dropping any
+        lines read before it."""
+
+        with self.lock:
+            self.offset = offset
+            self.pending.clear()
+
+    def read_all(self) -> Tuple[bytes, int]:
+        """Returns all complete lines of the log, along with the number of lines in it still
+        waiting to be handed out by poll."""
+
+        with self.lock:
+            with open(self.log_path, "rb") as file, file_lock.locked(file, exclusive=False):
+                data = file.read()
+
+            data = data[:data.rfind(b"\n") + 1]
+            if self.offset is not None and len(data) > self.offset:
+                self.pending.append(data[self.offset:])
+            self.offset = len(data)
+
+            if self.unique_lines:
+                self.lines.update(data.splitlines())
+
+            return data, sum(chunk.count(b"\n") for chunk in self.pending)
+
+    def append(self, data: bytes) -> bytes:
+        """Appends complete lines to the log. Returns the data appended, which for logs of unique
+        lines leaves out lines already in the log."""
+
+        with self.lock, open(self.log_path, "ab+") as file, file_lock.locked(file):
+            self.__read_new(file)
+
+            if self.unique_lines:
+                new_lines = [line for line in dict.fromkeys(data.splitlines()) if line not in self.lines]
+                self.lines.update(new_lines)
+                data = b"".join(line + b"\n" for line in new_lines)
+
+            file.write(data)
+            file.flush()
+            self.offset = file.tell()
+
+        return data
+
+    def poll(self, force=False) -> bytes:
+        """Returns the lines other processes have appended since the last poll. The log is only
+        read if its size or modification time changed."""
+
+        now = time.monotonic()
+        if not force and now - self.last_poll_time < self.poll_interval:
+            return b""
+        self.last_poll_time = now
+
+        stat = self.__get_stat()
+        with self.lock:
+            if stat is not None and stat != self.stat:
+                self.stat = stat
+                with open(self.log_path, "rb") as file, file_lock.locked(file, exclusive=False):
+                    self.__read_new(file)
+
+            pending = b"".join(self.pending)
+            self.pending.clear()
+
+        return pending
+
+    def __read_new(self, file) -> None:
+        end = file.seek(0, os.SEEK_END)
+
+        if self.offset is None or end < self.offset:
+            # First use, or the log was truncated or replaced - only follow appends from here on
+            self.offset = end
+            return
+
+        file.seek(self.offset)
+        data = file.read(end - self.offset)
+
+        # A line can only be partly written by a writer not taking the lock
+        data = data[:data.rfind(b"\n") + 1]
+        if data:
+            self.pending.append(data)
+            self.offset += len(data)
+
+            if self.unique_lines:
+                self.lines.update(data.splitlines())
+
+    def __get_stat(self) -> Union[Tuple[int, int], None]:
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
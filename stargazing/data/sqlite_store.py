@@ -0,0 +1,261 @@
+from __future__ import annotations
+from typing import Iterable, Iterator, List, Tuple
+import argparse
+import os.path as path
+import threading
+import time
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.data.shared_log as shared_log
+from stargazing.utils.lazy_import import LazyModule
+
+# Only imported once the SQLite backend is used
+sqlite3 = LazyModule("sqlite3")
+
+SQLITE_DATABASE_PATH = f"{path.dirname(path.abspath(__file__))}/../data/stargazing.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS pomodoros (
+    id INTEGER PRIMARY KEY,
+    project_name TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    day INTEGER NOT NULL,
+    length REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pomodoros_project_start ON pomodoros (project_name, start_time);
+CREATE INDEX IF NOT EXISTS pomodoros_day ON pomodoros (day);
+"""
+
+INSERT_PROJECT_SQL = "INSERT INTO projects (name) VALUES (?)"
+INSERT_MISSING_PROJECT_SQL = "INSERT OR IGNORE INTO projects (name) VALUES (?)"
+INSERT_POMODORO_SQL = "INSERT INTO pomodoros (project_name, start_time, day, length) VALUES (?, ?, ?, ?)"
+
+# Pomodoro reads stop at the last pomodoro id seen, later ones are handed out by poll
+SELECT_PROJECT_TOTALS_SQL = """
+SELECT projects.name, COALESCE(totals.total_time, 0), COALESCE(totals.todays_time, 0)
+FROM projects
+LEFT JOIN (
+    SELECT project_name, SUM(length) AS total_time, SUM(CASE WHEN day = ? THEN length ELSE 0 END) AS todays_time
+    FROM pomodoros
+    WHERE id <= ?
+    GROUP BY project_name
+) AS totals ON totals.project_name = projects.name
+ORDER BY projects.id
+"""
+SELECT_DAY_TOTAL_SQL = "SELECT COALESCE(SUM(length), 0) FROM pomodoros WHERE day = ? AND id <= ?"
+SELECT_DAY_TOTALS_SQL = "SELECT day, SUM(length) FROM pomodoros WHERE id <= ? GROUP BY day ORDER BY day"
+SELECT_POMODOROS_SQL = "SELECT project_name, start_time, length FROM pomodoros WHERE id <= ? ORDER BY id"
+
+SELECT_LAST_PROJECT_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM projects"
+SELECT_LAST_POMODORO_ID_SQL = "SELECT COALESCE(MAX(id), 0) FROM pomodoros"
+SELECT_NEW_PROJECTS_SQL = "SELECT id, name FROM projects WHERE id > ? ORDER BY id"
+SELECT_NEW_POMODOROS_SQL = "SELECT id, project_name, start_time, length FROM pomodoros WHERE id > ? ORDER BY id"
+
+# PRAGMA user_version once the text database has been copied in, so it is only ever copied once
+TEXT_MIGRATED_VERSION = 1
+
+
+class SqlitePomodoroStore():
+    """SQLite storage for projects and pomodoros.
+
+    Start times are stored as wall clock seconds (see binary_store.to_wall_clock_secs) alongside
+    an integer day key, so per-project and per-day totals are single aggregate queries.
+
+    The database may be shared by several stargazing processes. Pomodoros and projects other
+    processes insert are followed by id - pomodoro reads only cover ids up to the last one seen, and
+    later pomodoros are queued until poll hands them out, as with shared_log.SharedLogTail. Inserts
+    take the write lock before reading what is new, so a process never mistakes its own pomodoros
+    for another's.
+
+    @param database_path: Path of the SQLite database file.
+    @param poll_interval: Least number of seconds between checks for inserts made elsewhere."""
+
+    def __init__(self, database_path: str = SQLITE_DATABASE_PATH, poll_interval: float = shared_log.POLL_INTERVAL) -> None:
+        self.database_path = database_path
+        self.poll_interval = poll_interval
+
+        # Writes are made from the database writer thread (see database.get_write_queue)
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        self.lock = threading.Lock()
+        self.last_project_id = self.connection.execute(SELECT_LAST_PROJECT_ID_SQL).fetchone()[0]
+        self.last_pomodoro_id = self.connection.execute(SELECT_LAST_POMODORO_ID_SQL).fetchone()[0]
+
+        # Pomodoros other processes inserted, not yet handed out by poll
+        self.pending_pomodoros: List[Tuple[str, float, float]] = []
+        self.last_poll_time = 0
+
+    def close(self) -> None:
+        self.connection.close()
+
+    # ========================================================
+    # Projects
+    # ========================================================
+
+    def insert_project(self, project_name: str) -> bool:
+        """Inserts a project, returning False if a project with the same name already exists."""
+
+        try:
+            with self.connection:
+                self.connection.execute(INSERT_PROJECT_SQL, (project_name,))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def get_project_names(self) -> List[str]:
+        with self.lock:
+            rows = self.connection.execute(SELECT_NEW_PROJECTS_SQL, (0,)).fetchall()
+            if rows:
+                self.last_project_id = max(self.last_project_id, rows[-1][0])
+
+        return [name for _, name in rows]
+
+    def get_project_totals(self, day: int) -> List[Tuple[str, float, float]]:
+        """Returns (project name, total time, time on the given day) for every project."""
+
+        with self.lock:
+            self.__read_new_pomodoros()
+            return self.connection.execute(SELECT_PROJECT_TOTALS_SQL, (day, self.last_pomodoro_id)).fetchall()
+
+    def poll_project_names(self) -> List[str]:
+        """Returns the names of projects inserted since the last call, including this process's."""
+
+        with self.lock:
+            rows = self.connection.execute(SELECT_NEW_PROJECTS_SQL, (self.last_project_id,)).fetchall()
+            if rows:
+                self.last_project_id = rows[-1][0]
+
+        return [name for _, name in rows]
+
+    # ========================================================
+    # Pomodoros
+    # ========================================================
+
+    def insert_pomodoro(self, project_name: str, start: float, length: float) -> None:
+        self.insert_pomodoros([(project_name, start, length)])
+
+    def insert_pomodoros(self, records: Iterable[Tuple[str, float, float]]) -> None:
+        """Inserts (project name, wall clock start seconds, length) records in one transaction."""
+
+        rows = [(project_name, start, int(start // binary_store.SECONDS_PER_DAY), length)
+                for project_name, start, length in records]
+
+        with self.lock, self.connection:
+            # Holds the write lock from here, so every id after the ones read now is this insert's
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.__read_new_pomodoros()
+
+            self.connection.executemany(INSERT_POMODORO_SQL, rows)
+            self.last_pomodoro_id = self.connection.execute(SELECT_LAST_POMODORO_ID_SQL).fetchone()[0]
+
+    def is_text_migrated(self) -> bool:
+        return self.connection.execute("PRAGMA user_version").fetchone()[0] >= TEXT_MIGRATED_VERSION
+
+    def insert_text_migration(self, project_names: Iterable[str],
+                              records: Iterable[Tuple[str, float, float]]) -> Tuple[int, int]:
+        """Inserts the projects and records copied from the text database and marks the database as
+        migrated, all in one transaction. Nothing is inserted if another process migrated first.
+        Returns the number of projects and pomodoros inserted."""
+
+        rows = [(project_name, start, int(start // binary_store.SECONDS_PER_DAY), length)
+                for project_name, start, length in records]
+
+        with self.lock, self.connection:
+            # Holds the write lock from here, so no other process can migrate between the check and the inserts
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self.is_text_migrated():
+                return 0, 0
+
+            self.__read_new_pomodoros()
+            inserted_projects = self.connection.executemany(
+                INSERT_MISSING_PROJECT_SQL, [(name,) for name in project_names]).rowcount
+
+            self.connection.executemany(INSERT_POMODORO_SQL, rows)
+            self.last_pomodoro_id = self.connection.execute(SELECT_LAST_POMODORO_ID_SQL).fetchone()[0]
+
+            self.connection.execute(f"PRAGMA user_version = {TEXT_MIGRATED_VERSION}")
+
+        return inserted_projects, len(rows)
+
+    def get_day_total(self, day: int) -> float:
+        with self.lock:
+            self.__read_new_pomodoros()
+            return self.connection.execute(SELECT_DAY_TOTAL_SQL, (day, self.last_pomodoro_id)).fetchone()[0]
+
+    def get_day_totals(self) -> List[Tuple[int, float]]:
+        with self.lock:
+            self.__read_new_pomodoros()
+            return self.connection.execute(SELECT_DAY_TOTALS_SQL, (self.last_pomodoro_id,)).fetchall()
+
+    def iter_pomodoros(self) -> Iterator[Tuple[str, float, float]]:
+        """Yields (project name, wall clock start seconds, length) for every pomodoro. Pomodoros
+        other processes inserted are also queued for poll, if they were not already."""
+
+        with self.lock:
+            self.__read_new_pomodoros()
+            rows = self.connection.execute(SELECT_POMODOROS_SQL, (self.last_pomodoro_id,)).fetchall()
+
+        yield from rows
+
+    def poll(self, force=False) -> List[Tuple[str, float, float]]:
+        """Returns the (project name, wall clock start seconds, length) pomodoros other processes
+        have inserted since the last poll."""
+
+        now = time.monotonic()
+        if not force and now - self.last_poll_time < self.poll_interval:
+            return []
+        self.last_poll_time = now
+
+        with self.lock:
+            self.__read_new_pomodoros()
+            pending, self.pending_pomodoros = self.pending_pomodoros, []
+
+        return pending
+
+    def get_pending_count(self) -> int:
+        return len(self.pending_pomodoros)
+
+    def __read_new_pomodoros(self) -> None:
+        rows = self.connection.execute(SELECT_NEW_POMODOROS_SQL, (self.last_pomodoro_id,)).fetchall()
+        if rows:
+            self.last_pomodoro_id = rows[-1][0]
+            self.pending_pomodoros.extend(row[1:] for row in rows)
+
+
+def migrate_text_database(store: SqlitePomodoroStore) -> Tuple[int, int]:
+    """Copies the projects and pomodoros from the text database into the given store, unless it
+    has already been migrated. Returns the number of projects and pomodoros inserted."""
+
+    if store.is_text_migrated():
+        return 0, 0
+
+    with open(database.PROJECT_DATABASE_PATH, "r") as file:
+        project_names = [line.rstrip("\n") for line in file.readlines()]
+
+    columns = database.get_all_text_pomodoro_columns()
+    return store.insert_text_migration([name for name in project_names if name], zip(*columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Converts the projects.txt and pomodoros.txt databases into a SQLite database.")
+    parser.add_argument("--output", default=SQLITE_DATABASE_PATH,
+                        help="path of the SQLite database to create")
+    args = parser.parse_args()
+
+    if path.exists(args.output):
+        parser.error(f"{args.output} already exists")
+
+    sqlite_store = SqlitePomodoroStore(args.output)
+    projects_count, pomodoros_count = migrate_text_database(sqlite_store)
+    sqlite_store.close()
+
+    print(f"Migrated {projects_count} projects and {pomodoros_count} pomodoros to {args.output}")
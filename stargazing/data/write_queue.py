@@ -0,0 +1,90 @@
+from collections import deque
+from itertools import groupby
+from typing import Any, Callable, List
+import threading
+
+from stargazing.utils.logger import logger
+import stargazing.utils.metrics as metrics
+
+
+class WriteQueue():
+    """Runs database writes on a background thread, so slow disks do not block the caller.
+
+    Writes run in the order they were submitted. Each write is an item passed to a writer function
+    taking a list of items - consecutive items for the same writer that are waiting together are
+    coalesced into one call, e.g. several pomodoros appended with one file write. A failed write is
+    logged and the queue carries on.
+
+    @param name: Name of the writer thread."""
+
+    def __init__(self, name: str = "database-writer") -> None:
+        self.name = name
+
+        self.condition = threading.Condition()
+        # (writer, item, on_written) waiting to be written
+        self.pending = deque()
+        self.writing = 0
+        self.thread = None
+
+        self.batches = 0
+        self.items_written = 0
+
+    def submit(self, writer: Callable[[List[Any]], None], item: Any, on_written: Callable[[], None] = None) -> None:
+        """Queues an item for the writer. on_written is called from the writer thread once the item
+        has been written, and not called if writing it failed."""
+
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.__write_when_pending, name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+
+            self.pending.append((writer, item, on_written))
+            self.condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until every queued write has finished. Returns False if the timeout passed first."""
+
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and not self.writing, timeout)
+
+    def get_pending_count(self) -> int:
+        with self.condition:
+            return len(self.pending) + self.writing
+
+    def __write_when_pending(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending)
+                batch = list(self.pending)
+                self.pending.clear()
+                self.writing = len(batch)
+
+            for writer, writes in groupby(batch, key=lambda write: write[0]):
+                writes = list(writes)
+                self.__write(writer, writes)
+
+                with self.condition:
+                    self.writing -= len(writes)
+                    self.condition.notify_all()
+
+    def __write(self, writer: Callable[[List[Any]], None], writes: list) -> None:
+        items = [item for _, item, _ in writes]
+
+        try:
+            with metrics.timed_block("database.write"):
+                writer(items)
+        except Exception as e:
+            logger.error(f"Failed to write {items} with {writer.__name__}. Full message: {e}")
+            return
+
+        self.batches += 1
+        self.items_written += len(items)
+
+        for _, _, on_written in writes:
+            if on_written is None:
+                continue
+            try:
+                on_written()
+            except Exception as e:
+                logger.error(f"Failed to run {on_written} after writing. Full message: {e}")
@@ -1,14 +1,25 @@
 from blessed import Terminal
+from blessed.keyboard import Keystroke
 from functools import partial
-import sys
+from typing import List, Tuple
+import math
 import os.path as path
+import signal
+import time
 
 import stargazing.audio.audio_controller as audio_ac
+import stargazing.audio.audio_engine as audio_ae
 import stargazing.audio.player_menu as audio_pm
 import stargazing.audio.volume_menu as audio_vm
 
 import stargazing.config.config as config
 
+import stargazing.daemon.client as daemon_cl
+import stargazing.daemon.remote as daemon_rm
+
+import stargazing.data.database as database
+import stargazing.data.pomodoro_journal as pomodoro_journal
+
 import stargazing.pomodoro.autostart_menu as pomo_am
 import stargazing.pomodoro.interval_menu as pomo_im
 import stargazing.pomodoro.pomodoro_controller as pomo_pc
@@ -16,33 +27,64 @@ import stargazing.pomodoro.status_menu as pomo_sm
 
 import stargazing.project.project_controller as proj_pc
 import stargazing.project.project_menu as proj_pm
+import stargazing.project.report_menu as proj_rm
 
 from stargazing.utils.logger import logger
 from stargazing.utils.menu import Menu
+import stargazing.utils.metrics as metrics
 import stargazing.utils.print_funcs as print_funcs
+from stargazing.utils.scheduler import EventScheduler
 from stargazing.utils.stars import StarsGenerator
 
 
 GAZING_PATH = f"{path.dirname(path.abspath(__file__))}/res/gazing.txt"
 
+SESSION_CHECKPOINT_INTERVAL = 30
+
 
 class Stargazing(Menu):
+    """Main menu and loop of stargazing.
+
+    @param term: Blessed terminal to draw to, defaults to a terminal on stdout.
+    @param audio_controller: Audio controller to use, defaults to one loading the saved players.
+    @param daemon_client: Client of a running daemon to attach to, which then runs the timer and
+    audio - they keep running once the TUI is closed. Defaults to running them in this process."""
 
-    def __init__(self) -> None:
+    def __init__(self, term: Terminal = None, audio_controller: audio_ac.AudioController = None,
+                 daemon_client: daemon_cl.DaemonClient = None) -> None:
 
-        self.term = Terminal()
+        self.start_time = time.perf_counter()
+        self.first_frame_time = None
+
+        self.term = term if term is not None else Terminal()
 
         super().__init__(on_close=self.handle_close, hover_dec=self.term.gray20_on_lavender)
 
-        last_project_name, last_interval_settings, last_autostart, last_volume = config.get_last_session_data()
+        self.scheduler = EventScheduler(self.term)
+
+        self.daemon_session = None
+        if daemon_client is not None:
+            self.daemon_session = daemon_rm.RemoteSession(daemon_client, self.scheduler.wake)
 
-        self.audio_controller = audio_ac.AudioController(last_volume)
-        self.project_controller = proj_pc.ProjectController(last_project_name)
-        self.pomodoro_controller = pomo_pc.PomodoroController(
-            self.project_controller, self.audio_controller, last_interval_settings, last_autostart)
+            self.audio_controller = self.daemon_session.audio_controller
+            self.project_controller = self.daemon_session.project_controller
+            self.pomodoro_controller = self.daemon_session.pomodoro_controller
+        else:
+            last_project_name, last_interval_settings, last_autostart, last_volume = config.get_last_session_data()
+
+            # Before the controllers read the totals, so they include any recovered pomodoros
+            pomodoro_journal.recover_journals()
+
+            self.audio_controller = audio_controller if audio_controller is not None else audio_ac.AudioController(
+                last_volume, self.scheduler.wake)
+            self.project_controller = proj_pc.ProjectController(last_project_name)
+            self.pomodoro_controller = pomo_pc.PomodoroController(
+                self.project_controller, self.audio_controller, last_interval_settings, last_autostart)
 
         self.project_menu = proj_pm.ProjectMenu(
             self.term, self.close_submenu, self.project_controller)
+        self.report_menu = proj_rm.ReportMenu(
+            self.term, self.close_submenu, self.project_controller)
 
         self.interval_menu = pomo_im.IntervalMenu(
             self.term, partial(self.close_submenu, True), self.pomodoro_controller)
@@ -61,66 +103,154 @@ class Stargazing(Menu):
         self.focused_menu = self
 
         self.running = False
-        self.refresh_speed = 0.2
+        self.show_metrics_overlay = False
+        # Session data is saved periodically, which only writes the settings if it changed
+        self.next_checkpoint_time = time.monotonic() + SESSION_CHECKPOINT_INTERVAL
 
-        self.stars_generator = StarsGenerator()
+        self.gazing_lines = self.load_gazing()
+        self.stars_generator = StarsGenerator(*self.get_stars_size(), ring_size=24, precompute_in_background=True)
+        self.resized = False
         self.setup_menu()
 
+        self.scheduler.add_deadline_source(self.pomodoro_controller.time_until_next_update)
+        self.scheduler.add_deadline_source(self.stars_generator.time_until_next_gen)
+        self.scheduler.add_deadline_source(self.project_controller.time_until_day_rollover)
+
+        metrics.add_gauge("audio.pending_jobs", audio_ae.get_pending_jobs)
+        metrics.add_gauge("database.pending_writes", database.get_pending_writes)
+
     def start(self) -> None:
         self.running = True
 
-        with self.term.fullscreen(), self.term.cbreak(), self.term.hidden_cursor():
-            print(self.term.home + self.term.clear)
+        if hasattr(signal, "SIGWINCH"):
+            signal.signal(signal.SIGWINCH, self.handle_resize_signal)
 
-            self.print_logo()
-            self.print_gazing()
-            self.print_stars()
+        metrics.start_periodic_dump()
+
+        with self.term.fullscreen(), self.term.cbreak(), self.term.hidden_cursor():
+            self.setup_screen()
 
             while self.running:
+                self.render_frame()
+
+                inp = self.scheduler.wait()
+                self.step(inp)
+
+        if hasattr(signal, "SIGWINCH"):
+            signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+
+        self.scheduler.close()
+        if self.daemon_session is not None:
+            self.daemon_session.close()
+        self.__save_last_session_data()
+        config.flush()
+        logger.debug(f"Time to first frame - {self.first_frame_time - self.start_time:.3f}s")
+        logger.debug(f"Main menu render stats - {self.render_stats}")
+        if metrics.is_enabled():
+            metrics.dump()
+        print("Exiting stargazing...")
+
+    def setup_screen(self) -> None:
+        print_funcs.clear(self.term)
+
+        self.print_logo()
+        self.print_gazing()
+        self.print_stars()
+
+    def render_frame(self) -> None:
+        """Draws and flushes a frame, handling any pending resize first."""
+
+        with metrics.timed_block("loop.frame"):
+            if self.resized:
+                self.handle_resize()
+
+            with metrics.timed_block("loop.print_stars"):
                 self.print_stars()
+            with metrics.timed_block("loop.print_menu"):
                 self.print_menu()
+            with metrics.timed_block("loop.print_submenu"):
                 self.print_submenu()
 
-                sys.stdout.flush()
+            if self.show_metrics_overlay:
+                self.print_metrics_overlay()
 
-                inp = self.term.inkey(self.refresh_speed)
+            with metrics.timed_block("loop.flush"):
+                print_funcs.flush(self.term)
 
-                if inp.is_sequence and inp.name == "KEY_UP":
-                    self.focused_menu.handle_key_up()
-                elif inp.is_sequence and inp.name == "KEY_DOWN":
-                    self.focused_menu.handle_key_down()
-                elif inp.is_sequence and inp.name == "KEY_ENTER":
-                    self.focused_menu.handle_key_enter()
-                elif inp.is_sequence and inp.name == "KEY_ESCAPE":
-                    self.focused_menu.handle_key_escape()
-                elif inp.is_sequence and inp.name == "KEY_BACKSPACE":
-                    self.focused_menu.handle_key_backspace()
-                elif inp and not inp.is_sequence:
-                    self.focused_menu.handle_char_input(inp)
+        if self.first_frame_time is None:
+            self.handle_first_frame()
 
-                self.pomodoro_controller.update_timer()
+    def step(self, inp: Keystroke) -> None:
+        """Handles a keystroke (which may be empty) and updates the timer."""
 
-        self.__save_last_session_data()
-        print("Exiting stargazing...")
+        if inp.is_sequence and inp.name == "KEY_UP":
+            self.focused_menu.handle_key_up()
+        elif inp.is_sequence and inp.name == "KEY_DOWN":
+            self.focused_menu.handle_key_down()
+        elif inp.is_sequence and inp.name == "KEY_ENTER":
+            self.focused_menu.handle_key_enter()
+        elif inp.is_sequence and inp.name == "KEY_ESCAPE":
+            self.focused_menu.handle_key_escape()
+        elif inp.is_sequence and inp.name == "KEY_BACKSPACE":
+            self.focused_menu.handle_key_backspace()
+        elif inp and not inp.is_sequence:
+            self.focused_menu.handle_char_input(inp)
+
+        with metrics.timed_block("loop.update_timer"):
+            self.pomodoro_controller.update_timer()
+
+        if time.monotonic() >= self.next_checkpoint_time:
+            self.__save_last_session_data()
 
     def handle_close(self) -> None:
-        self.pomodoro_controller.finish_timer(disable_sound=True)
+        # An attached TUI leaves the timer running in the daemon
+        if self.daemon_session is None:
+            self.pomodoro_controller.finish_timer(disable_sound=True)
+            database.flush_writes()
         self.running = False
 
+    def handle_first_frame(self) -> None:
+        """Loads the audio stack in the background once the first frame is on screen."""
+
+        self.first_frame_time = time.perf_counter()
+
+        self.audio_controller.start_loading()
+        self.pomodoro_controller.preload_alarms()
+
     def handle_char_input(self, char) -> None:
         if char.lower() == "r":
-            print(self.term.home + self.term.clear)
-
-            self.print_logo()
-            self.print_gazing()
-            self.print_stars()
+            self.setup_screen()
+        elif char.lower() == "m" and metrics.is_enabled():
+            self.show_metrics_overlay = not self.show_metrics_overlay
         else:
             super().handle_char_input(char)
 
+    def handle_resize_signal(self, *args) -> None:
+        self.resized = True
+        self.scheduler.wake()
+
+    def handle_resize(self) -> None:
+        """Resizes the star field to the new terminal size and moves the bottom decoration, without
+        clearing the screen - the renderer only redraws cells that changed."""
+
+        self.resized = False
+        self.stars_generator.resize(*self.get_stars_size())
+
+        self.print_logo()
+        self.print_gazing()
+
+    def get_stars_size(self) -> Tuple[int, int]:
+        """Stars fill the terminal below the logo and above the gazing decoration."""
+        return max(self.term.width - 2, 0), max(self.term.height - 1 - len(self.gazing_lines), 0)
+
     def open_submenu(self, submenu: Menu) -> None:
         self.submenu = submenu
         self.focused_menu = self.submenu
 
+    def open_report_menu(self) -> None:
+        self.report_menu.refresh()
+        self.open_submenu(self.report_menu)
+
     def close_submenu(self, update_timer=False) -> None:
         self.print_stars()
 
@@ -138,40 +268,61 @@ class Stargazing(Menu):
 
         super().add_item(
             lambda: f"{self.term.bold('project')}: {self.term.lightcoral(self.project_controller.current.name)}",
-            partial(self.open_submenu, self.project_menu))
+            partial(self.open_submenu, self.project_menu),
+            depends_on=lambda: self.project_controller.current.name)
         super().add_item(
-            lambda: f"{self.term.bold('todays time')}: {self.term.lightskyblue3(self.project_controller.current.formatted_todays_time + ' | ' + self.project_controller.formatted_todays_total_time)}")
+            lambda: f"{self.term.bold('todays time')}: {self.term.lightskyblue3(self.project_controller.current.formatted_todays_time + ' | ' + self.project_controller.formatted_todays_total_time)}",
+            depends_on=lambda: (self.project_controller.current.name,
+                                math.floor(self.project_controller.current.todays_time) // 60,
+                                math.floor(self.project_controller.todays_total_time) // 60))
         super().add_item(
-            lambda: f"{self.term.bold('total time')}: {self.term.lightskyblue3(self.project_controller.current.formatted_total_time)}")
+            lambda: f"{self.term.bold('total time')}: {self.term.lightskyblue3(self.project_controller.current.formatted_total_time)}",
+            depends_on=lambda: (self.project_controller.current.name,
+                                math.floor(self.project_controller.current.total_time) // 60))
+        super().add_item(self.term.bold("reports"), self.open_report_menu)
 
         super().add_divider()
 
         super().add_item(
             lambda: f"{self.term.bold('pomodoro')}: {self.pomodoro_controller.interval_settings.name}",
-            partial(self.open_submenu, self.interval_menu))
+            partial(self.open_submenu, self.interval_menu),
+            depends_on=lambda: (self.pomodoro_controller.interval_settings.work_secs,
+                                self.pomodoro_controller.interval_settings.break_secs))
         super().add_item(
             lambda: f"{self.term.bold('auto-start')}: {self.pomodoro_controller.autostart_setting}",
-            partial(self.open_submenu, self.autostart_menu))
+            partial(self.open_submenu, self.autostart_menu),
+            depends_on=lambda: self.pomodoro_controller.autostart_setting)
         super().add_item(
             lambda: f"{self.term.bold('status')}: {self.pomodoro_controller.status.value}",
-            partial(self.open_submenu, self.status_menu))
+            partial(self.open_submenu, self.status_menu),
+            depends_on=lambda: self.pomodoro_controller.status)
 
         super().add_divider()
 
         super().add_item(
             lambda: f"{self.term.bold('playing')}: {self.audio_controller.playing_name}",
-            partial(self.open_submenu, self.player_menu))
+            partial(self.open_submenu, self.player_menu),
+            depends_on=lambda: self.audio_controller.playing_name)
         super().add_item(
             lambda: f"{self.term.bold('volume')}: {self.audio_controller.volume}",
-            partial(self.open_submenu, self.volume_menu))
+            partial(self.open_submenu, self.volume_menu),
+            depends_on=lambda: self.audio_controller.volume)
 
         super().add_divider()
 
         super().add_item(
             lambda: f"{self.pomodoro_controller.timer_display}",
-            self.toggle_pomodoro_display)
+            self.toggle_pomodoro_display,
+            depends_on=lambda: (self.pomodoro_controller.status, self.pomodoro_controller.timer.interval,
+                                math.floor(self.pomodoro_controller.timer.elapsed_time)))
 
     def __save_last_session_data(self) -> None:
+        self.next_checkpoint_time = time.monotonic() + SESSION_CHECKPOINT_INTERVAL
+
+        # The daemon saves the session data of an attached TUI
+        if self.daemon_session is not None:
+            return
+
         config.update_last_session_data(self.project_controller.current.name, self.pomodoro_controller.interval_settings,
                                         self.pomodoro_controller.autostart_setting, self.audio_controller.volume)
 
@@ -210,26 +361,38 @@ class Stargazing(Menu):
             max_width = 30
         elif self.submenu is self.volume_menu:
             max_width = 3
+        elif self.submenu is self.report_menu:
+            max_width = 32
 
         print_funcs.print_lines_xy(self.term, x, y, lines,
                                    flush=False, max_width=max_width, trim=True)
 
+    def print_metrics_overlay(self) -> None:
+        """Draws the metrics overlay over the top right of the stars, which redraw over it when hidden."""
+
+        lines = [self.term.black_on_lightyellow(f" {line} ") for line in metrics.format_overlay()]
+        x = max(self.term.width - max(self.term.length(line) for line in lines) - 1, 0)
+
+        print_funcs.print_lines_xy(self.term, x, 1, lines, flush=False)
+
     def print_logo(self) -> None:
         print_funcs.print_xy(self.term, 0, 0,
-                             self.term.gray20_on_white(self.term.bold(' ' + self.term.link('https://github.com/mtu2/stargazing', 'stargazing') + ' ')))
+                             self.term.gray20_on_white(self.term.bold(' ' + self.term.link('https://github.com/mtu2/stargazing', 'stargazing') + ' ')),
+                             flush=False)
 
-    def print_gazing(self) -> None:
+    def load_gazing(self) -> List[str]:
         with open(GAZING_PATH, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            dec_lines = [self.term.aliceblue(line) for line in lines]
+            return [line.rstrip("\n") for line in f.readlines()]
+
+    def print_gazing(self) -> None:
+        dec_lines = [self.term.aliceblue(line) for line in self.gazing_lines]
 
-            x, y = 1, self.term.height - len(lines)
+        x, y = 1, self.term.height - len(self.gazing_lines)
 
-            print_funcs.print_lines_xy(self.term, x, y, dec_lines)
+        print_funcs.print_lines_xy(self.term, x, y, dec_lines, flush=False)
 
     def print_stars(self) -> None:
-        stars = self.stars_generator.get_stars()
-        dec_lines = [self.term.aliceblue(line) for line in stars]
+        dec_lines = self.stars_generator.get_decorated_stars(self.term.aliceblue)
 
         x, y = 2, 1
 
@@ -237,9 +400,10 @@ class Stargazing(Menu):
 
 
 def run_stargazing():
-    """Main entry point for script"""
-    stargazing = Stargazing()
-    stargazing.start()
+    """Main entry point for script, kept for python -m stargazing.main"""
+
+    import stargazing.cli as cli
+    cli.run_stargazing()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,13 @@
 from __future__ import annotations
 from enum import Enum
-from typing import List
+from functools import partial
+from typing import List, Union
 import os.path as path
 
 import stargazing.data.database as database
+import stargazing.data.pomodoro_journal as pomodoro_journal
+import stargazing.audio.alarm_player as audio_alp
 import stargazing.audio.audio_controller as audio_ac
-import stargazing.audio.audio_player as audio_ap
 import stargazing.pomodoro.timer as pomo_t
 import stargazing.project.project_controller as proj_pc
 from stargazing.utils.format_funcs import format_pomodoro_time
@@ -56,6 +58,7 @@ class PomodoroController():
 
         self.project_controller = project_controller
         self.audio_controller = audio_controller
+        self.alarm_player = audio_alp.AlarmPlayer(audio_controller, [ALARM_START_PATH, ALARM_FINISH_PATH])
 
         self.interval_settings = interval_time if interval_time else PomodoroIntervalSettings(
             2400, 600)
@@ -64,10 +67,14 @@ class PomodoroController():
         self.timer = pomo_t.Timer(self.interval_settings.work_secs)
         self.status = PomodoroStatus.INACTIVE
 
+        # Checkpoints work in progress, recovered by pomodoro_journal.recover_journals if not finished
+        self.journal = pomodoro_journal.PomodoroJournal()
+
     def finish_timer(self, disable_sound=False) -> None:
         if self.status in (PomodoroStatus.WORK, PomodoroStatus.PAUSED_WORK):
-            database.insert_pomodoro(
-                self.project_controller.current, self.timer)
+            # The journal is kept until the pomodoro is on disk
+            database.insert_pomodoro(self.project_controller.current, self.timer, on_written=partial(
+                self.journal.finish, pomodoro_journal.get_pomodoro_id(self.timer)))
             self.timer = pomo_t.Timer(self.interval_settings.break_secs)
 
             if not disable_sound:
@@ -92,8 +99,9 @@ class PomodoroController():
 
     def reset_timer(self) -> None:
         if self.status in (PomodoroStatus.WORK, PomodoroStatus.PAUSED_WORK, PomodoroStatus.FINISHED_WORK):
-            database.insert_pomodoro(
-                self.project_controller.current, self.timer)
+            # The journal is kept until the pomodoro is on disk
+            database.insert_pomodoro(self.project_controller.current, self.timer, on_written=partial(
+                self.journal.finish, pomodoro_journal.get_pomodoro_id(self.timer)))
             self.timer = pomo_t.Timer(self.interval_settings.work_secs)
 
             self.timer.start()
@@ -106,11 +114,14 @@ class PomodoroController():
 
     def update_timer(self) -> None:
 
+        self.project_controller.check_day_rollover()
+        self.project_controller.check_external_changes()
         time_diff, timer_complete = self.timer.update()
 
         if self.status == PomodoroStatus.WORK:
             self.project_controller.add_todays_total_time(time_diff)
             self.project_controller.current.add_time(time_diff, True)
+            self.journal.checkpoint(self.project_controller.current.name, self.timer)
 
         if timer_complete:
             self.finish_timer()
@@ -137,10 +148,22 @@ class PomodoroController():
         elif self.status == PomodoroStatus.WORK:
             self.timer.pause()
             self.status = PomodoroStatus.PAUSED_WORK
+
+            self.timer.update()
+            self.journal.checkpoint(self.project_controller.current.name, self.timer, force=True)
         elif self.status == PomodoroStatus.BREAK:
             self.timer.pause()
             self.status = PomodoroStatus.PAUSED_BREAK
 
+    def time_until_next_update(self) -> Union[float, None]:
+        """Seconds until the timer display next changes, None if the timer is not running."""
+        if self.status not in (PomodoroStatus.WORK, PomodoroStatus.BREAK):
+            return None
+        return self.timer.time_until_next_second()
+
+    def preload_alarms(self) -> None:
+        self.alarm_player.preload()
+
     def set_interval_settings(self, interval_settings: PomodoroIntervalSettings) -> None:
         self.interval_settings = interval_settings
 
@@ -151,29 +174,23 @@ class PomodoroController():
             self.timer.interval = interval_settings.break_secs
 
     def __play_alarm_sound(self, path) -> None:
-        curr_vol = self.audio_controller.get_volume()
-        audio_decr = 15
-
-        self.audio_controller.set_volume(max(curr_vol - audio_decr, 0))
-
-        alarm = audio_ap.AudioPlayer(path)
-        alarm.set_volume(curr_vol)
-        alarm.play()
-
-        # TODO: this needs to be async - wait for the alarm length
-        self.audio_controller.set_volume(curr_vol)
+        self.alarm_player.play(path)
 
     @property
     def timer_display(self) -> str:
-        if self.status in (PomodoroStatus.INACTIVE, PomodoroStatus.FINISHED_BREAK):
-            return "START TIMER"
-        elif self.status == PomodoroStatus.WORK:
-            return f"BREAK IN {self.timer.remaining_time}"
-        elif self.status == PomodoroStatus.BREAK:
-            return f"POMODORO IN {self.timer.remaining_time}"
-        elif self.status == PomodoroStatus.PAUSED_WORK:
-            return f"PAUSED [WORK {self.timer.remaining_time}]"
-        elif self.status == PomodoroStatus.PAUSED_BREAK:
-            return f"PAUSED [BREAK {self.timer.remaining_time}]"
-        elif self.status == PomodoroStatus.FINISHED_WORK:
-            return "START BREAK"
+        return format_timer_display(self.status, self.timer)
+
+
+def format_timer_display(status: PomodoroStatus, timer: pomo_t.Timer) -> str:
+    if status in (PomodoroStatus.INACTIVE, PomodoroStatus.FINISHED_BREAK):
+        return "START TIMER"
+    elif status == PomodoroStatus.WORK:
+        return f"BREAK IN {timer.remaining_time}"
+    elif status == PomodoroStatus.BREAK:
+        return f"POMODORO IN {timer.remaining_time}"
+    elif status == PomodoroStatus.PAUSED_WORK:
+        return f"PAUSED [WORK {timer.remaining_time}]"
+    elif status == PomodoroStatus.PAUSED_BREAK:
+        return f"PAUSED [BREAK {timer.remaining_time}]"
+    elif status == PomodoroStatus.FINISHED_WORK:
+        return "START BREAK"
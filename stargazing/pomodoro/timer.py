@@ -1,22 +1,31 @@
 from datetime import datetime
 import math
 import time
-from typing import Tuple
+from typing import Tuple, Union
 
 from stargazing.utils.format_funcs import format_pomodoro_time
 
 
+def get_utc_offset(epoch: float) -> int:
+    """Returns the local UTC offset in seconds at the given epoch seconds."""
+    return int(datetime.fromtimestamp(epoch).astimezone().utcoffset().total_seconds())
+
+
 class Timer():
 
     def __init__(self, secs: int) -> None:
         self.interval = secs
-        self.local_start_time = datetime.now()
+        # When the timer was started, as UTC epoch seconds and the local UTC offset at the time
+        self.start_epoch = time.time()
+        self.utc_offset = get_utc_offset(self.start_epoch)
         self.start_time = None
         self.paused_time = None
         self.elapsed_time = 0
 
     def start(self) -> None:
         self.start_time = time.time()
+        self.start_epoch = self.start_time
+        self.utc_offset = get_utc_offset(self.start_epoch)
         self.elapsed_time = 0
         self.paused_time = None
 
@@ -45,6 +54,18 @@ class Timer():
             return time_diff, True
         return time_diff, False
 
+    def time_until_next_second(self) -> Union[float, None]:
+        """Seconds until the elapsed time next ticks over a whole second, None if not running."""
+        if not self.start_time or self.paused_time:
+            return None
+
+        elapsed_time = time.time() - self.start_time
+        return 1 - elapsed_time % 1
+
+    @property
+    def local_start_time(self) -> datetime:
+        return datetime.fromtimestamp(self.start_epoch)
+
     @property
     def remaining_time(self) -> str:
         elapsed_time_secs = math.floor(self.elapsed_time)
@@ -1,7 +1,10 @@
 from __future__ import annotations
+from datetime import datetime, time as dt_time, timedelta
 import math
+import time
 from typing import List, Union
 
+import stargazing.data.binary_store as binary_store
 import stargazing.data.database as database
 from stargazing.utils.format_funcs import format_project_time
 
@@ -53,6 +56,7 @@ class ProjectController():
                     self.current = project
                     break
         self.todays_total_time = self.__load_todays_total_time()
+        self.today_end_time = self.__get_today_end_time()
 
     def set_current_project(self, project: Project) -> None:
         self.current = project
@@ -75,15 +79,58 @@ class ProjectController():
     def add_todays_total_time(self, secs: float) -> None:
         self.todays_total_time += secs
 
+    def check_day_rollover(self) -> None:
+        """Resets the todays times of all projects once midnight has passed."""
+
+        if time.time() < self.today_end_time:
+            return
+
+        for project in self.projects:
+            project.todays_time = 0
+        self.todays_total_time = 0
+        self.today_end_time = self.__get_today_end_time()
+
+    def check_external_changes(self) -> None:
+        """Folds in projects and pomodoros added by other stargazing instances sharing the database."""
+
+        project_names, records = database.poll_external_changes()
+
+        for project_name in project_names:
+            self.__get_or_add_project(project_name)
+
+        today = binary_store.day_key(datetime.now())
+        for project_name, start_time, length in records:
+            is_today = int(start_time // binary_store.SECONDS_PER_DAY) == today
+
+            self.__get_or_add_project(project_name).add_time(length, is_today)
+            if is_today:
+                self.todays_total_time += length
+
+    def time_until_day_rollover(self) -> float:
+        return self.today_end_time - time.time()
+
     def __load_projects(self) -> List[Project]:
         projects = database.get_all_projects()
         if not projects:
             return [Project("Add a project")]
         return projects
 
+    def __get_or_add_project(self, project_name: str) -> Project:
+        for project in self.projects:
+            if project.name == project_name:
+                return project
+
+        project = Project(project_name)
+        self.projects.append(project)
+        return project
+
     def __load_todays_total_time(self) -> int:
         return database.get_todays_total_time()
 
+    def __get_today_end_time(self) -> float:
+        tomorrow = datetime.now().date() + timedelta(days=1)
+        return datetime.combine(tomorrow, dt_time.min).timestamp()
+
     @property
     def formatted_todays_total_time(self) -> str:
         return format_project_time(math.floor(self.todays_total_time))
@@ -71,6 +71,21 @@ class ProjectMenu(Menu):
         super().add_item(self.term.underline("create new project"),
                          self.start_create_new_project_mode)
 
+    def add_external_projects(self) -> None:
+        """Adds items for projects another stargazing instance has created since the menu was set up."""
+
+        project_item_count = len(self.items) - 1
+        for project in self.project_controller.projects[project_item_count:]:
+            on_item_select = partial(
+                self.set_current_project_and_close, project)
+            super().add_item(project.name, on_item_select, -1)
+
+    def get_print_strings(self) -> str:
+        if not self.create_new_project_mode:
+            self.add_external_projects()
+
+        return super().get_print_strings()
+
     def handle_key_up(self) -> None:
         if self.create_new_project_mode:
             return
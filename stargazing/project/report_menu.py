@@ -0,0 +1,76 @@
+from blessed import Terminal
+from datetime import datetime
+from typing import Callable
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.data.report_index as report_index
+import stargazing.project.project_controller as project_pc
+from stargazing.utils.format_funcs import format_project_time
+from stargazing.utils.menu import Menu
+
+# Days shown in the daily bars, and projects listed
+REPORT_DAYS = 14
+REPORT_PROJECTS = 5
+
+
+class ReportMenu(Menu):
+    """Menu page showing time spent over recent days, streaks and the busiest hours of the day,
+    for all projects or the current project. The page is rebuilt from the reporting index each time
+    it is opened, once pomodoros recorded by other processes - such as the daemon of an attached
+    TUI - have been folded into the index.
+
+    @param term: Instance of a Blessed terminal.
+    @param on_close: Callback function to run when menu is closed.
+    @param project_controller: Instance of a project controller."""
+
+    def __init__(self, term: Terminal, on_close: Callable[[], None], project_controller: project_pc.ProjectController) -> None:
+        super().__init__(on_close, term.gray20_on_lavender)
+
+        self.term = term
+        self.project_controller = project_controller
+
+        self.current_project_only = False
+
+    def refresh(self) -> None:
+        self.project_controller.check_external_changes()
+
+        self.items = []
+        self.dividers = []
+        self.setup_menu()
+
+    def toggle_current_project_only(self) -> None:
+        self.current_project_only = not self.current_project_only
+        self.refresh()
+
+    def setup_menu(self) -> None:
+        index = database.get_report_index()
+        today = binary_store.day_key(datetime.now())
+        project_name = self.project_controller.current.name if self.current_project_only else None
+
+        def time_item(name: str, secs: float) -> str:
+            return f"{self.term.bold(name)}: {self.term.lightskyblue3(format_project_time(int(secs)))}"
+
+        super().add_item(f"{self.term.bold('showing')}: {project_name if project_name else 'all projects'}",
+                         self.toggle_current_project_only)
+        super().add_divider()
+
+        super().add_item(time_item("today", index.day_total(today, project_name)))
+        super().add_item(time_item("this week", index.total_between(
+            report_index.get_week_start(today), today, project_name)))
+        super().add_item(time_item("last 30 days", index.total_between(today - 29, today, project_name)))
+
+        current_streak, longest_streak = index.streaks(today, project_name)
+        super().add_item(f"{self.term.bold('streak')}: {current_streak} days (best {longest_streak})")
+        super().add_divider()
+
+        daily = index.daily_series(today - REPORT_DAYS + 1, today, project_name)
+        super().add_item(f"{self.term.bold(f'{REPORT_DAYS} days')}: {report_index.format_bars(daily)}")
+        super().add_item(f"{self.term.bold('hours')}: {report_index.format_bars(index.hour_totals(project_name=project_name))}")
+
+        if project_name is None:
+            super().add_divider()
+
+            project_totals = index.project_totals_between(today - 29, today)
+            for name, total in sorted(project_totals.items(), key=lambda item: -item[1])[:REPORT_PROJECTS]:
+                super().add_item(f"{name}: {self.term.lightskyblue3(format_project_time(int(total)))}")
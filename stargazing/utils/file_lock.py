@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from typing import IO
+
+try:
+    import fcntl
+except ImportError:
+    # Advisory locks are not available on Windows, where files are used unlocked
+    fcntl = None
+
+
+def is_supported() -> bool:
+    return fcntl is not None
+
+
+@contextmanager
+def locked(file: IO, exclusive=True):
+    """Holds an advisory lock on the open file for the block - exclusive for writers, shared for
+    readers. Only cooperating processes taking the lock are kept out."""
+
+    if fcntl is None:
+        yield
+        return
+
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield
+    finally:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def lock(file: IO, blocking=True) -> bool:
+    """Takes an exclusive advisory lock on the open file, held until it is closed or unlocked.
+    Returns False if the lock is held elsewhere and blocking is not set."""
+
+    if fcntl is None:
+        return True
+
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
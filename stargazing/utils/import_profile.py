@@ -0,0 +1,53 @@
+from typing import List, NamedTuple
+import subprocess
+import sys
+
+# Module imported to profile the imports made before stargazing draws its first frame
+STARTUP_MODULE = "stargazing.main"
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(importtime_output: str) -> List[ImportTime]:
+    """Parses the report written to stderr by python -X importtime."""
+
+    import_times = []
+
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        depth = (len(module) - len(module.lstrip())) // 2
+        import_times.append(ImportTime(module.strip(), int(self_us), int(cumulative_us), depth))
+
+    return import_times
+
+
+def profile_imports(module: str = STARTUP_MODULE) -> List[ImportTime]:
+    """Imports a module in a fresh interpreter with -X importtime and returns its import times."""
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return parse_import_times(result.stderr)
+
+
+def format_import_profile(import_times: List[ImportTime], top: int = 20) -> str:
+    """Returns a report of the slowest imports by cumulative time, with the total import time."""
+
+    # Top level imports account for every other import
+    total_us = sum(import_time.self_us for import_time in import_times)
+    slowest = sorted(import_times, key=lambda import_time: import_time.cumulative_us, reverse=True)[:top]
+
+    lines = [f"{'cumulative':>12} {'self':>10}  module"]
+    for import_time in slowest:
+        lines.append(f"{import_time.cumulative_us / 1000:>10.1f}ms {import_time.self_us / 1000:>8.1f}ms  "
+                     f"{'  ' * import_time.depth}{import_time.module}")
+    lines.append(f"total import time: {total_us / 1000:.1f}ms over {len(import_times)} modules")
+
+    return "\n".join(lines)
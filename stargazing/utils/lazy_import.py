@@ -0,0 +1,39 @@
+import importlib
+import importlib.util
+from types import ModuleType
+
+
+class LazyModule():
+    """Stands in for a module that is slow to import, importing it on first attribute access.
+
+    @param name: Name of the module.
+    @param submodules: Names of submodules to import along with the module."""
+
+    def __init__(self, name: str, *submodules: str) -> None:
+        self.__name = name
+        self.__submodules = submodules
+        self.__module = None
+        self.__available = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.__module is not None
+
+    @property
+    def available(self) -> bool:
+        """Whether the module is installed, found without importing it."""
+
+        if self.__available is None:
+            self.__available = self.__module is not None or importlib.util.find_spec(self.__name) is not None
+        return self.__available
+
+    def load(self) -> ModuleType:
+        if self.__module is None:
+            module = importlib.import_module(self.__name)
+            for submodule in self.__submodules:
+                importlib.import_module(submodule)
+            self.__module = module
+        return self.__module
+
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
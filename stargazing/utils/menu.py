@@ -1,24 +1,77 @@
-from typing import Callable, Union
+from typing import Callable, Hashable, Union
 
 from stargazing.utils.helper_funcs import check_null_fn
 
+# Cache key for items whose text never changes
+STATIC_DEPENDENCY = object()
+
+
+class MenuRenderStats():
+    """Counts rendered frames and item render cache hits and misses for a menu."""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def __str__(self) -> str:
+        return f"frames: {self.frames}, hits: {self.hits}, misses: {self.misses}, hit rate: {self.hit_rate:.1%}"
+
 
 class MenuItem():
     """Item for the menu user interface.
 
     @param text: Display text for the item, either a string or a function that returns a string
-    @param handle_select: Callback function when the item is selected"""
+    @param handle_select: Callback function when the item is selected
+    @param depends_on: Function returning a hashable snapshot of the state the text depends on. The
+    text is only recomputed when the snapshot changes. Without it, function text is recomputed every render."""
 
-    def __init__(self, text: Union[str, Callable[[], str]], handle_select: Callable[[], None] = None):
+    def __init__(self, text: Union[str, Callable[[], str]], handle_select: Callable[[], None] = None,
+                 depends_on: Callable[[], Hashable] = None):
         self._text = text
         self.handle_select = check_null_fn(handle_select)
 
+        if isinstance(text, str):
+            self.depends_on = lambda: STATIC_DEPENDENCY
+        else:
+            self.depends_on = depends_on
+
+        self.cache_key = None
+        self.cache_value = None
+
     @property
     def text(self) -> str:
         if isinstance(self._text, str):
             return self._text
         return self._text()
 
+    def render(self, hovered: bool, hover_dec: Callable[[str], str], stats: MenuRenderStats = None) -> str:
+        """Returns the (hover decorated) text, reusing the last render if the item's dependencies
+        and hover state have not changed."""
+
+        if self.depends_on is None:
+            if stats:
+                stats.misses += 1
+            return hover_dec(self.text) if hovered else self.text
+
+        key = (self.depends_on(), hovered)
+        if key == self.cache_key:
+            if stats:
+                stats.hits += 1
+            return self.cache_value
+
+        if stats:
+            stats.misses += 1
+
+        self.cache_key = key
+        self.cache_value = hover_dec(self.text) if hovered else self.text
+        return self.cache_value
+
 
 class Menu():
     """Menu user interface - all user interaction occurs through a main menu and several submenus.
@@ -43,14 +96,18 @@ class Menu():
         # Function to decorate currently hovered item
         self.hover_dec = check_null_fn(hover_dec)
 
+        # Frame counter and item render cache statistics
+        self.render_stats = MenuRenderStats()
+
     # ========================================================
     # Create menu methods
     # ========================================================
 
     def add_item(self, text: Union[str, Callable[[], str]], handle_item_select: Callable[[], None] = None,
-                 index: int = None) -> int:
+                 index: int = None, depends_on: Callable[[], Hashable] = None) -> int:
         """Creates and adds a menu item at the given index. If no index is given, the item 
-        is added to the bottom of the menu. Returns the index of the added item."""
+        is added to the bottom of the menu. Returns the index of the added item.
+        See MenuItem for depends_on."""
 
         if index is None:
             index = len(self.items)
@@ -58,21 +115,30 @@ class Menu():
         if index < -len(self.items) or index > len(self.items):
             raise IndexError(f"Entered invalid index: {index}")
 
-        item = MenuItem(text, handle_item_select)
+        item = MenuItem(text, handle_item_select, depends_on)
         self.items.insert(index, item)
 
         return index
 
     def replace_item(self, index: int, text: Union[str, Callable[[], str]],
-                     handle_item_select: Callable[[], None] = None) -> None:
+                     handle_item_select: Callable[[], None] = None, depends_on: Callable[[], Hashable] = None) -> None:
         """Creates and replaces a menu item at the given index."""
 
         if index < -len(self.items) or index >= len(self.items):
             raise IndexError(f"Entered invalid index: {index}")
 
-        item = MenuItem(text, handle_item_select)
+        item = MenuItem(text, handle_item_select, depends_on)
         self.items[index] = item
 
+    def remove_item(self, index: int) -> None:
+        """Removes the menu item at the given index, keeping the hover index in range."""
+
+        if index < -len(self.items) or index >= len(self.items):
+            raise IndexError(f"Entered invalid index: {index}")
+
+        del self.items[index]
+        self.hover_index = max(min(self.hover_index, len(self.items) - 1), 0)
+
     def add_divider(self) -> int:
         """Creates and adds a divider (a blank menu item) to the bottom of the menu.
         Returns the index of the added divider."""
@@ -140,15 +206,13 @@ class Menu():
 
         print_strings = []
         dividers_p = 0
+        self.render_stats.frames += 1
 
         for i, item in enumerate(self.items):
             while dividers_p < len(self.dividers) and self.dividers[dividers_p] < i:
                 print_strings.append("")
                 dividers_p += 1
 
-            if self.hover_index == i:
-                print_strings.append(self.hover_dec(item.text))
-            else:
-                print_strings.append(item.text)
+            print_strings.append(item.render(self.hover_index == i, self.hover_dec, self.render_stats))
 
         return print_strings
@@ -0,0 +1,189 @@
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Dict, List
+import os
+import os.path as path
+import threading
+import time
+import ujson
+
+METRICS_ENV_VAR = "STARGAZING_METRICS"
+METRICS_LOG_PATH = f"{path.dirname(path.abspath(__file__))}/../logs/metrics.log"
+
+# Number of most recent samples each histogram keeps
+HISTOGRAM_WINDOW = 1024
+
+DUMP_INTERVAL = 60
+
+_enabled = os.environ.get(METRICS_ENV_VAR, "") not in ("", "0")
+_lock = threading.Lock()
+_histograms: Dict[str, "RollingHistogram"] = {}
+_counters: Dict[str, int] = {}
+_gauges: Dict[str, Callable[[], float]] = {}
+
+
+class RollingHistogram():
+    """Distribution of the most recent samples of a measurement.
+
+    @param window: Number of most recent samples to keep."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW) -> None:
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, percent: float) -> float:
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"count": self.count}
+
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean": sum(ordered) / len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p90": ordered[min(int(len(ordered) * 0.9), len(ordered) - 1)],
+            "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+            "max": ordered[-1]
+        }
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def record(name: str, value: float) -> None:
+    """Adds a sample to the named histogram, times are recorded in seconds."""
+
+    if not _enabled:
+        return
+
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = RollingHistogram()
+        histogram.add(value)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    if not _enabled:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def add_gauge(name: str, source: Callable[[], float]) -> None:
+    """Registers a function read for the current value of a gauge whenever metrics are reported."""
+    _gauges[name] = source
+
+
+def get_histogram(name: str) -> RollingHistogram:
+    with _lock:
+        return _histograms.get(name) or RollingHistogram()
+
+
+def get_counter(name: str) -> int:
+    return _counters.get(name, 0)
+
+
+def get_gauge(name: str) -> float:
+    source = _gauges.get(name)
+    return source() if source else 0
+
+
+@contextmanager
+def timed_block(name: str):
+    """Records the time spent in the block."""
+
+    if not _enabled:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start_time)
+
+
+def timed(name: str):
+    """Decorator recording the time spent in each call of the function."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def timed_fn(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+
+            start_time = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start_time)
+        return timed_fn
+    return decorator
+
+
+def snapshot() -> dict:
+    with _lock:
+        histograms = {name: histogram.summary() for name, histogram in _histograms.items()}
+        counters = dict(_counters)
+
+    return {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "histograms": histograms,
+        "counters": counters,
+        "gauges": {name: source() for name, source in list(_gauges.items())}
+    }
+
+
+def dump(log_path: str = METRICS_LOG_PATH) -> None:
+    """Appends a snapshot of the metrics to the metrics log as a JSON line."""
+
+    with open(log_path, "a", encoding="utf-8") as file:
+        file.write(ujson.dumps(snapshot()) + "\n")
+
+
+def start_periodic_dump(interval: float = DUMP_INTERVAL, log_path: str = METRICS_LOG_PATH) -> None:
+    """Dumps the metrics every interval seconds from a background thread, if metrics are enabled."""
+
+    if not _enabled:
+        return
+
+    def dump_periodically() -> None:
+        while True:
+            time.sleep(interval)
+            dump(log_path)
+
+    thread = threading.Thread(target=dump_periodically, name="metrics-dump")
+    thread.daemon = True
+    thread.start()
+
+
+def format_overlay() -> List[str]:
+    """Returns the lines of the on-screen metrics overlay."""
+
+    frame = get_histogram("loop.frame")
+    frame_bytes = get_histogram("render.frame_bytes")
+
+    return [
+        f"frame {frame.percentile(50) * 1000:5.1f}ms p50 {frame.percentile(99) * 1000:5.1f}ms p99",
+        f"write {frame_bytes.percentile(50):5.0f}B p50 {get_counter('render.bytes') / 1024:7.1f}KiB total",
+        f"jobs  {get_gauge('audio.pending_jobs'):3.0f} audio {get_gauge('database.pending_writes'):3.0f} writes pending"
+    ]
@@ -2,10 +2,15 @@ from typing import List
 from blessed import Terminal
 import math
 
+from stargazing.utils.renderer import get_renderer
+
 
 def print_xy(term: Terminal, x: int, y: int, value: str, flush=True, max_width: int = None,
              center=False, trim=False):
-    """trim and center both require max_width to be given"""
+    """Draws the value into the terminal's frame buffer, writing any changed cells if flush is set.
+    trim and center both require max_width to be given"""
+    renderer = get_renderer(term)
+
     if max_width is not None:
         empty_len = max(max_width - term.length(value), 0)
 
@@ -33,17 +38,29 @@ def print_xy(term: Terminal, x: int, y: int, value: str, flush=True, max_width:
 
         if center:
             empty = " " * (empty_len // 2)
-            print(term.move_xy(x - max_width // 2, y) +
-                  f" {empty}{value}{empty} ", end="", flush=flush)
+            renderer.write(x - max_width // 2, y, f" {empty}{value}{empty} ")
         else:
             empty = " " * empty_len
-            print(term.move_xy(x, y) +
-                  f" {value}{empty} ", end="", flush=flush)
+            renderer.write(x, y, f" {value}{empty} ")
     else:
-        print(term.move_xy(x, y) + value, end="", flush=flush)
+        renderer.write(x, y, value)
+
+    if flush:
+        renderer.flush()
 
 
 def print_lines_xy(term: Terminal, x: int, y: int, lines: List[str], flush=True, max_width: int = None,
                    center=False, trim=False):
     for i, line in enumerate(lines):
-        print_xy(term, x, y + i, line, flush, max_width, center, trim)
+        print_xy(term, x, y + i, line, False, max_width, center, trim)
+
+    if flush:
+        get_renderer(term).flush()
+
+
+def clear(term: Terminal) -> None:
+    get_renderer(term).clear()
+
+
+def flush(term: Terminal) -> None:
+    get_renderer(term).flush()
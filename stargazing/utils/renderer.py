@@ -0,0 +1,225 @@
+from __future__ import annotations
+from typing import List, Tuple
+import weakref
+
+from blessed import Terminal
+from wcwidth import wcwidth
+
+import stargazing.utils.metrics as metrics
+
+# A cell is a (style, char) pair where style is the concatenation of the sequences active for the char
+Cell = Tuple[str, str]
+
+BLANK_CELL = ("", " ")
+# Right half of a double width character
+CONTINUATION_CELL = ("", "")
+
+RESET_SEQUENCES = ("\x1b[m", "\x1b[0m")
+IGNORED_SEQUENCES = ("\x1b(B",)
+
+# Unchanged gaps up to this many cells are rewritten rather than skipped with a cursor move
+MAX_RUN_GAP = 4
+
+MAX_PARSE_CACHE_SIZE = 512
+
+_renderers = weakref.WeakKeyDictionary()
+
+
+def get_renderer(term: Terminal) -> Renderer:
+    """Returns the renderer shared by everything drawing to the given terminal."""
+
+    renderer = _renderers.get(term)
+    if renderer is None:
+        renderer = _renderers[term] = Renderer(term)
+    return renderer
+
+
+class Renderer():
+    """Damage tracking frame buffer renderer.
+
+    Drawing writes into a retained back buffer of cells. On flush the back buffer is diffed against
+    the front buffer (what was last emitted to the terminal), and only the changed runs of cells
+    are written in a single coalesced write.
+
+    @param term: Instance of a Blessed terminal.
+    @param stream: Stream to write to, defaults to the terminal's stream."""
+
+    def __init__(self, term: Terminal, stream=None) -> None:
+        self.term = term
+        self.stream = stream if stream is not None else term.stream
+
+        self.width = term.width
+        self.height = term.height
+
+        self.back = self.__new_grid(BLANK_CELL)
+        # None cells are unknown, so are always redrawn
+        self.front = self.__new_grid(None)
+
+        self.parse_cache = {}
+
+        self.frames = 0
+        self.bytes_written = 0
+        self.last_frame_bytes = 0
+
+    # ========================================================
+    # Drawing
+    # ========================================================
+
+    def write(self, x: int, y: int, text: str) -> None:
+        """Writes a string, which may contain terminal sequences, into the back buffer."""
+
+        if y < 0 or y >= self.height:
+            return
+
+        row = self.back[y]
+        for cell in self.__parse(text):
+            if 0 <= x < self.width:
+                # Overwriting half of a double width character blanks its other half
+                if row[x] is CONTINUATION_CELL and cell is not CONTINUATION_CELL and x > 0:
+                    row[x - 1] = BLANK_CELL
+                if x + 1 < self.width and row[x + 1] is CONTINUATION_CELL and cell is not CONTINUATION_CELL:
+                    row[x + 1] = BLANK_CELL
+                row[x] = cell
+            x += 1
+
+    def clear(self) -> None:
+        """Clears the terminal and both buffers."""
+
+        self.__resize_if_needed()
+        self.__emit(self.term.home + self.term.clear)
+
+        self.back = self.__new_grid(BLANK_CELL)
+        self.front = self.__new_grid(BLANK_CELL)
+
+    def invalidate(self) -> None:
+        """Forgets what is on screen, so the whole back buffer is redrawn on the next flush."""
+
+        self.front = self.__new_grid(None)
+
+    def flush(self) -> None:
+        """Writes the cells that changed since the last flush to the terminal."""
+
+        self.__resize_if_needed()
+
+        term = self.term
+        out = []
+
+        for y in range(self.height):
+            back_row, front_row = self.back[y], self.front[y]
+            if back_row == front_row:
+                continue
+
+            for start, end in self.__changed_runs(back_row, front_row):
+                out.append(term.move_xy(start, y))
+
+                style = ""
+                for cell in back_row[start:end]:
+                    if cell is CONTINUATION_CELL:
+                        continue
+                    if cell[0] != style:
+                        out.append(term.normal + cell[0] if style else cell[0])
+                        style = cell[0]
+                    out.append(cell[1])
+
+                if style:
+                    out.append(term.normal)
+
+            self.front[y] = back_row.copy()
+
+        self.frames += 1
+        self.last_frame_bytes = 0
+        if out:
+            self.__emit("".join(out))
+
+        metrics.record("render.frame_bytes", self.last_frame_bytes)
+
+    # ========================================================
+    # Helpers
+    # ========================================================
+
+    def __changed_runs(self, back_row: List[Cell], front_row: List[Cell]) -> List[Tuple[int, int]]:
+        runs = []
+        x = 0
+
+        while x < self.width:
+            if back_row[x] == front_row[x]:
+                x += 1
+                continue
+
+            start = x
+            # Never start a run on the right half of a double width character
+            if back_row[start] is CONTINUATION_CELL and start > 0:
+                start -= 1
+
+            end = x + 1
+            gap = 0
+            while end < self.width and gap <= MAX_RUN_GAP:
+                gap = gap + 1 if back_row[end] == front_row[end] else 0
+                end += 1
+            end -= gap
+
+            if runs and start - runs[-1][1] <= MAX_RUN_GAP:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((start, end))
+            x = end
+
+        return runs
+
+    def __parse(self, text: str) -> List[Cell]:
+        cells = self.parse_cache.get(text)
+        if cells is not None:
+            return cells
+
+        cells = []
+        style = ""
+
+        for ele in self.term.split_seqs(text):
+            if len(ele) > 1 or ele == "\x1b":
+                if ele in RESET_SEQUENCES or ele == self.term.normal:
+                    style = ""
+                elif ele not in IGNORED_SEQUENCES:
+                    style += ele
+                continue
+
+            char_width = wcwidth(ele)
+            if char_width <= 0:
+                if char_width == 0 and cells:
+                    prev_style, prev_char = cells[-1]
+                    cells[-1] = (prev_style, prev_char + ele)
+                continue
+
+            cells.append((style, ele))
+            if char_width == 2:
+                cells.append(CONTINUATION_CELL)
+
+        if len(self.parse_cache) >= MAX_PARSE_CACHE_SIZE:
+            self.parse_cache.clear()
+        self.parse_cache[text] = cells
+
+        return cells
+
+    def __emit(self, data: str) -> None:
+        self.stream.write(data)
+        self.stream.flush()
+
+        data_bytes = len(data.encode("utf-8"))
+        self.bytes_written += data_bytes
+        self.last_frame_bytes += data_bytes
+        metrics.increment("render.bytes", data_bytes)
+
+    def __resize_if_needed(self) -> None:
+        width, height = self.term.width, self.term.height
+        if width == self.width and height == self.height:
+            return
+
+        def resize_grid(grid: List[List[Cell]], fill: Cell) -> List[List[Cell]]:
+            rows = [row[:width] + [fill] * (width - len(row)) for row in grid[:height]]
+            return rows + [[fill] * width for _ in range(height - len(rows))]
+
+        self.back = resize_grid(self.back, BLANK_CELL)
+        self.front = resize_grid(self.front, None)
+        self.width, self.height = width, height
+
+    def __new_grid(self, fill: Cell) -> List[List[Cell]]:
+        return [[fill] * self.width for _ in range(self.height)]
@@ -0,0 +1,104 @@
+from typing import Callable, List, Union
+import os
+import selectors
+import sys
+
+from blessed import Terminal
+from blessed.keyboard import Keystroke
+
+# Added to deadlines so the loop wakes just after, rather than just before, a deadline passes
+DEADLINE_SLACK = 0.005
+
+
+class EventScheduler():
+    """Blocks the main loop until there is something to do - keyboard input, a wake up from another
+    thread, or the earliest deadline reported by the registered deadline sources.
+
+    Where the keyboard cannot be selected on (e.g. Windows or no tty), falls back to polling the
+    keyboard with the deadline as the timeout, capped at fallback_interval.
+
+    @param term: Instance of a Blessed terminal.
+    @param fallback_interval: Longest wait when wake ups from other threads cannot be selected on."""
+
+    def __init__(self, term: Terminal, fallback_interval: float = 0.2) -> None:
+        self.term = term
+        self.fallback_interval = fallback_interval
+
+        # Functions returning the seconds until they next need a redraw, or None if never
+        self.deadline_sources: List[Callable[[], Union[float, None]]] = []
+
+        self.selector = None
+        self.wake_read_fd = self.wake_write_fd = None
+
+        if os.name != "nt" and sys.stdin.isatty():
+            self.wake_read_fd, self.wake_write_fd = os.pipe()
+            os.set_blocking(self.wake_read_fd, False)
+            os.set_blocking(self.wake_write_fd, False)
+
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(sys.stdin.fileno(), selectors.EVENT_READ)
+            self.selector.register(self.wake_read_fd, selectors.EVENT_READ)
+
+        self.wake_count = 0
+
+    def add_deadline_source(self, source: Callable[[], Union[float, None]]) -> None:
+        self.deadline_sources.append(source)
+
+    def wake(self) -> None:
+        """Wakes up the main loop - safe to call from any thread."""
+
+        if self.wake_write_fd is None:
+            return
+
+        try:
+            os.write(self.wake_write_fd, b"\0")
+        except BlockingIOError:
+            # Pipe is full, so a wake up is already pending
+            pass
+
+    def wait(self) -> Keystroke:
+        """Waits until the next event and returns the keystroke pressed, which is empty if the wait
+        ended for any other reason."""
+
+        self.wake_count += 1
+
+        # Input already buffered by blessed will not make the keyboard selectable
+        inp = self.term.inkey(timeout=0)
+        if inp:
+            return inp
+
+        timeout = self.next_timeout()
+
+        if self.selector is None:
+            if timeout is None or timeout > self.fallback_interval:
+                timeout = self.fallback_interval
+            return self.term.inkey(timeout=timeout)
+
+        for key, _ in self.selector.select(timeout):
+            if key.fd == self.wake_read_fd:
+                self.__drain_wake_pipe()
+
+        return self.term.inkey(timeout=0)
+
+    def next_timeout(self) -> Union[float, None]:
+        timeouts = [timeout for timeout in (source() for source in self.deadline_sources) if timeout is not None]
+        if not timeouts:
+            return None
+        return max(min(timeouts), 0) + DEADLINE_SLACK
+
+    def close(self) -> None:
+        if self.selector is None:
+            return
+
+        self.selector.close()
+        os.close(self.wake_read_fd)
+        os.close(self.wake_write_fd)
+        self.selector = None
+        self.wake_read_fd = self.wake_write_fd = None
+
+    def __drain_wake_pipe(self) -> None:
+        try:
+            while os.read(self.wake_read_fd, 1024):
+                pass
+        except BlockingIOError:
+            pass
@@ -1,49 +1,293 @@
 import math
 import random
+import threading
 import time
-from typing import List
+from typing import Callable, Dict, List
 import os.path as path
 
+from stargazing.utils.lazy_import import LazyModule
+
+# Only imported once stars are first twinkled, as it is slow to import
+numpy = LazyModule("numpy")
+
 DEFAULT_STARS_PATH = f"{path.dirname(path.abspath(__file__))}/../res/stars.txt"
 
+# Bounds on the procedural star field, and on the cells held by the frame ring, to cap memory and per-frame work
+MAX_STARS_WIDTH = 1024
+MAX_STARS_HEIGHT = 512
+MAX_RING_CELLS = 4 * 1024 * 1024
+
+# Procedural stars are generated in blocks of columns, each from its own RNG seeded by (seed, row, block),
+# so any region of the field can be generated independently of the rest
+GEN_BLOCK_WIDTH = 64
+
 
 class StarsGenerator():
-    """Generates printable stars for the background of stargazing."""
+    """Generates printable stars for the background of stargazing.
+
+    The star field is stored as one bytearray per line holding indexes into a palette of the
+    distinct characters, so swapping stars is a byte swap and rendering a line is a single
+    translate. Frames can optionally be precomputed into a ring, in a background thread started
+    once the first frame has been shown, so that getting the stars for a frame is an index lookup.
+    The ring is played forwards then backwards, so each frame follows on from the one before.
+
+    If a width and height are given, the field is generated procedurally with the same character
+    distribution as the default stars, and can be resized - only newly exposed regions are generated.
+
+    @param width: Width of a procedural star field, the default stars are used if not given.
+    @param height: Height of a procedural star field.
+    @param seed: Seed for the procedural star field, random if not given.
+    @param ring_size: Number of frames to precompute and cycle through, 0 generates frames on demand.
+    @param precompute_in_background: Fill the frame ring in a background thread rather than on demand."""
 
-    def __init__(self) -> None:
-        self.stars = self.load_default_stars()
+    def __init__(self, width: int = None, height: int = None, seed: int = None, ring_size: int = 0,
+                 precompute_in_background: bool = False) -> None:
+        self.palette = []
+        self.palette_weights = []
+        self.grid = self.load_default_stars()
+
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.procedural = width is not None and height is not None
+        if self.procedural:
+            self.grid = self.resize_grid([], width, height)
+
+        self.stars = self.render_grid(self.grid)
         self.last_printed_time = time.time()
 
         self.gen_time_interval = 5
         self.gen_random_threshold = 0.1
         self.gen_max_dist = 5
 
+        self.random = random.Random()
+        self.numpy_random = None
+
+        # Ring of precomputed (grid, lines) frames
+        self.max_ring_size = ring_size
+        self.ring_size = self.__bounded_ring_size()
+        self.precompute_in_background = ring_size and precompute_in_background
+        self.ring = [(self.grid, self.stars)]
+        self.ring_index = 0
+        # 1 while playing the ring forwards, -1 while playing it backwards
+        self.ring_step = 1
+        self.ring_lock = threading.Lock()
+        # Incremented when the ring is rebuilt, so background frames for an old ring are discarded
+        self.ring_generation = 0
+
+        # Decorated lines for each frame, keyed by ring index (or -1 when generating on demand)
+        self.decorated_cache: Dict[int, List[str]] = {}
+
+        # The background fill is started from the second call to get_stars, so that it (and
+        # importing numpy) does not hold up the first frame
+        self.first_frame_shown = False
+        self.ring_fill_pending = self.precompute_in_background
+
     def get_stars(self) -> List[str]:
+        if self.ring_fill_pending and self.first_frame_shown:
+            self.ring_fill_pending = False
+            self.__start_fill_ring()
+        self.first_frame_shown = True
+
         curr_time = time.time()
 
         if curr_time - self.last_printed_time > self.gen_time_interval:
             self.last_printed_time = curr_time
-            self.stars = self.gen_new_stars()
+            self.next_frame()
 
         return self.stars
 
-    def load_default_stars(self) -> List[str]:
+    def get_decorated_stars(self, dec: Callable[[str], str]) -> List[str]:
+        """Returns the current stars with each line decorated, reusing the decoration for frames
+        that have been decorated before."""
+
+        stars = self.get_stars()
+        key = self.ring_index if self.ring_size else -1
+
+        decorated = self.decorated_cache.get(key)
+        if decorated is None:
+            decorated = self.decorated_cache[key] = [dec(line) for line in stars]
+
+        return decorated
+
+    def resize(self, width: int, height: int) -> None:
+        """Resizes a procedural star field, keeping the current stars in the overlapping region and
+        generating only the newly exposed region. Precomputed frames are discarded."""
+
+        if not self.procedural:
+            return
+
+        with self.ring_lock:
+            self.grid = self.resize_grid(self.grid, width, height)
+            self.stars = self.render_grid(self.grid)
+
+            self.ring_size = self.__bounded_ring_size()
+            self.ring = [(self.grid, self.stars)]
+            self.ring_index = 0
+            self.ring_step = 1
+            self.ring_generation += 1
+            self.decorated_cache.clear()
+
+        self.ring_fill_pending = self.precompute_in_background
+
+    def time_until_next_gen(self) -> float:
+        return self.last_printed_time + self.gen_time_interval - time.time()
+
+    def next_frame(self) -> None:
+        if not self.ring_size:
+            self.grid = self.gen_new_grid(self.grid)
+            self.stars = self.render_grid(self.grid)
+            self.decorated_cache.clear()
+            return
+
+        with self.ring_lock:
+            if len(self.ring) < self.ring_size and self.ring_index == len(self.ring) - 1:
+                # Keep showing the current frame until the background thread has generated the next
+                if self.precompute_in_background:
+                    return
+
+                grid = self.gen_new_grid(self.ring[-1][0])
+                self.ring.append((grid, self.render_grid(grid)))
+
+            # Turn around at either end of the ring rather than jumping back to its first frame
+            if self.ring_index == len(self.ring) - 1:
+                self.ring_step = -1
+            if self.ring_index == 0:
+                self.ring_step = 1
+
+            self.ring_index = min(self.ring_index + self.ring_step, len(self.ring) - 1)
+            self.grid, self.stars = self.ring[self.ring_index]
+
+    def load_default_stars(self) -> List[bytearray]:
         with open(DEFAULT_STARS_PATH, "r", encoding="utf-8") as f:
             lines = f.readlines()
             trimmed_lines = [line.rstrip("\n") for line in lines]
-            return trimmed_lines
+
+        palette_index = {}
+        grid = []
+        for line in trimmed_lines:
+            row = bytearray()
+            for char in line:
+                if char not in palette_index:
+                    palette_index[char] = len(self.palette)
+                    self.palette.append(char)
+                    if len(self.palette) > 256:
+                        raise ValueError("Stars can contain at most 256 distinct characters")
+                row.append(palette_index[char])
+            grid.append(row)
+
+        counts = [0] * len(self.palette)
+        for row in grid:
+            for i in row:
+                counts[i] += 1
+        self.palette_weights = counts
+
+        return grid
+
+    def resize_grid(self, grid: List[bytearray], width: int, height: int) -> List[bytearray]:
+        """Returns the grid cropped or extended to the given size, generating any new cells."""
+
+        width = max(min(width, MAX_STARS_WIDTH), 0)
+        height = max(min(height, MAX_STARS_HEIGHT), 0)
+
+        new_grid = []
+        for y in range(height):
+            row = grid[y] if y < len(grid) else bytearray()
+            if len(row) >= width:
+                new_grid.append(row[:width])
+            else:
+                new_grid.append(row + self.gen_cells(y, len(row), width))
+
+        return new_grid
+
+    def gen_cells(self, y: int, start: int, end: int) -> bytearray:
+        """Generates the procedural cells in columns [start, end) of row y."""
+
+        cells = bytearray()
+        palette_ids = range(len(self.palette))
+
+        for block in range(start // GEN_BLOCK_WIDTH, -(-end // GEN_BLOCK_WIDTH)):
+            block_random = random.Random(f"{self.seed}:{y}:{block}")
+            block_cells = block_random.choices(palette_ids, self.palette_weights, k=GEN_BLOCK_WIDTH)
+
+            block_start = block * GEN_BLOCK_WIDTH
+            cells += bytes(block_cells[max(start - block_start, 0):end - block_start])
+
+        return cells
+
+    def render_grid(self, grid: List[bytearray]) -> List[str]:
+        table = {i: char for i, char in enumerate(self.palette)}
+        return [row.decode("latin-1").translate(table) for row in grid]
 
     def gen_new_stars(self) -> List[str]:
-        new_stars = []
+        self.grid = self.gen_new_grid(self.grid)
+        return self.render_grid(self.grid)
+
+    def gen_new_grid(self, grid: List[bytearray]) -> List[bytearray]:
+        """Returns a new grid where each star has been swapped, with the given probability, with
+        one up to gen_max_dist places to its right (wrapping around the line)."""
+
+        new_grid = [bytearray(row) for row in grid]
+
+        for row_index, i, swap_dist in self.__gen_swaps([len(row) for row in new_grid]):
+            row = new_grid[row_index]
+            swap_i = (i + swap_dist) % len(row)
+            row[i], row[swap_i] = row[swap_i], row[i]
+
+        return new_grid
+
+    def __gen_swaps(self, widths: List[int]):
+        """Yields (row, index, distance) swaps for lines of the given widths, in order, with each
+        index chosen with probability gen_random_threshold. Only the chosen indexes are visited."""
+
+        if numpy.available:
+            if self.numpy_random is None:
+                self.numpy_random = numpy.random.default_rng()
+
+            # Draw the whole field in one batch
+            ends = numpy.cumsum(widths)
+            chosen = numpy.flatnonzero(self.numpy_random.random(int(ends[-1]) if widths else 0) <
+                                       self.gen_random_threshold)
+            rows = numpy.searchsorted(ends, chosen, side="right")
+            indexes = chosen - (ends - widths)[rows]
+            dists = self.numpy_random.integers(1, self.gen_max_dist + 1, len(chosen))
+
+            yield from zip(rows.tolist(), indexes.tolist(), dists.tolist())
+            return
+
+        # Gaps between chosen indexes are geometrically distributed
+        log_miss = math.log(1 - self.gen_random_threshold)
+        for row_index, width in enumerate(widths):
+            i = -1
+            while True:
+                i += 1 + int(math.log(1 - self.random.random()) / log_miss)
+                if i >= width:
+                    break
+                yield row_index, i, self.random.randint(1, self.gen_max_dist)
+
+    def __bounded_ring_size(self) -> int:
+        cells = sum(len(row) for row in self.grid)
+        if not self.max_ring_size or not cells:
+            return self.max_ring_size
+        return max(min(self.max_ring_size, MAX_RING_CELLS // cells), 1)
+
+    def __start_fill_ring(self) -> None:
+        if not self.precompute_in_background:
+            return
+
+        thread = threading.Thread(target=self.__fill_ring, args=(self.ring_generation,))
+        thread.daemon = True
+        thread.start()
 
-        for line in self.stars:
-            chars = list(line)
-            for i in range(len(chars)):
-                if random.random() < self.gen_random_threshold:
-                    swap_dist = math.ceil(random.random() * self.gen_max_dist)
-                    swap_i = (i + swap_dist) % len(chars)
-                    chars[i], chars[swap_i] = chars[swap_i], chars[i]
+    def __fill_ring(self, generation: int) -> None:
+        while True:
+            with self.ring_lock:
+                if generation != self.ring_generation or len(self.ring) >= self.ring_size:
+                    return
+                last_grid = self.ring[-1][0]
 
-            new_stars.append("".join(chars))
+            grid = self.gen_new_grid(last_grid)
+            frame = (grid, self.render_grid(grid))
 
-        return new_stars
+            with self.ring_lock:
+                if generation != self.ring_generation:
+                    return
+                self.ring.append(frame)
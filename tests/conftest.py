@@ -0,0 +1,35 @@
+from functools import partial
+
+import pytest
+
+import stargazing.data.database as database
+import stargazing.data.pomodoro_journal as pomodoro_journal
+import stargazing.data.rollup_cache as rollup_cache
+
+
+@pytest.fixture
+def temporary_database(tmp_path, monkeypatch):
+    """Points the text database and the pomodoro journals at a temporary directory, with the
+    database module's caches reset, so nothing reads or writes the real ones."""
+
+    projects_path = tmp_path / "projects.txt"
+    projects_path.write_text("default\n")
+    pomodoros_path = tmp_path / "pomodoros.txt"
+    pomodoros_path.write_text("")
+
+    monkeypatch.setattr(database, "PROJECT_DATABASE_PATH", str(projects_path))
+    monkeypatch.setattr(database, "POMODORO_DATABASE_PATH", str(pomodoros_path))
+    monkeypatch.setattr(database, "_backend", database.TEXT_BACKEND)
+    for name in ("_binary_store", "_sqlite_store", "_report_index", "_project_names", "_project_tail",
+                 "_pomodoro_tail"):
+        monkeypatch.setattr(database, name, None)
+    monkeypatch.setattr(database, "_report_index_skip", 0)
+    monkeypatch.setattr(database, "_rollup_cache", rollup_cache.RollupCache(cache_path=str(tmp_path / "pomodoros.rollup")))
+
+    monkeypatch.setattr(pomodoro_journal, "recover_journals", partial(pomodoro_journal.recover_journals, str(tmp_path)))
+    monkeypatch.setattr(pomodoro_journal, "get_journal_path", partial(pomodoro_journal.get_journal_path, str(tmp_path)))
+
+    yield tmp_path
+
+    # Queued writes go to the temporary database, so finish them before it is swapped back
+    database.flush_writes()
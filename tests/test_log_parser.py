@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+import random
+
+import pytest
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.data.log_parser as log_parser
+
+INVALID_TIMESTAMPS = [
+    "31/02/2021 10:00:00",
+    "29/02/2100 10:00:00",
+    "00/01/2021 10:00:00",
+    "01/13/2021 10:00:00",
+    "01/01/2020 24:00:00",
+    "01/01/2020 23:60:00",
+    "01/01/2020 23:00:60",
+    "01/01/2020 99:99:99",
+    "01-01-2021 10:00:00",
+    "01/01/2021T10:00:00"
+]
+
+
+def make_timestamps(count: int):
+    random.seed(count)
+    start = datetime(1999, 1, 1)
+    times = [start + timedelta(seconds=random.randrange(40 * 365 * 86400)) for _ in range(count)]
+    times += [datetime(2000, 2, 29, 12), datetime(2024, 2, 29), datetime(2020, 12, 31, 23, 59, 59)]
+    return [time.strftime(database.TIME_FORMAT) for time in times], times
+
+
+def test_decode_timestamp_matches_strptime():
+    timestamps, times = make_timestamps(200)
+
+    day_secs_cache = {}
+    assert [log_parser.decode_timestamp(timestamp, day_secs_cache) for timestamp in timestamps] == \
+        [binary_store.to_wall_clock_secs(time) for time in times]
+
+
+def test_numpy_decode_matches_python_decode():
+    pytest.importorskip("numpy")
+    timestamps, _ = make_timestamps(5000)
+
+    day_secs_cache = {}
+    assert list(log_parser._decode_timestamps_numpy(timestamps)) == \
+        [log_parser.decode_timestamp(timestamp, day_secs_cache) for timestamp in timestamps]
+
+
+@pytest.mark.parametrize("timestamp", INVALID_TIMESTAMPS)
+def test_python_decode_rejects_invalid_timestamp(timestamp):
+    with pytest.raises(ValueError):
+        log_parser.decode_timestamp(timestamp, {})
+
+
+@pytest.mark.parametrize("timestamp", INVALID_TIMESTAMPS)
+def test_numpy_decode_rejects_invalid_timestamp(timestamp):
+    pytest.importorskip("numpy")
+    timestamps, _ = make_timestamps(10)
+
+    with pytest.raises(ValueError):
+        log_parser._decode_timestamps_numpy(timestamps + [timestamp])
+
+
+@pytest.mark.parametrize("timestamp", INVALID_TIMESTAMPS)
+def test_bulk_decode_rejects_invalid_timestamp(timestamp):
+    timestamps, _ = make_timestamps(2000)
+
+    with pytest.raises(ValueError):
+        log_parser.decode_timestamps(timestamps + [timestamp])
+
+
+def test_bulk_and_streaming_parsers_agree(tmp_path):
+    timestamps, _ = make_timestamps(100)
+    lines = [f"project {i % 3}|{timestamp}|{i * 1.5}" for i, timestamp in enumerate(timestamps)]
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text("\n".join(lines) + "\n")
+
+    columns = log_parser.parse_pomodoro_log(log_path.read_bytes())
+
+    assert list(zip(columns.project_names, columns.start_times, columns.lengths)) == \
+        list(log_parser.iter_pomodoro_log(str(log_path)))
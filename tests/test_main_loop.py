@@ -0,0 +1,27 @@
+from benchmarks.bench_main_loop import DEFAULT_KEYS, FakeTerminal, NullAlarmPlayer, NullAudioController, play_keys, \
+    to_keystroke
+from stargazing.main import Stargazing
+
+
+def test_default_session_browses_the_intended_menus(temporary_database):
+    term = FakeTerminal(100, 30)
+    app = Stargazing(term, NullAudioController(100))
+    app.pomodoro_controller.alarm_player = NullAlarmPlayer()
+    app.setup_screen()
+    app.render_frame()
+
+    opened_menus = []
+    search_queries = set()
+    for key in play_keys(app, DEFAULT_KEYS):
+        focused_menu = app.focused_menu
+        app.step(to_keystroke(term, key))
+        app.render_frame()
+
+        if app.focused_menu is not focused_menu and app.focused_menu is not app:
+            opened_menus.append(app.focused_menu)
+        search_queries.add(app.player_menu.search_youtube_query)
+
+    assert opened_menus == [app.project_menu, app.report_menu, app.interval_menu, app.autostart_menu,
+                            app.player_menu, app.volume_menu]
+    assert "lofi beats" in search_queries
+    assert app.focused_menu is app and app.hover_index == 0
@@ -0,0 +1,58 @@
+import stargazing.data.binary_store as binary_store
+import stargazing.data.pomodoro_log as pomodoro_log
+import stargazing.data.report_index as report_index
+
+# Monday 01/03/2021
+MONDAY = 18687
+HOUR = report_index.SECONDS_PER_HOUR
+
+RECORDS = [
+    ("reading", MONDAY * binary_store.SECONDS_PER_DAY + 9 * HOUR, 1800.0),
+    ("reading", (MONDAY + 1) * binary_store.SECONDS_PER_DAY + 9.5 * HOUR, 3600.0),
+    ("writing", (MONDAY + 1) * binary_store.SECONDS_PER_DAY + 20 * HOUR, 1500.0),
+    ("writing", (MONDAY - 3) * binary_store.SECONDS_PER_DAY + 20 * HOUR, 600.0)
+]
+
+
+def build_by_adding():
+    index = report_index.ReportIndex()
+    for record in RECORDS:
+        index.add(*record)
+    return index
+
+
+def test_from_log_matches_adding():
+    from_log = report_index.ReportIndex.from_log(pomodoro_log.PomodoroLog.from_records(RECORDS))
+    added = build_by_adding()
+
+    assert from_log.first_day == added.first_day == MONDAY - 3
+    for project_name in (None, "reading", "writing", "missing"):
+        assert from_log.daily_series(MONDAY - 4, MONDAY + 2, project_name) == \
+            added.daily_series(MONDAY - 4, MONDAY + 2, project_name)
+        assert from_log.get_heatmap(project_name) == added.get_heatmap(project_name)
+
+
+def test_project_hour_totals():
+    index = build_by_adding()
+
+    reading = index.hour_totals(project_name="reading")
+    assert reading[9] == 1800 + 1800 and reading[10] == 1800
+    assert sum(reading) == 5400
+    assert index.hour_totals(report_index.get_weekday(MONDAY + 1), "reading")[9] == 1800
+
+    writing = index.hour_totals(project_name="writing")
+    assert writing[20] == 2100 and sum(writing) == 2100
+    assert index.hour_totals() == [r + w for r, w in zip(reading, writing)]
+    assert sum(index.hour_totals(project_name="missing")) == 0
+
+
+def test_project_report_shows_project_hours():
+    index = build_by_adding()
+    lines = report_index.format_report(index, MONDAY + 1, project_name="writing")
+
+    hours_start = lines.index("hour of day, all time") + 2
+    heatmap_rows = [line[2:2 + report_index.HOURS_PER_DAY] for line in lines[hours_start:]]
+
+    # Only the evening hour writing was done in, not reading's mornings
+    assert all(set(row[:20] + row[21:]) == {" "} for row in heatmap_rows)
+    assert sum(row[20] != " " for row in heatmap_rows) == 2
@@ -0,0 +1,118 @@
+import os
+
+import stargazing.data.rollup_cache as rollup_cache
+
+DAY = 18687
+
+
+def make_line(project_name: str, minute: int, length: float = 60.0) -> str:
+    return f"{project_name}|01/03/2021 10:{minute:02d}:00|{length}\n"
+
+
+def make_cache(tmp_path) -> rollup_cache.RollupCache:
+    cache = rollup_cache.RollupCache(str(tmp_path / "pomodoros.txt"), str(tmp_path / "pomodoros.rollup"))
+    cache.refresh()
+    return cache
+
+
+def append(log_path, text: str) -> None:
+    with open(log_path, "a") as file:
+        file.write(text)
+
+
+def test_folds_appended_lines(tmp_path):
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text(make_line("default", 0) + make_line("reading", 1))
+    cache = make_cache(tmp_path)
+
+    # The partial line is left for the next refresh
+    append(log_path, make_line("reading", 2) + "default|01/03/2021 10:")
+    cache.refresh()
+    assert cache.get_project_total("reading") == 120
+    assert cache.get_project_total("default") == 60
+
+    append(log_path, "03:00|30.0\n")
+    cache.refresh()
+    assert cache.get_project_total("default") == 90
+    assert cache.get_day_total(DAY) == 210
+    assert cache.offset == log_path.stat().st_size
+
+
+def test_reads_only_from_offset(tmp_path, monkeypatch):
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text("".join(make_line(f"project {i % 7}", i % 60) for i in range(20000)))
+    cache = make_cache(tmp_path)
+
+    read_sizes = []
+
+    def spy_open(*args, **kwargs):
+        file = open(*args, **kwargs)
+        read = file.read
+
+        def spy_read(*read_args):
+            data = read(*read_args)
+            read_sizes.append(len(data))
+            return data
+
+        file.read = spy_read
+        return file
+
+    monkeypatch.setattr(rollup_cache, "open", spy_open, raising=False)
+    appended = make_line("reading", 5)
+    append(log_path, appended)
+    cache.refresh()
+
+    assert read_sizes == [rollup_cache.CHECK_WINDOW + len(appended)]
+    assert cache.get_project_total("reading") == 60
+
+
+def test_rebuilds_after_edit_before_offset(tmp_path):
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text(make_line("default", 0) + make_line("reading", 1))
+    cache = make_cache(tmp_path)
+
+    log_path.write_text(make_line("default", 0) + make_line("writing", 1) + make_line("writing", 2))
+    cache.refresh()
+
+    assert cache.get_project_total("reading") == 0
+    assert cache.get_project_total("writing") == 120
+
+
+def test_rebuilds_after_truncation(tmp_path):
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text(make_line("default", 0) + make_line("reading", 1))
+    cache = make_cache(tmp_path)
+
+    log_path.write_text(make_line("default", 0))
+    cache.refresh()
+
+    assert cache.get_project_total("reading") == 0
+    assert cache.get_project_total("default") == 60
+
+
+def test_rebuilds_after_replacement(tmp_path):
+    padding = "".join(make_line("padding", i % 60) for i in range(1000))
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text(make_line("reading", 0) + padding)
+    cache = make_cache(tmp_path)
+
+    # The same length, with the edit too far back for the checked window to cover
+    replacement_path = tmp_path / "pomodoros.txt.new"
+    replacement_path.write_text(make_line("writing", 0) + padding)
+    os.replace(replacement_path, log_path)
+    cache.refresh()
+
+    assert cache.get_project_total("reading") == 0
+    assert cache.get_project_total("writing") == 60
+
+
+def test_persists_between_instances(tmp_path):
+    log_path = tmp_path / "pomodoros.txt"
+    log_path.write_text(make_line("default", 0))
+    make_cache(tmp_path)
+
+    append(log_path, make_line("reading", 1))
+    cache = make_cache(tmp_path)
+
+    assert cache.get_project_total("default") == 60
+    assert cache.get_project_total("reading") == 60
@@ -0,0 +1,159 @@
+"""Stress test of several stargazing processes sharing one database.
+
+Each worker process loads a ProjectController over the test's database, then inserts pomodoros and
+creates projects - one of its own and one every worker tries to create - while folding in what the
+other workers add. Once all workers are done and have caught up, the database is checked for torn
+or missing records and duplicate projects, and each worker's totals are checked against it."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import multiprocessing
+import os.path as path
+import random
+import time
+
+import pytest
+
+import stargazing.data.binary_store as binary_store
+import stargazing.data.database as database
+import stargazing.data.log_parser as log_parser
+import stargazing.data.rollup_cache as rollup_cache
+import stargazing.data.sqlite_store as sqlite_store
+import stargazing.project.project_controller as project_pc
+
+WORKERS = 8
+POMODOROS = 200
+
+SHARED_PROJECT_NAME = "shared"
+CATCH_UP_TIMEOUT = 30
+
+
+def get_binary_store(directory: str) -> binary_store.BinaryPomodoroStore:
+    return binary_store.BinaryPomodoroStore(path.join(directory, "pomodoros.bin"), path.join(directory, "pomodoros.names"),
+                                            path.join(directory, "pomodoros.idx"), poll_interval=0)
+
+
+def get_sqlite_store(directory: str) -> sqlite_store.SqlitePomodoroStore:
+    return sqlite_store.SqlitePomodoroStore(path.join(directory, "stargazing.db"), poll_interval=0)
+
+
+def read_database(directory: str, backend: str) -> Tuple[List[str], List[Tuple[str, float, float]]]:
+    """Returns the project names and pomodoros in the database, read without the worker's state."""
+
+    if backend == database.SQLITE_BACKEND:
+        store = get_sqlite_store(directory)
+        return store.get_project_names(), list(store.iter_pomodoros())
+
+    with open(path.join(directory, "projects.txt"), "rb") as file:
+        project_names = file.read().decode().splitlines()
+
+    if backend == database.BINARY_BACKEND:
+        return project_names, list(get_binary_store(directory).iter_records())
+
+    with open(path.join(directory, "pomodoros.txt"), "rb") as file:
+        return project_names, list(zip(*log_parser.parse_pomodoro_log(file.read())))
+
+
+def worker(directory: str, backend: str, worker_id: int, barrier, results) -> None:
+    # The database module is already pointed at the test's directory, the stores are opened here
+    # so that no connection or file is shared with the other workers
+    database._backend = backend
+    if backend == database.BINARY_BACKEND:
+        database._binary_store = get_binary_store(directory)
+    elif backend == database.SQLITE_BACKEND:
+        database._sqlite_store = get_sqlite_store(directory)
+
+    # Rollups are kept per worker, they are not shared state
+    database._rollup_cache = rollup_cache.RollupCache(cache_path=path.join(directory, f"pomodoros.{worker_id}.rollup"))
+
+    controller = project_pc.ProjectController()
+    database.get_project_tail().poll_interval = 0
+    database.get_pomodoro_tail().poll_interval = 0
+    barrier.wait()
+
+    start_time = datetime(2021, 1, 1) + timedelta(days=worker_id)
+    inserted = defaultdict(float)
+    for i in range(POMODOROS):
+        if i == POMODOROS // 4:
+            controller.create_and_insert_new_project(f"worker {worker_id}")
+        if i == POMODOROS // 2:
+            controller.create_and_insert_new_project(SHARED_PROJECT_NAME)
+
+        project = random.choice(controller.projects)
+        length = float(random.randint(1, 3000))
+        database.insert_pomodoro_record(database.PomodoroRecord(project.name, start_time + timedelta(minutes=i), length))
+        # As the pomodoro controller does while the timer runs
+        project.add_time(length)
+        inserted[project.name] += length
+
+        controller.check_external_changes()
+
+    database.flush_writes()
+    barrier.wait()
+
+    # Every worker has written everything, so keep folding in changes until the totals match the database
+    deadline = time.monotonic() + CATCH_UP_TIMEOUT
+    database_total = sum(length for _, _, length in read_database(directory, backend)[1])
+    while time.monotonic() < deadline:
+        controller.check_external_changes()
+        if abs(sum(project.total_time for project in controller.projects) - database_total) < 1e-6:
+            break
+        time.sleep(0.01)
+
+    results.put({
+        "total_time": sum(project.total_time for project in controller.projects),
+        "inserted": dict(inserted),
+        "projects": sorted(project.name for project in controller.projects)
+    })
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("backend", [database.TEXT_BACKEND, database.BINARY_BACKEND, database.SQLITE_BACKEND])
+def test_workers_share_database(temporary_database, backend):
+    directory = str(temporary_database)
+    if backend == database.SQLITE_BACKEND:
+        store = get_sqlite_store(directory)
+        store.insert_project("default")
+        store.close()
+
+    # Forked, so the workers start with the database module pointed at the test's directory
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(directory, backend, i, barrier, results))
+                 for i in range(WORKERS)]
+
+    for process in processes:
+        process.start()
+    worker_results = [results.get(timeout=2 * CATCH_UP_TIMEOUT) for _ in processes]
+    for process in processes:
+        process.join()
+
+    project_names, records = read_database(directory, backend)
+    database_total = sum(length for _, _, length in records)
+    expected_projects = sorted(["default", SHARED_PROJECT_NAME] + [f"worker {i}" for i in range(WORKERS)])
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(records) == WORKERS * POMODOROS
+    assert sorted(project_names) == expected_projects
+
+    # Only appends to the text and binary logs can be torn
+    if backend == database.TEXT_BACKEND:
+        data = (temporary_database / "pomodoros.txt").read_bytes()
+        assert data.endswith(b"\n") and data.count(b"\n") == len(records)
+    elif backend == database.BINARY_BACKEND:
+        assert (temporary_database / "pomodoros.bin").stat().st_size % binary_store.RECORD_STRUCT.size == 0
+
+    database_project_totals = defaultdict(float)
+    for project_name, _, length in records:
+        database_project_totals[project_name] += length
+    inserted_project_totals = defaultdict(float)
+    for result in worker_results:
+        for project_name, length in result["inserted"].items():
+            inserted_project_totals[project_name] += length
+    assert database_project_totals == inserted_project_totals
+
+    for result in worker_results:
+        assert result["total_time"] == pytest.approx(database_total, abs=1e-6)
+        assert result["projects"] == expected_projects
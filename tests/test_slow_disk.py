@@ -0,0 +1,23 @@
+import stargazing.data.database as database
+
+from benchmarks.bench_slow_disk import run, slowed
+
+WRITE_DELAY = 0.1
+FRAMES = 60
+INSERT_EVERY = 10
+PROJECT_EVERY = 25
+
+
+def test_frame_times_stay_flat_while_writes_are_slow(temporary_database, monkeypatch):
+    monkeypatch.setattr(database, "write_pomodoro_records", slowed(database.write_pomodoro_records, WRITE_DELAY))
+    monkeypatch.setattr(database, "write_projects", slowed(database.write_projects, WRITE_DELAY))
+
+    queued = run(FRAMES, INSERT_EVERY, PROJECT_EVERY, False, str(temporary_database))
+    # Run again in the same process, as the benchmark does, waiting on every write
+    waited = run(FRAMES, INSERT_EVERY, PROJECT_EVERY, True, str(temporary_database))
+
+    assert queued["max_ms"] < WRITE_DELAY * 1000
+    assert waited["max_ms"] >= WRITE_DELAY * 1000
+
+    database.flush_writes()
+    assert len(temporary_database.joinpath("pomodoros.txt").read_text().splitlines()) > 0
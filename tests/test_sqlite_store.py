@@ -0,0 +1,68 @@
+import pytest
+
+import stargazing.data.database as database
+import stargazing.data.sqlite_store as sqlite_store
+
+POMODORO_LINES = [
+    "default|01/03/2021 09:00:00|1500.0",
+    "reading|01/03/2021 10:00:00|1200.0",
+    "reading|02/03/2021 10:00:00|900.0"
+]
+
+
+@pytest.fixture
+def text_database(tmp_path, monkeypatch):
+    projects_path = tmp_path / "projects.txt"
+    projects_path.write_text("default\nreading\n")
+    pomodoros_path = tmp_path / "pomodoros.txt"
+    pomodoros_path.write_text("\n".join(POMODORO_LINES) + "\n")
+
+    monkeypatch.setattr(database, "PROJECT_DATABASE_PATH", str(projects_path))
+    monkeypatch.setattr(database, "POMODORO_DATABASE_PATH", str(pomodoros_path))
+    return tmp_path
+
+
+def test_migrates_text_database(text_database):
+    store = sqlite_store.SqlitePomodoroStore(str(text_database / "stargazing.db"))
+
+    assert sqlite_store.migrate_text_database(store) == (2, 3)
+    assert store.is_text_migrated()
+    assert [name for name, _, _ in store.get_project_totals(0)] == ["default", "reading"]
+    assert [length for _, _, length in store.iter_pomodoros()] == [1500.0, 1200.0, 900.0]
+
+    store.close()
+
+
+def test_migrates_only_once(text_database):
+    database_path = str(text_database / "stargazing.db")
+
+    first_store = sqlite_store.SqlitePomodoroStore(database_path)
+    second_store = sqlite_store.SqlitePomodoroStore(database_path)
+    sqlite_store.migrate_text_database(first_store)
+
+    # Opened before the first migrated, so only the marker read in the transaction stops it
+    assert second_store.insert_text_migration(["default", "reading"], [("default", 0.0, 60.0)]) == (0, 0)
+    second_store.close()
+
+    reopened_store = sqlite_store.SqlitePomodoroStore(database_path)
+    assert sqlite_store.migrate_text_database(reopened_store) == (0, 0)
+    assert len(list(reopened_store.iter_pomodoros())) == 3
+
+    first_store.close()
+    reopened_store.close()
+
+
+def test_failed_migration_is_rolled_back(text_database):
+    database_path = str(text_database / "stargazing.db")
+    store = sqlite_store.SqlitePomodoroStore(database_path)
+
+    with pytest.raises(sqlite_store.sqlite3.IntegrityError):
+        store.insert_text_migration(["default"], [("default", 0.0, 60.0), (None, 0.0, 60.0)])
+    assert store.get_project_totals(0) == []
+    assert not store.is_text_migrated()
+    store.close()
+
+    # The database file now exists, but is still migrated when opened again
+    reopened_store = sqlite_store.SqlitePomodoroStore(database_path)
+    assert sqlite_store.migrate_text_database(reopened_store) == (2, 3)
+    reopened_store.close()
@@ -0,0 +1,58 @@
+import time
+
+from stargazing.utils.stars import StarsGenerator
+
+BACKGROUND_TIMEOUT = 5
+
+
+def wait_for_ring(generator: StarsGenerator) -> bool:
+    end_time = time.monotonic() + BACKGROUND_TIMEOUT
+    while len(generator.ring) < generator.ring_size:
+        if time.monotonic() > end_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_background_fill_starts_after_first_frame():
+    generator = StarsGenerator(80, 20, seed=1, ring_size=8, precompute_in_background=True)
+    first_stars = generator.get_stars()
+
+    time.sleep(0.2)
+    assert len(generator.ring) == 1
+
+    assert generator.get_stars() == first_stars
+    assert wait_for_ring(generator)
+
+
+def test_background_fill_restarts_after_resize():
+    generator = StarsGenerator(80, 20, seed=1, ring_size=8, precompute_in_background=True)
+    generator.get_stars()
+    generator.get_stars()
+    assert wait_for_ring(generator)
+
+    generator.resize(100, 30)
+    assert len(generator.ring) == 1
+    generator.get_stars()
+    assert wait_for_ring(generator)
+    assert all(len(grid) == 30 and len(grid[0]) == 100 for grid, _ in generator.ring)
+
+
+def test_ring_plays_back_and_forth():
+    generator = StarsGenerator(80, 20, seed=1, ring_size=4)
+
+    indexes = []
+    for _ in range(10):
+        generator.next_frame()
+        indexes.append(generator.ring_index)
+
+    assert indexes == [1, 2, 3, 2, 1, 0, 1, 2, 3, 2]
+    assert generator.stars == generator.ring[2][1]
+
+
+def test_single_frame_ring_stays_put():
+    generator = StarsGenerator(80, 20, seed=1, ring_size=1)
+
+    for _ in range(3):
+        generator.next_frame()
+        assert generator.ring_index == 0
@@ -0,0 +1,129 @@
+"""Checks the YouTube stream cache against a LocalResolver, without network access.
+
+Play urls are made with expire parameters in the past, near future and far future, and without
+one."""
+
+from typing import Callable
+import threading
+import time
+
+import pytest
+
+import stargazing.audio.stream_cache as audio_sc
+
+BACKGROUND_TIMEOUT = 5
+
+
+def make_play_url(video_id: str, expire: float = None, version: int = 1) -> str:
+    url = f"https://stream.example/{video_id}?v={version}"
+    return url if expire is None else f"{url}&expire={int(expire)}"
+
+
+def wait_until(condition: Callable[[], bool]) -> bool:
+    end_time = time.monotonic() + BACKGROUND_TIMEOUT
+    while not condition():
+        if time.monotonic() > end_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def now():
+    return time.time()
+
+
+@pytest.fixture
+def resolver(now):
+    return audio_sc.LocalResolver({
+        "fresh": ("Fresh", make_play_url("fresh", now + 3600)),
+        "no_expire": ("No expire", make_play_url("no_expire")),
+        "expired": ("Expired", make_play_url("expired", now - 60)),
+        "expiring": ("Expiring", make_play_url("expiring", now + audio_sc.REFRESH_MARGIN / 2))
+    })
+
+
+@pytest.fixture
+def cache(resolver, tmp_path):
+    cache = audio_sc.StreamCache(resolver, str(tmp_path / "stream_cache.json"))
+    for youtube_url in resolver.streams:
+        cache.resolve(youtube_url)
+    resolver.calls.clear()
+
+    yield cache
+
+    # A background save may still be writing to the temporary directory
+    wait_until(lambda: not cache.refreshing)
+
+
+def test_expiry_read_from_play_url(cache, now):
+    assert cache.entries["fresh"]["expires"] == int(now + 3600)
+    assert cache.entries["no_expire"]["expires"] - now == pytest.approx(audio_sc.DEFAULT_TTL, abs=BACKGROUND_TIMEOUT)
+
+
+def test_cached_entry_not_resolved_again(cache, resolver):
+    assert cache.resolve("fresh") == resolver.streams["fresh"]
+    assert "fresh" not in resolver.calls
+
+
+def test_expired_entry_resolved_again(cache, resolver):
+    cache.resolve("expired")
+    assert "expired" in resolver.calls
+
+
+def test_expiring_entry_returned_then_refreshed(cache, resolver, now):
+    old_play_url = resolver.streams["expiring"][1]
+    resolver.streams["expiring"] = ("Expiring", make_play_url("expiring", now + 3600, version=2))
+
+    # Returned straight away, with the refresh picking up the later url in the background
+    assert cache.resolve("expiring")[1] == old_play_url
+    assert wait_until(lambda: not cache.refreshing)
+    assert cache.get("expiring") == resolver.streams["expiring"]
+
+
+def test_expired_entries_dropped_on_load(cache, tmp_path):
+    assert wait_until(lambda: not cache.refreshing)
+    reloaded = audio_sc.StreamCache(audio_sc.LocalResolver({}), str(tmp_path / "stream_cache.json"))
+
+    assert "expired" not in reloaded.entries
+    assert "fresh" in reloaded.entries
+
+
+def test_least_recently_used_evicted():
+    expire = time.time() + 3600
+    resolver = audio_sc.LocalResolver({f"video{i}": (f"Video {i}", make_play_url(f"video{i}", expire))
+                                       for i in range(4)})
+    cache = audio_sc.StreamCache(resolver, None, max_entries=3)
+
+    for i in range(3):
+        cache.resolve(f"video{i}")
+    # Used again, so video1 is now the least recently used
+    cache.resolve("video0")
+    cache.resolve("video3")
+
+    assert list(cache.entries) == ["video2", "video0", "video3"]
+
+
+def test_failed_url_invalidated_and_refreshed():
+    expire = time.time() + 3600
+    resolver = audio_sc.LocalResolver({"video": ("Video", make_play_url("video", expire))})
+    cache = audio_sc.StreamCache(resolver, None)
+
+    _, failed_play_url = cache.resolve("video")
+
+    # As YoutubeAudioPlayer does when playback of a play url fails
+    resolver.streams["video"] = ("Video", make_play_url("video", expire, version=2))
+    refreshed = []
+    done = threading.Event()
+
+    def on_refresh(title: str, play_url: str) -> None:
+        refreshed.append(play_url)
+        done.set()
+
+    cache.invalidate("video")
+    assert cache.get("video") is None
+
+    cache.refresh_in_background("video", on_refresh)
+    assert done.wait(BACKGROUND_TIMEOUT)
+    assert refreshed == [resolver.streams["video"][1]] != [failed_play_url]
+    assert cache.get("video") == resolver.streams["video"]
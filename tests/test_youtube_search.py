@@ -0,0 +1,139 @@
+"""Runs YoutubeSearch against a local stand-in for the YouTube search server.
+
+The stand-in serves a long results page slowly, a chunk at a time, with video ids spread all the
+way through it, so a search that stops reading once max_results ids are found returns well before
+the page is fully sent."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+import threading
+import time
+
+import pytest
+
+import stargazing.audio.youtube_search as audio_ys
+
+CHUNKS = 64
+CHUNK_DELAY = 0.01
+IDS_PER_CHUNK = 4
+CHUNK_PADDING = 16 * 1024
+
+
+def make_video_id(index: int) -> str:
+    return f"vid{index:08d}"
+
+
+class SearchServer(ThreadingHTTPServer):
+    """Serves results pages of chunks, each with IDS_PER_CHUNK video ids and padding, sent with a
+    delay between chunks as a slow connection would."""
+
+    daemon_threads = True
+
+    def __init__(self, chunks: int, chunk_delay: float) -> None:
+        super().__init__(("127.0.0.1", 0), SearchHandler)
+
+        self.chunks = [self.make_chunk(i) for i in range(chunks)]
+        self.chunk_delay = chunk_delay
+
+        self.lock = threading.Lock()
+        self.queries: List[str] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def page_send_time(self) -> float:
+        return len(self.chunks) * self.chunk_delay
+
+    def make_chunk(self, chunk_index: int) -> bytes:
+        links = "".join(f'<a href="/watch?v={make_video_id(chunk_index * IDS_PER_CHUNK + i)}">video</a>'
+                        for i in range(IDS_PER_CHUNK))
+        return (links + " " * CHUNK_PADDING).encode("ascii")
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.queries.append(self.path)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(sum(len(chunk) for chunk in self.server.chunks)))
+        self.end_headers()
+
+        try:
+            for chunk in self.server.chunks:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+                time.sleep(self.server.chunk_delay)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once it found enough ids
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    server = SearchServer(CHUNKS, CHUNK_DELAY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "search_cache.json")
+
+
+@pytest.fixture
+def search(server, cache_path):
+    search = audio_ys.YoutubeSearch(server.url, audio_ys.MAX_RESULTS, cache_path)
+    yield search
+    search.close()
+
+
+def get_expected_urls() -> List[str]:
+    return [audio_ys.get_watch_url(make_video_id(i)) for i in range(audio_ys.MAX_RESULTS)]
+
+
+def test_search_stops_after_max_results(server, search):
+    start = time.perf_counter()
+    urls = search.search("lofi beats").result()
+
+    assert urls == get_expected_urls()
+    assert time.perf_counter() - start < server.page_send_time / 2
+
+
+def test_normalised_query_answered_from_cache(server, search):
+    first_urls = search.search("lofi beats").result()
+
+    future = search.search("  LoFi   Beats ")
+    assert future.done()
+    assert future.result() == first_urls
+    assert len(server.queries) == 1
+
+
+def test_search_after_early_stop_reconnects(server, search):
+    search.search("lofi beats").result()
+
+    # The page abandoned by the first search closed its connection
+    assert search.search("rain sounds").result() == get_expected_urls()
+    assert len(server.queries) == 2
+
+
+def test_cache_persisted(server, cache_path):
+    search = audio_ys.YoutubeSearch(server.url, audio_ys.MAX_RESULTS, cache_path)
+    first_urls = search.search("lofi beats").result()
+    search.close()
+
+    reloaded_search = audio_ys.YoutubeSearch(server.url, audio_ys.MAX_RESULTS, cache_path)
+    assert reloaded_search.get_cached("lofi beats") == first_urls
+    reloaded_search.close()